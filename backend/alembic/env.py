@@ -24,6 +24,10 @@ if config.config_file_name is not None:
 # Import your models here so Alembic autogenerate can find them
 from app.models.user import User
 from app.models.image_submission import ImageSubmission
+from app.models.pending_upload import PendingUpload
+from app.models.image_blob import ImageBlob
+from app.models.vote import Vote
+from app.models.rate_limit import AuthRateLimit
 
 # SQLModel metadata
 target_metadata = SQLModel.metadata
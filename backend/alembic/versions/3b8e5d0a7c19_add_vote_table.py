@@ -0,0 +1,41 @@
+"""Add vote table with one vote per user and submission
+
+Revision ID: 3b8e5d0a7c19
+Revises: f1b7c3d92e64
+Create Date: 2026-10-17 15:37:02.846193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e5d0a7c19'
+down_revision: Union[str, None] = 'f1b7c3d92e64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the vote table. Existing counts stay as they are (earlier votes were anonymous)."""
+    op.create_table('vote',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('submission_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint('value IN (1, -1)', name='ck_vote_value'),
+    sa.ForeignKeyConstraint(['submission_id'], ['imagesubmission.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'submission_id')
+    )
+    op.create_index(op.f('ix_vote_submission_id'), 'vote', ['submission_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the vote table."""
+    op.drop_index(op.f('ix_vote_submission_id'), table_name='vote')
+    op.drop_table('vote')
@@ -0,0 +1,99 @@
+"""Partition imagesubmission into daily ranges of expires_at
+
+Revision ID: 5f0a9b3e7d21
+Revises: 8d2c6f41a9e3
+Create Date: 2026-10-17 18:06:44.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0a9b3e7d21'
+down_revision: Union[str, None] = '8d2c6f41a9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Daily partitions created here, from yesterday (UTC) on; the expiry reaper keeps
+# creating partitions ahead of time (app/db/partitions.py). Older rows, which are
+# already expired, go to the default partition and are reaped row by row.
+INITIAL_PARTITION_DAYS = 8
+
+
+def _create_indexes() -> None:
+    """Indexes of imagesubmission (created on each partition as well)."""
+    op.create_index('idx_imagesubmission_location', 'imagesubmission', ['location'], unique=False, postgresql_using='gist')
+    op.create_index(
+        'idx_imagesubmission_location_geog',
+        'imagesubmission',
+        [sa.text('geography(location)')],
+        unique=False,
+        postgresql_using='gist'
+    )
+    op.create_index(op.f('ix_imagesubmission_user_id'), 'imagesubmission', ['user_id'], unique=False)
+    op.create_index('ix_imagesubmission_uploaded_at_id', 'imagesubmission', ['uploaded_at', 'id'], unique=False)
+    op.create_index(op.f('ix_imagesubmission_updated_at'), 'imagesubmission', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_imagesubmission_content_hash'), 'imagesubmission', ['content_hash'], unique=False)
+    op.create_index(op.f('ix_imagesubmission_perceptual_hash'), 'imagesubmission', ['perceptual_hash'], unique=False)
+    op.create_index(op.f('ix_imagesubmission_expires_at'), 'imagesubmission', ['expires_at'], unique=False)
+
+
+def upgrade() -> None:
+    """Rebuild imagesubmission as a table partitioned by day of expires_at and copy the rows over."""
+    # A partitioned table can only enforce uniqueness together with the partition key,
+    # so vote.submission_id can no longer reference imagesubmission.id
+    op.drop_constraint('vote_submission_id_fkey', 'vote', type_='foreignkey')
+
+    op.execute("ALTER TABLE imagesubmission RENAME TO imagesubmission_unpartitioned")
+    op.execute("ALTER SEQUENCE imagesubmission_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE imagesubmission (LIKE imagesubmission_unpartitioned INCLUDING DEFAULTS)
+        PARTITION BY RANGE (expires_at)
+    """)
+    op.execute("CREATE TABLE imagesubmission_default PARTITION OF imagesubmission DEFAULT")
+    op.execute(f"""
+        DO $$
+        DECLARE
+            first_day date := (timezone('utc', now()))::date - 1;
+            day date;
+        BEGIN
+            FOR i IN 0..{INITIAL_PARTITION_DAYS - 1} LOOP
+                day := first_day + i;
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF imagesubmission FOR VALUES FROM (%L) TO (%L)',
+                    'imagesubmission_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+            END LOOP;
+        END $$
+    """)
+    op.execute("INSERT INTO imagesubmission SELECT * FROM imagesubmission_unpartitioned")
+    op.execute("DROP TABLE imagesubmission_unpartitioned")
+    op.execute("ALTER SEQUENCE imagesubmission_id_seq OWNED BY imagesubmission.id")
+
+    op.create_primary_key('imagesubmission_pkey', 'imagesubmission', ['id', 'expires_at'])
+    op.create_foreign_key('imagesubmission_user_id_fkey', 'imagesubmission', 'user', ['user_id'], ['id'])
+    _create_indexes()
+    op.execute("ANALYZE imagesubmission")
+
+
+def downgrade() -> None:
+    """Copy the rows back into a plain imagesubmission table."""
+    op.execute("ALTER TABLE imagesubmission RENAME TO imagesubmission_partitioned")
+    op.execute("ALTER SEQUENCE imagesubmission_id_seq OWNED BY NONE")
+    op.execute("CREATE TABLE imagesubmission (LIKE imagesubmission_partitioned INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO imagesubmission SELECT * FROM imagesubmission_partitioned")
+    op.execute("DROP TABLE imagesubmission_partitioned") # With all partitions and their indexes
+    op.execute("ALTER SEQUENCE imagesubmission_id_seq OWNED BY imagesubmission.id")
+
+    op.create_primary_key('imagesubmission_pkey', 'imagesubmission', ['id'])
+    op.create_foreign_key('imagesubmission_user_id_fkey', 'imagesubmission', 'user', ['user_id'], ['id'])
+    _create_indexes()
+
+    op.execute("DELETE FROM vote WHERE submission_id NOT IN (SELECT id FROM imagesubmission)")
+    op.create_foreign_key(
+        'vote_submission_id_fkey', 'vote', 'imagesubmission', ['submission_id'], ['id'], ondelete='CASCADE'
+    )
@@ -0,0 +1,37 @@
+"""Add geography GiST index on imagesubmission.location for ST_DWithin
+
+Revision ID: 7c2e91d4a3b5
+Revises: 1dcbfaad8956
+Create Date: 2026-10-17 09:12:05.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e91d4a3b5'
+down_revision: Union[str, None] = '1dcbfaad8956'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create a functional GiST index on geography(location)."""
+    # The nearby query filters with ST_DWithin(geography(location), <point>, <meters>).
+    # The expression must match the index expression exactly for the planner to use it.
+    op.create_index(
+        'idx_imagesubmission_location_geog',
+        'imagesubmission',
+        [sa.text('geography(location)')],
+        unique=False,
+        postgresql_using='gist',
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Drop the geography GiST index."""
+    op.drop_index('idx_imagesubmission_location_geog', table_name='imagesubmission', postgresql_using='gist')
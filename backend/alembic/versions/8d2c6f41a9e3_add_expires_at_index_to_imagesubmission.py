@@ -0,0 +1,29 @@
+"""Add expires_at index to imagesubmission for the expiry reaper
+
+Revision ID: 8d2c6f41a9e3
+Revises: 3b8e5d0a7c19
+Create Date: 2026-10-17 16:52:31.204877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2c6f41a9e3'
+down_revision: Union[str, None] = '3b8e5d0a7c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index expires_at so the expiry reaper finds expired rows with a range scan."""
+    op.create_index(op.f('ix_imagesubmission_expires_at'), 'imagesubmission', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the expires_at index."""
+    op.drop_index(op.f('ix_imagesubmission_expires_at'), table_name='imagesubmission')
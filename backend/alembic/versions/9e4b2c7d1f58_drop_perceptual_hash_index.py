@@ -0,0 +1,31 @@
+"""Drop the unused B-tree index on imagesubmission.perceptual_hash
+
+Revision ID: 9e4b2c7d1f58
+Revises: b6d1e8f24c70
+Create Date: 2026-10-17 21:05:12.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b2c7d1f58'
+down_revision: Union[str, None] = 'b6d1e8f24c70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Drop ix_imagesubmission_perceptual_hash (and its copies on the partitions)."""
+    # Near-duplicates are found by Hamming distance among the rows the location
+    # GiST index returns; a B-tree on the hash cannot serve that and only costs writes
+    op.drop_index(op.f('ix_imagesubmission_perceptual_hash'), table_name='imagesubmission')
+
+
+def downgrade() -> None:
+    """Recreate the perceptual hash index."""
+    op.create_index(op.f('ix_imagesubmission_perceptual_hash'), 'imagesubmission', ['perceptual_hash'], unique=False)
@@ -0,0 +1,28 @@
+"""Add composite (uploaded_at, id) index for keyset pagination
+
+Revision ID: a41f0c6e2d87
+Revises: 7c2e91d4a3b5
+Create Date: 2026-10-17 10:03:41.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f0c6e2d87'
+down_revision: Union[str, None] = '7c2e91d4a3b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the (uploaded_at, id) index used by /submissions/nearby page seeks."""
+    op.create_index('ix_imagesubmission_uploaded_at_id', 'imagesubmission', ['uploaded_at', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Drop the (uploaded_at, id) index."""
+    op.drop_index('ix_imagesubmission_uploaded_at_id', table_name='imagesubmission')
@@ -0,0 +1,38 @@
+"""Add unlogged authratelimit table for the shared auth rate limiter
+
+Revision ID: b6d1e8f24c70
+Revises: 5f0a9b3e7d21
+Create Date: 2026-10-17 19:12:37.604918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d1e8f24c70'
+down_revision: Union[str, None] = '5f0a9b3e7d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the authratelimit table (UNLOGGED: its rows are disposable)."""
+    op.create_table('authratelimit',
+    sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('allowed', sa.Boolean(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    prefixes=['UNLOGGED']
+    )
+    op.create_index(op.f('ix_authratelimit_updated_at'), 'authratelimit', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the authratelimit table."""
+    op.drop_index(op.f('ix_authratelimit_updated_at'), table_name='authratelimit')
+    op.drop_table('authratelimit')
@@ -0,0 +1,44 @@
+"""Add imagesubmission.updated_at and submissiontombstone for delta sync
+
+Revision ID: c93b7d15e0fa
+Revises: a41f0c6e2d87
+Create Date: 2026-10-17 11:26:58.130447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c93b7d15e0fa'
+down_revision: Union[str, None] = 'a41f0c6e2d87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add updated_at (indexed) and the tombstone table for deleted submissions."""
+    # Existing rows get the current UTC time (the app stores naive UTC timestamps)
+    op.add_column('imagesubmission', sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text("timezone('utc', now())")))
+    op.create_index(op.f('ix_imagesubmission_updated_at'), 'imagesubmission', ['updated_at'], unique=False)
+
+    op.create_table('submissiontombstone',
+    sa.Column('submission_id', sa.Integer(), nullable=False),
+    sa.Column('location', geoalchemy2.types.Geometry(geometry_type='POINT', srid=4326, from_text='ST_GeomFromEWKT', name='geometry', spatial_index=False), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('submission_id')
+    )
+    op.create_index('idx_submissiontombstone_location_geog', 'submissiontombstone', [sa.text('geography(location)')], unique=False, postgresql_using='gist')
+    op.create_index(op.f('ix_submissiontombstone_deleted_at'), 'submissiontombstone', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the tombstone table and updated_at."""
+    op.drop_index(op.f('ix_submissiontombstone_deleted_at'), table_name='submissiontombstone')
+    op.drop_index('idx_submissiontombstone_location_geog', table_name='submissiontombstone', postgresql_using='gist')
+    op.drop_table('submissiontombstone')
+    op.drop_index(op.f('ix_imagesubmission_updated_at'), table_name='imagesubmission')
+    op.drop_column('imagesubmission', 'updated_at')
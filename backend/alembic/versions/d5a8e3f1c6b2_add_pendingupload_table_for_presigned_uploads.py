@@ -0,0 +1,40 @@
+"""Add pendingupload table for presigned direct-to-storage uploads
+
+Revision ID: d5a8e3f1c6b2
+Revises: c93b7d15e0fa
+Create Date: 2026-10-17 12:48:10.571936
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8e3f1c6b2'
+down_revision: Union[str, None] = 'c93b7d15e0fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the pendingupload table."""
+    op.create_table('pendingupload',
+    sa.Column('object_key', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('content_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('object_key')
+    )
+    op.create_index(op.f('ix_pendingupload_created_at'), 'pendingupload', ['created_at'], unique=False)
+    op.create_index(op.f('ix_pendingupload_user_id'), 'pendingupload', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the pendingupload table."""
+    op.drop_index(op.f('ix_pendingupload_user_id'), table_name='pendingupload')
+    op.drop_index(op.f('ix_pendingupload_created_at'), table_name='pendingupload')
+    op.drop_table('pendingupload')
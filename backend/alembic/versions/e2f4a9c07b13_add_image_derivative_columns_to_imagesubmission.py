@@ -0,0 +1,37 @@
+"""Add image derivative and metadata columns to imagesubmission
+
+Revision ID: e2f4a9c07b13
+Revises: d5a8e3f1c6b2
+Create Date: 2026-10-17 13:55:32.204871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f4a9c07b13'
+down_revision: Union[str, None] = 'd5a8e3f1c6b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add thumbnail/popup URLs, size and blurhash (nullable until the pipeline fills them)."""
+    op.add_column('imagesubmission', sa.Column('thumbnail_url', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('imagesubmission', sa.Column('popup_url', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('imagesubmission', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('imagesubmission', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('imagesubmission', sa.Column('blurhash', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop the derivative columns."""
+    op.drop_column('imagesubmission', 'blurhash')
+    op.drop_column('imagesubmission', 'height')
+    op.drop_column('imagesubmission', 'width')
+    op.drop_column('imagesubmission', 'popup_url')
+    op.drop_column('imagesubmission', 'thumbnail_url')
@@ -0,0 +1,48 @@
+"""Add imageblob table and content/perceptual hash columns to imagesubmission
+
+Revision ID: f1b7c3d92e64
+Revises: e2f4a9c07b13
+Create Date: 2026-10-17 14:21:47.390516
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b7c3d92e64'
+down_revision: Union[str, None] = 'e2f4a9c07b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the refcounted imageblob table and index submissions by content and perceptual hash."""
+    op.create_table('imageblob',
+    sa.Column('sha256', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('object_key', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('content_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index(op.f('ix_imageblob_updated_at'), 'imageblob', ['updated_at'], unique=False)
+    # Existing submissions keep content_hash NULL: they own their object and are not refcounted
+    op.add_column('imagesubmission', sa.Column('content_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+    op.add_column('imagesubmission', sa.Column('perceptual_hash', sa.BigInteger(), nullable=True))
+    op.create_index(op.f('ix_imagesubmission_content_hash'), 'imagesubmission', ['content_hash'], unique=False)
+    op.create_index(op.f('ix_imagesubmission_perceptual_hash'), 'imagesubmission', ['perceptual_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the hash columns and the imageblob table."""
+    op.drop_index(op.f('ix_imagesubmission_perceptual_hash'), table_name='imagesubmission')
+    op.drop_index(op.f('ix_imagesubmission_content_hash'), table_name='imagesubmission')
+    op.drop_column('imagesubmission', 'perceptual_hash')
+    op.drop_column('imagesubmission', 'content_hash')
+    op.drop_index(op.f('ix_imageblob_updated_at'), table_name='imageblob')
+    op.drop_table('imageblob')
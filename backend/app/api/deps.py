@@ -0,0 +1,78 @@
+import time
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import attributes, configure_mappers, make_transient_to_detached
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.cache import principal_cache, token_cache
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.crud import crud_user
+from app.db.session import get_db
+from app.models.user import User
+
+# Bearer token from the Authorization header, issued by /auth/login (or the Google callback)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+
+def _credentials_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _token_subject(token: str) -> Optional[str]:
+    """
+    Email (`sub`) of a valid access token, or None. Verified tokens are cached
+    until they expire, so repeat requests skip the signature check.
+    """
+    email = token_cache.get(token)
+    if email is not None:
+        return email
+    payload = decode_access_token(token) # Checks signature and expiry
+    if payload is None or not isinstance(payload.get("sub"), str):
+        return None
+    email = payload["sub"]
+    token_cache.set(token, email, payload.get("exp", 0) - time.time(), size=1)
+    return email
+
+def _principal(user: User) -> dict:
+    """Column values of a user row, as kept in the principal cache."""
+    return {column.name: getattr(user, column.name) for column in User.__table__.columns}
+
+def _detached_user(principal: dict) -> User:
+    """
+    A new User for this request from cached column values. It is detached, like
+    an object loaded by a closed session: it can be added to the request's session
+    to update the row, and changing it does not touch the cache.
+    Attributes are filled in the way the ORM loads rows: User(**principal) would
+    validate every field, which costs more than the cache saves.
+    """
+    configure_mappers() # No-op once the models are set up
+    user = attributes.manager_of_class(User).new_instance()
+    attributes.instance_dict(user).update(principal)
+    make_transient_to_detached(user)
+    return user
+
+async def get_current_active_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """
+    FastAPI dependency that returns the user of the bearer token (by its `sub`
+    email), or responds 401. Cached tokens and principals need no database round-trip
+    (the session stays unused); crud_user invalidates principals on updates.
+    """
+    email = _token_subject(token)
+    if email is None:
+        raise _credentials_error()
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return _detached_user(principal)
+    user = await crud_user.get_user_by_email(db, email=email)
+    if user is None:
+        raise _credentials_error()
+    principal_cache.set(email, _principal(user), settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS, size=1)
+    return user
@@ -1,74 +1,91 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.responses import RedirectResponse # Needed for redirect
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Any
-from authlib.integrations.starlette_client import OAuth, OAuthError # Import Authlib
-import uuid # For generating placeholder password/state
+import secrets # For the OAuth state and nonce
 
 from app import crud
-from app.core.security import create_access_token, verify_password
+from app.core import oidc
+from app.core.ratelimit import check_auth_rate_limit
+from app.core.security import PasswordHasherBusy, create_access_token, verify_and_update_password
 from app.db.session import get_db
 from app.models.token import Token
 from app.models.user import User, UserCreate, UserRead # Import User model
 from app.core.config import settings # Import settings for OAuth config
 
-# Configure Authlib OAuth client
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=settings.GOOGLE_CLIENT_ID,
-    client_secret=settings.GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={
-        'scope': 'openid email profile'
-    }
-)
-
 router = APIRouter()
 
+def _hasher_busy_error() -> HTTPException:
+    # The password hashing pool is saturated; the client should retry shortly
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts in progress, please retry.",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/login", response_model=Token)
-def login_for_access_token(
-    db: Session = Depends(get_db),
+async def login_for_access_token(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests.
+    Attempts are rate limited per client IP and per email (429 with Retry-After).
     """
-    user = crud.crud_user.get_user_by_email(db, email=form_data.username) # Use email as username
-    if not user:
+    await check_auth_rate_limit(request, form_data.username) # Before any lookup or hashing
+    user = await crud.crud_user.get_user_by_email(db, email=form_data.username) # Use email as username
+    if not user or not user.hashed_password: # Google-only accounts have no password
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    if not verify_password(form_data.password, user.hashed_password):
+    # bcrypt is CPU-bound; verified in the password hashing pool
+    try:
+        valid, new_hash = await verify_and_update_password(form_data.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _hasher_busy_error()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # The stored hash predates the current cost parameters: store the rehash
+        try:
+            await crud.crud_user.update_password_hash(db, user=user, hashed_password=new_hash)
+        except Exception as e:
+            print(f"Error storing rehashed password: {e}") # Log the error; the login still succeeds
     access_token = create_access_token(
         data={"sub": user.email} # Use email as the JWT subject
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=UserRead)
-def register_new_user(
+async def register_new_user(
     *,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     user_in: UserCreate
 ) -> Any:
     """
     Create new user.
+    Attempts are rate limited like logins.
     """
-    user = crud.crud_user.get_user_by_email(db, email=user_in.email)
+    await check_auth_rate_limit(request, user_in.email) # Before any lookup or hashing
+    user = await crud.crud_user.get_user_by_email(db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="The user with this email already exists in the system.",
         )
-    user = crud.crud_user.create_user(db=db, user_in=user_in)
+    try:
+        user = await crud.crud_user.create_user(db=db, user_in=user_in)
+    except PasswordHasherBusy:
+        raise _hasher_busy_error()
     return user
 
 
@@ -76,78 +93,73 @@ def register_new_user(
 async def login_via_google(request: Request):
     """
     Initiate Google OAuth login flow.
+    The state (CSRF) and nonce (id_token replay) are kept in the session cookie.
     """
-    redirect_uri = settings.GOOGLE_REDIRECT_URI # Use configured redirect URI
-    # Generate a random state string (optional but recommended for security)
-    state = str(uuid.uuid4())
-    request.session['oauth_state'] = state # Store state in session
-    return await oauth.google.authorize_redirect(request, redirect_uri, state=state)
+    state = secrets.token_urlsafe(24)
+    nonce = secrets.token_urlsafe(24)
+    request.session['oauth_state'] = state
+    request.session['oauth_nonce'] = nonce
+    try:
+        url = await oidc.google.authorization_url(redirect_uri=settings.GOOGLE_REDIRECT_URI, state=state, nonce=nonce)
+    except oidc.OIDCError as error:
+        print(f"OAuth Error: {error}") # Log the error
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Google login is not available right now.',
+        )
+    return RedirectResponse(url=url)
 
 
 @router.get("/google/callback") # Removed response_model=Token
-async def google_auth_callback(request: Request, db: Session = Depends(get_db)):
+async def google_auth_callback(request: Request, db: AsyncSession = Depends(get_db)):
     """
     Handle the callback from Google after user authorization.
+    The code is exchanged for tokens and the id_token is verified locally with the
+    cached Google signing keys; its claims identify the user (no userinfo call).
     """
-    # Check state for CSRF protection (optional but recommended)
-    # received_state = request.query_params.get('state')
-    # stored_state = request.session.pop('oauth_state', None)
-    # if not stored_state or stored_state != received_state:
-    #     raise HTTPException(status_code=400, detail="Invalid state parameter")
-
+    # Check state for CSRF protection
+    received_state = request.query_params.get('state')
+    stored_state = request.session.pop('oauth_state', None)
+    nonce = request.session.pop('oauth_nonce', None)
+    if not stored_state or not received_state or not secrets.compare_digest(stored_state, received_state):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid state parameter")
+
+    code = request.query_params.get('code')
     try:
-        token = await oauth.google.authorize_access_token(request)
-    except OAuthError as error:
-        print(f"OAuth Error: {error.error}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f'Could not validate Google credentials: {error.error}',
-            headers={"WWW-Authenticate": "Bearer"},
+        if not code:
+            raise oidc.OIDCError(request.query_params.get('error', 'missing authorization code'))
+        token = await oidc.google.exchange_code(code=code, redirect_uri=settings.GOOGLE_REDIRECT_URI)
+        if 'id_token' not in token:
+            raise oidc.OIDCError('no id_token in the token response')
+        claims = await oidc.google.verify_id_token(
+            token['id_token'], nonce=nonce, access_token=token.get('access_token')
         )
-
-    user_info = token.get('userinfo')
-    if not user_info:
+    except oidc.OIDCError as error:
+        print(f"OAuth Error: {error}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail='Could not fetch user info from Google.',
+            detail=f'Could not validate Google credentials: {error}',
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    google_id = user_info.get('sub')
-    email = user_info.get('email')
-    avatar_url = user_info.get('picture') # Get avatar URL
+    google_id = claims.get('sub')
+    email = claims.get('email')
+    avatar_url = claims.get('picture') # Get avatar URL
 
-    if not email:
+    if not email or not claims.get('email_verified'):
+         # The email links to existing accounts, so it must be verified by Google
          raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail='Email not provided by Google.',
+            detail='Verified email not provided by Google.',
         )
 
     # --- User Lookup/Creation Logic ---
-    # 1. Check if user exists by google_id
-    user = crud.crud_user.get_user_by_google_id(db, google_id=google_id) # Needs implementation
-
-    if not user:
-        # 2. If not found by google_id, check by email
-        user = crud.crud_user.get_user_by_email(db, email=email)
-        if user:
-            # 2a. User exists with this email but no google_id - link account
-            # Ensure user doesn't already have a different google_id? (optional check)
-            user = crud.crud_user.update_user_google_id(db, user=user, google_id=google_id, avatar_url=avatar_url) # Needs implementation
-        else:
-            # 2b. No user found by email or google_id - create new user
-            # Note: Requires User model hashed_password to be nullable
-            # and crud function to handle null password
-            user = crud.crud_user.create_user_with_google(
-                db,
-                email=email,
-                google_id=google_id,
-                avatar_url=avatar_url
-            ) # Needs implementation
-
-    if not user:
-         # Should not happen if CRUD functions work correctly
-         raise HTTPException(
+    # Linked account, else link the account with this email, else create one (single statement)
+    try:
+        user = await crud.crud_user.upsert_google_user(db, email=email, google_id=google_id, avatar_url=avatar_url)
+    except Exception as e:
+        print(f"Error upserting Google user: {e}") # Log the error
+        raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail='Could not retrieve or create user account.',
         )
@@ -162,6 +174,3 @@ async def google_auth_callback(request: Request, db: Session = Depends(get_db)):
 
     # Redirect the user back to the frontend
     return RedirectResponse(url=redirect_url)
-
-# Note: Need to add Starlette SessionMiddleware to the main FastAPI app
-# for request.session to work for state management.
\ No newline at end of file
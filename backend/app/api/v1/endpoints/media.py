@@ -0,0 +1,153 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+from starlette.concurrency import run_in_threadpool
+from typing import Any, AsyncIterator, List
+
+from app.core.storage import LocalStorage, StorageError, get_storage
+
+# Serves and receives images for STORAGE_BACKEND=local. Only mounted (under /media)
+# when the local backend is active; with S3, clients talk to the bucket directly.
+
+router = APIRouter()
+
+# Stored objects never change under the same key (new content gets a new key)
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Room for the form's other fields and the part boundaries on top of the file's max_bytes
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+def _local_storage() -> LocalStorage:
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return storage
+
+@router.post("/upload", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_media(request: Request) -> Response:
+    """
+    Target of presigned uploads (see LocalStorage.presigned_upload): a form POST
+    with the signed fields followed by the file, like an S3 POST policy upload.
+    The policy is checked from the query string before any of the body is read,
+    and the file part is streamed to storage, aborted once it exceeds max_bytes.
+    """
+    storage = _local_storage()
+    policy = dict(request.query_params)
+    if not storage.verify_upload(policy):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired upload policy.")
+    max_bytes = int(policy["max_bytes"])
+    max_body_bytes = max_bytes + FORM_OVERHEAD_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Upload size is not allowed.")
+
+    try:
+        writer = await storage.begin_multipart(policy["key"], policy["Content-Type"])
+        size = 0
+        try:
+            async for chunk in _form_file_chunks(request, max_body_bytes):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Upload size is not allowed.")
+                await writer.write_part(chunk)
+            if size == 0:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Upload size is not allowed.")
+            await writer.complete()
+        except BaseException: # Includes ClientDisconnect from the request stream
+            await writer.abort()
+            raise
+    except StorageError as e:
+        print(f"Local storage upload error: {e}") # Log the error
+        raise HTTPException(status_code=500, detail="Failed to store image.")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+async def _form_file_chunks(request: Request, max_body_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Yields the data of the form's "file" part as the body arrives (other parts are
+    skipped). Raises 413 once the body exceeds max_body_bytes, 400 if it is not a form.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload.")
+
+    # The parser calls back synchronously; file data is collected per body chunk
+    pending: List[bytes] = []
+    part = {"header_field": b"", "header_value": b"", "headers": {}, "is_file": False, "file_done": False}
+
+    def on_part_begin() -> None:
+        part["headers"] = {}
+        part["is_file"] = False
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        part["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        part["header_value"] += data[start:end]
+
+    def on_header_end() -> None:
+        part["headers"][part["header_field"].lower()] = part["header_value"]
+        part["header_field"] = part["header_value"] = b""
+
+    def on_headers_finished() -> None:
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["is_file"] = options.get(b"name") == b"file"
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if part["is_file"]:
+            pending.append(data[start:end])
+
+    def on_part_end() -> None:
+        if part["is_file"]:
+            part["file_done"] = True
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    received = 0
+    async for body_chunk in request.stream():
+        received += len(body_chunk)
+        if received > max_body_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Upload size is not allowed.")
+        try:
+            parser.write(body_chunk)
+        except MultipartParseError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed form data.")
+        for data in pending:
+            yield data
+        pending.clear()
+    parser.finalize()
+    if not part["file_done"]:
+        # No file part, or the body ended in the middle of it
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing or incomplete file.")
+
+@router.get("/{key:path}")
+async def get_media(key: str, request: Request) -> Any:
+    """
+    Serves a stored file. FileResponse handles Range/If-Range requests and uses the
+    server's zero-copy path (http.response.pathsend) when available; the ETag is the
+    SHA-256 of the content, so conditional requests are answered with 304.
+    """
+    storage = _local_storage()
+    try:
+        path = storage.path(key)
+        info = await run_in_threadpool(storage.stat, key)
+    except StorageError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if info is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    headers = {"Cache-Control": MEDIA_CACHE_CONTROL}
+    if info.etag:
+        headers["ETag"] = info.etag
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or info.etag in [tag.strip() for tag in if_none_match.split(",")]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(path, media_type=info.content_type, headers=headers)
@@ -0,0 +1,63 @@
+from fastapi import APIRouter
+from typing import Any
+
+from app.core import oidc
+from app.core.cache import nearby_cache, principal_cache, tile_cache, token_cache
+from app.core.ratelimit import get_rate_limiter
+from app.core.reapers import reaper_stats
+from app.core.security import password_pool_stats
+from app.core.votes import vote_buffer
+from app.db.session import pool_stats
+
+router = APIRouter()
+
+@router.get("/cache")
+def read_cache_stats() -> Any:
+    """
+    Hit/miss/eviction counters and sizes of the in-process caches,
+    for tuning cell size, TTLs and size limits.
+    """
+    return {
+        "nearby": nearby_cache.stats(),
+        "tiles": tile_cache.stats(),
+    }
+
+@router.get("/db")
+def read_db_stats() -> Any:
+    """
+    Connection pool usage of the primary and replica engines in this worker,
+    replica health and lag, and how reads were routed, for tuning pool sizes.
+    """
+    return pool_stats()
+
+@router.get("/votes")
+def read_vote_stats() -> Any:
+    """
+    Votes waiting in this worker's write-behind buffer, and how many votes,
+    flushes and submission counter updates it has handled.
+    """
+    return vote_buffer.stats()
+
+@router.get("/reapers")
+def read_reaper_stats() -> Any:
+    """
+    Rows, storage objects and bytes removed by each background reaper in this
+    worker since startup, with the time and duration of its last run.
+    """
+    return {name: stats.as_dict() for name, stats in reaper_stats.items()}
+
+@router.get("/auth")
+def read_auth_stats() -> Any:
+    """
+    Password hashing pool load (waiting calls, rehashes, calls rejected because
+    the queue was full), login/registration attempts allowed and rejected by the
+    rate limiter, the token and principal caches of this worker, and the Google
+    OIDC client (discovery/JWKS fetches, id_tokens verified and rejected).
+    """
+    return {
+        "password_hashing": password_pool_stats(),
+        "rate_limit": get_rate_limiter().stats(),
+        "token_cache": token_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "oidc": oidc.google.stats(),
+    }
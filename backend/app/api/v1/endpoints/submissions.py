@@ -1,27 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
-from sqlmodel import Session
-from typing import Optional, Any, List # Import List
-import boto3
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Any, AsyncIterator, List, Tuple, Union # Import List
 import uuid
-from botocore.exceptions import ClientError # Import ClientError for boto3 exceptions
+import datetime
+import hashlib
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.models.user import User
-from app.models.image_submission import ImageSubmissionCreate, ImageSubmissionRead, ImageSubmissionUpdate # Import Update schema
-from app.crud import crud_image_submission
-# Assuming a dependency function exists to get the current user
-# from app.api.deps import get_current_active_user
-from app.models.user import User # Temporary: Replace with actual dependency import
+from app.models.image_submission import ImageSubmission, ImageSubmissionCreate, ImageSubmissionListItem, ImageSubmissionRead, ImageSubmissionUpdate, NearbyDelta, NearbyFormat, NearbySort, SubmissionCluster, SubmissionsInBounds # Import Update schema
+from app.models.pending_upload import SubmissionFinalize, UploadUrlRead, UploadUrlRequest
+from app.models.vote import VoteBatch, VoteCounts, VoteValue
+from app.crud import crud_image_blob, crud_image_submission, crud_pending_upload, crud_vote
+from app.api.deps import get_current_active_user
 from app.core.config import settings # Import settings for AWS credentials
-
-# Placeholder for the dependency - replace with actual implementation
-async def get_current_active_user(db: Session = Depends(get_db)) -> User:
-    # In a real app, this would verify JWT and fetch user
-    # For now, returning the first user found for basic testing (NOT FOR PRODUCTION)
-    user = db.query(User).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found for placeholder dependency")
-    return user
+from app.core import images, ingest
+from app.core.storage import StorageError, get_storage
+from app.core.pagination import cursor_basis, encode_cursor, decode_cursor, encode_sync_token, decode_sync_token
+from app.core.geo import haversine_m, point_wkt
+from app.core.responses import GEOJSON_MEDIA_TYPE, NDJSON_MEDIA_TYPE, ORJSONResponse, dumps, stream_features
+from app.core.cache import NearbyCacheKey, nearby_cache, nearby_cache_key, tile_cache
+from app.core.votes import vote_buffer, vote_buffering_enabled
 
 
 router = APIRouter()
@@ -29,7 +29,8 @@ router = APIRouter()
 @router.post("/", response_model=ImageSubmissionRead, status_code=status.HTTP_201_CREATED)
 async def create_submission(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     # Use Form(...) for fields alongside File(...)
     description: Optional[str] = Form(None),
@@ -39,42 +40,43 @@ async def create_submission(
 ) -> Any:
     """
     Create new image submission. Requires authentication.
-    Handles image upload and saves metadata.
+    Handles image upload and saves metadata. Thumbnails are generated in the
+    background after the response is sent.
     """
     # Basic validation for the uploaded file (can be expanded)
     if not image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Uploaded file must be an image.")
 
     # --- S3 Upload Logic ---
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_REGION
-    )
-    bucket_name = settings.S3_BUCKET_NAME
-
-    # Generate a unique filename using UUID and preserve original extension
+    # Originals are stored by content: blobs/{sha256}-{suffix}.{ext}. Re-uploads of the same
+    # bytes reuse the stored object (refcounted in ImageBlob) instead of writing it again.
     file_extension = image.filename.split('.')[-1] if '.' in image.filename else 'jpg' # Default to jpg if no extension
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    object_key = f"submissions/{unique_filename}" # Store in a 'submissions' folder in the bucket
-
     try:
-        s3_client.upload_fileobj(
-            image.file,       # The file-like object from UploadFile
-            bucket_name,      # Bucket name
-            object_key,       # Key (path/filename) in the bucket
-            ExtraArgs={'ContentType': image.content_type} # Set content type for proper browser handling
-        )
-        # Construct the URL (consider using CloudFront in production for better performance/security)
-        image_url = f"https://{bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{object_key}"
-        print(f"Successfully uploaded {object_key} to {bucket_name}. URL: {image_url}")
-
-    except ClientError as e:
-        print(f"S3 Upload Error: {e}") # Log the error
+        content_hash, size = await run_in_threadpool(_hash_file, image.file)
+        # Take the reference before deciding whether to upload: the blob row stays locked
+        # until the submission is committed, so the blob reaper cannot remove a stored
+        # original between the lookup and its reuse. A new blob gets a fresh key, so an
+        # object of an older blob with the same content that the reaper is still
+        # deleting is never overwritten.
+        object_key, created = await crud_image_blob.acquire_blob(
+            db,
+            sha256=content_hash,
+            object_key=f"blobs/{content_hash}-{uuid.uuid4().hex[:8]}.{file_extension}",
+            content_type=image.content_type,
+            size=size,
+        )
+        if created:
+            # Runs off the event loop, so it keeps serving other requests
+            await get_storage().save(image.file, object_key, image.content_type)
+            print(f"Successfully stored {object_key}.")
+        else:
+            print(f"Reusing stored image {object_key} for identical upload.")
+
+    except StorageError as e:
+        print(f"Storage Upload Error: {e}") # Log the error
         raise HTTPException(status_code=500, detail="Failed to upload image to storage.")
     except Exception as e: # Catch other potential errors during upload
-        print(f"Unexpected error during S3 upload: {e}")
+        print(f"Unexpected error during image upload: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred during image upload.")
     finally:
         # Ensure the file cursor is closed, though FastAPI might handle this
@@ -88,56 +90,620 @@ async def create_submission(
     )
 
     try:
-        submission = crud_image_submission.create_image_submission(
+        # The blob reference is committed together with the submission
+        submission = await crud_image_submission.create_image_submission(
             db=db,
             submission_in=submission_in,
             user=current_user,
-            image_url=image_url
+            image_url=get_storage().url(object_key),
+            content_hash=content_hash
         )
+        background_tasks.add_task(images.generate_derivatives, submission.id, object_key, content_hash)
         return submission
     except Exception as e:
         # Basic error handling, can be more specific
         print(f"Error creating submission: {e}") # Log the error
-        # Consider deleting the uploaded S3 object if DB save fails
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not create image submission.",
         )
 
-@router.get("/nearby", response_model=List[ImageSubmissionRead])
-def get_nearby_submissions_endpoint(
+def _hash_file(file) -> tuple:
+    """Returns (SHA-256 hex digest, size) of a spooled upload, rewinding it afterwards."""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in iter(lambda: file.read(1024 * 1024), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+@router.post("/stream", response_model=ImageSubmissionRead, status_code=status.HTTP_201_CREATED)
+async def create_submission_streaming(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    description: Optional[str] = Query(None),
+) -> Any:
+    """
+    Create new image submission from a raw image request body. Requires authentication.
+    The body is streamed to storage as it arrives (no spooling to disk), the image
+    type is taken from the file's magic bytes, and uploads over UPLOAD_MAX_BYTES
+    are rejected as soon as the limit is crossed.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large.")
+
+    try:
+        result = await ingest.ingest_stream(request.stream(), key_prefix=f"submissions/{uuid.uuid4()}")
+        print(f"Streamed {result.object_key} ({result.size} bytes, sha256 {result.sha256}) to storage.")
+    except ingest.UploadTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large.")
+    except ingest.UnsupportedImageType:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Uploaded file must be a JPEG, PNG, GIF, WebP or HEIC image.")
+    except StorageError as e:
+        print(f"Storage Upload Error: {e}") # Log the error
+        raise HTTPException(status_code=500, detail="Failed to upload image to storage.")
+
+    submission_in = ImageSubmissionCreate(
+        description=description,
+        latitude=latitude,
+        longitude=longitude
+    )
+    try:
+        # If the same content is already stored, the submission uses that object
+        # and the streamed copy is removed below
+        object_key, _ = await crud_image_blob.acquire_blob(
+            db, sha256=result.sha256, object_key=result.object_key, content_type=result.content_type, size=result.size
+        )
+        submission = await crud_image_submission.create_image_submission(
+            db=db,
+            submission_in=submission_in,
+            user=current_user,
+            image_url=get_storage().url(object_key),
+            content_hash=result.sha256
+        )
+        if object_key != result.object_key:
+            background_tasks.add_task(get_storage().delete_objects_async, [result.object_key])
+        background_tasks.add_task(images.generate_derivatives, submission.id, object_key, result.sha256)
+        return submission
+    except Exception as e:
+        print(f"Error creating submission: {e}") # Log the error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not create image submission.",
+        )
+
+@router.post("/upload-url", response_model=UploadUrlRead)
+async def create_upload_url(
+    *,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    upload_in: UploadUrlRequest,
+) -> Any:
+    """
+    Step 1 of a direct-to-storage upload. Requires authentication.
+    Returns a presigned POST for a fresh submissions/{uuid} key; the client uploads
+    the image straight to storage, then calls /finalize with the returned object_key.
+    """
+    if not upload_in.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Uploaded file must be an image.")
+
+    object_key = f"submissions/{uuid.uuid4()}"
+    try:
+        presigned = get_storage().presigned_upload(
+            object_key,
+            upload_in.content_type,
+            max_bytes=settings.UPLOAD_MAX_BYTES,
+            expires_in=settings.UPLOAD_URL_EXPIRE_SECONDS,
+        )
+    except StorageError as e:
+        print(f"Storage Presign Error: {e}") # Log the error
+        raise HTTPException(status_code=500, detail="Could not create upload URL.")
+
+    # Remember the key so the reaper can remove the object if it is never finalized
+    await crud_pending_upload.create_pending_upload(
+        db, object_key=object_key, user_id=current_user.id, content_type=upload_in.content_type
+    )
+    return UploadUrlRead(
+        object_key=object_key,
+        url=presigned["url"],
+        fields=presigned["fields"],
+        expires_in=settings.UPLOAD_URL_EXPIRE_SECONDS,
+        max_bytes=settings.UPLOAD_MAX_BYTES,
+    )
+
+@router.post("/finalize", response_model=ImageSubmissionRead, status_code=status.HTTP_201_CREATED)
+async def finalize_submission(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    finalize_in: SubmissionFinalize,
+) -> Any:
+    """
+    Step 2 of a direct-to-storage upload. Requires authentication.
+    Checks the uploaded object and creates the submission for it.
+    Thumbnails are generated in the background after the response is sent.
+    """
+    pending = await crud_pending_upload.get_pending_upload(db, object_key=finalize_in.object_key)
+    if not pending or pending.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+
+    try:
+        head = await get_storage().head(pending.object_key)
+    except StorageError as e:
+        print(f"Storage Head Error: {e}") # Log the error
+        raise HTTPException(status_code=500, detail="Could not check uploaded image.")
+    if head is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image has not been uploaded yet.")
+    # The presigned policy already enforces these; double-check before accepting the object
+    if head.size > settings.UPLOAD_MAX_BYTES or not head.content_type.startswith("image/"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file must be an image.")
+
+    submission_in = ImageSubmissionCreate(
+        description=finalize_in.description,
+        latitude=finalize_in.latitude,
+        longitude=finalize_in.longitude
+    )
+    object_key = pending.object_key
+    content_type = pending.content_type
+    try:
+        # The pending row is removed in the same commit that creates the submission
+        await crud_pending_upload.consume_pending_upload(db, pending=pending)
+        submission = await crud_image_submission.create_image_submission(
+            db=db,
+            submission_in=submission_in,
+            user=current_user,
+            image_url=get_storage().url(object_key)
+        )
+        # The original is hashed (and deduplicated) by the background task
+        background_tasks.add_task(
+            images.generate_derivatives, submission.id, object_key, content_type=content_type
+        )
+        return submission
+    except Exception as e:
+        print(f"Error finalizing submission: {e}") # Log the error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not create image submission.",
+        )
+
+def _submission_read(submission: ImageSubmission, **update: Any) -> ImageSubmissionRead:
+    """ImageSubmissionRead of a submission, with the votes still in the vote buffer counted."""
+    up, down = vote_buffer.count_deltas(submission.id)
+    if up or down:
+        update["thumbs_up_count"] = submission.thumbs_up_count + up
+        update["thumbs_down_count"] = submission.thumbs_down_count + down
+    return ImageSubmissionRead.model_validate(submission, update=update)
+
+async def _rows_with_buffered_votes(rows: AsyncIterator[Any]) -> AsyncIterator[dict]:
+    async for row in rows:
+        yield vote_buffer.overlay(dict(row))
+
+def _nearby_page_response(body: bytes, next_cursor: Optional[str], sync_token: str) -> Response:
+    """
+    Wraps a serialized nearby page, adding the X-Sync-Token header and the
+    X-Next-Cursor header if there is a next page.
+    """
+    headers = {"X-Sync-Token": sync_token}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return ORJSONResponse(content=body, headers=headers)
+
+# Distance cursors from cached areas carry this basis: their distances are haversine
+# distances computed here, while database queries use PostGIS's spheroidal distance.
+# A distance cursor is only resumed on the basis it was issued on, so pages never skip
+# or repeat rows at the boundary.
+HAVERSINE_CURSOR_BASIS = "haversine"
+
+def _new_sync_token(now: datetime.datetime) -> str:
+    """Creates a sync token for a query run at `now`, backdated by SYNC_TOKEN_SKEW_SECONDS."""
+    return encode_sync_token(now - datetime.timedelta(seconds=settings.SYNC_TOKEN_SKEW_SECONDS))
+
+@router.get("/nearby", response_model=Union[List[ImageSubmissionListItem], NearbyDelta])
+async def get_nearby_submissions_endpoint(
+    *,
+    db: AsyncSession = Depends(get_read_db),
     latitude: float,
     longitude: float,
-    radius_km: float = 5.0 # Default radius of 5km
+    radius_km: float = 5.0, # Default radius of 5km
+    sort: NearbySort = "newest", # "newest" or "distance"
+    limit: int = Query(default=settings.NEARBY_DEFAULT_LIMIT, ge=1),
+    cursor: Optional[str] = None, # Opaque cursor from the X-Next-Cursor header of the previous page
+    since: Optional[str] = None, # Sync token (X-Sync-Token header or `since` of the last delta)
+    output_format: NearbyFormat = Query(default="json", alias="format"), # "json", "geojson" or "ndjson"
     # No authentication needed for this endpoint as per plan (can be added later if required)
     # current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Retrieve image submissions within a specified radius (in kilometers)
     of a given latitude and longitude. Filters out expired submissions.
+    Each result includes its distance from the given point in meters and its
+    latitude and longitude (location_wkt is kept for older clients).
+
+    Results are paged: at most `limit` items are returned (capped at NEARBY_MAX_LIMIT).
+    If more results exist, the X-Next-Cursor response header holds the cursor for the next page.
+
+    Results come from the in-process cache of the query's area: all submissions
+    within the NEARBY_CACHE_RADIUS_STEP_KM radius bucket of the geohash cell
+    (NEARBY_CACHE_GEOHASH_PRECISION) around the point, so repeated queries around
+    the same spot share one database query. Each request filters the area to its
+    own point and radius; distances are measured from the given point. Distance
+    cursors record whether they came from a cached area or from the database and are
+    resumed the same way; if a cached area has since grown too large to cache, such a
+    cursor is rejected with 400 and the client starts over from the first page.
+
+    Every full response carries an X-Sync-Token header. Passing it back as `since`
+    (with the same location and radius) switches to delta mode: the response is a
+    NearbyDelta with the submissions created or updated since the token, the IDs of
+    submissions deleted or expired since then, and a new token.
+
+    `format=geojson` streams a GeoJSON FeatureCollection and `format=ndjson` one
+    GeoJSON feature per line, for clients pulling large areas: up to
+    NEARBY_STREAM_MAX_LIMIT rows are read through a server-side cursor and sent
+    as they arrive, without caching or a next-page cursor.
+    """
+    if since:
+        if output_format != "json":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Delta sync (since) is only available with format=json.",
+            )
+        return await _get_nearby_delta(
+            db=db, latitude=latitude, longitude=longitude, radius_km=radius_km, since=since
+        )
+
+    after, basis = None, None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort)
+            basis = cursor_basis(cursor) if sort == "distance" else None
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if basis is not None and basis != HAVERSINE_CURSOR_BASIS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor: unknown basis")
+    if output_format != "json":
+        if basis == HAVERSINE_CURSOR_BASIS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="This cursor can only be resumed with format=json.",
+            )
+        return await _stream_nearby(
+            db=db, latitude=latitude, longitude=longitude, radius_km=radius_km, sort=sort,
+            limit=limit, after=after, output_format=output_format,
+        )
+
+    limit = min(limit, settings.NEARBY_MAX_LIMIT)
+
+    # A distance cursor from the database keeps paging there, even if the area is cached now
+    resume_in_db = sort == "distance" and after is not None and basis is None
+    results: Optional[List[dict]] = None
+    try:
+        if resume_in_db:
+            rows, sync_token = None, _new_sync_token(datetime.datetime.utcnow())
+        else:
+            key = nearby_cache_key(latitude, longitude, radius_km)
+            area = nearby_cache.get(key)
+            if area is None:
+                area = await _load_nearby_area(db, key)
+            rows, sync_token = area
+        # Fetch one extra row to find out whether another page exists
+        if rows is None and basis == HAVERSINE_CURSOR_BASIS:
+            pass # The area was cached when the cursor was issued but is too large now
+        elif rows is None:
+            # Too many submissions to keep the area cached: query for this point
+            next_basis = None
+            results = await crud_image_submission.get_nearby_submissions(
+                db=db,
+                latitude=latitude,
+                longitude=longitude,
+                radius_km=radius_km,
+                sort=sort,
+                limit=limit + 1,
+                after=after
+            )
+            for row in results:
+                row["location_wkt"] = point_wkt(row["longitude"], row["latitude"])
+        else:
+            next_basis = HAVERSINE_CURSOR_BASIS if sort == "distance" else None
+            results = _page_nearby_rows(
+                rows, latitude=latitude, longitude=longitude, radius_km=radius_km, sort=sort, limit=limit + 1, after=after
+            )
+        if results is not None:
+            next_cursor = None
+            if len(results) > limit:
+                results = results[:limit]
+                last = results[-1]
+                sort_value = last["distance_m"] if sort == "distance" else last["uploaded_at"]
+                next_cursor = encode_cursor(sort, (sort_value, last["id"]), next_basis)
+            for row in results:
+                vote_buffer.overlay(row) # Cached rows hold the stored counts; add votes not yet written
+            # Rows go to JSON as they are (no model validation); WKT is kept for older clients
+            body = dumps(results)
+    except Exception as e:
+        # Basic error handling for potential DB or GeoAlchemy errors
+        print(f"Error fetching nearby submissions: {e}") # Log the error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not fetch nearby submissions.",
+        )
+    if results is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This cursor has expired, please reload the first page.",
+        )
+
+    return _nearby_page_response(body, next_cursor, sync_token)
+
+async def _load_nearby_area(db: AsyncSession, key: NearbyCacheKey) -> tuple:
+    """
+    Loads the submissions of a nearby cache area (within key.radius_km of the cell
+    center) and caches them as (rows, sync token); rows is None if the area holds
+    more than NEARBY_CACHE_MAX_ROWS submissions.
+    """
+    sync_token = _new_sync_token(datetime.datetime.utcnow())
+    rows = await crud_image_submission.get_nearby_submissions(
+        db=db,
+        latitude=key.latitude,
+        longitude=key.longitude,
+        radius_km=key.radius_km,
+        limit=settings.NEARBY_CACHE_MAX_ROWS + 1
+    )
+    if len(rows) > settings.NEARBY_CACHE_MAX_ROWS:
+        rows = None
+    else:
+        for row in rows:
+            del row["distance_m"] # Measured from the cell center; each request measures its own
+            row["location_wkt"] = point_wkt(row["longitude"], row["latitude"])
+    area = (rows, sync_token)
+    nearby_cache.set(key, area, settings.NEARBY_CACHE_TTL_SECONDS, size=len(dumps(rows)))
+    return area
+
+def _page_nearby_rows(
+    rows: List[dict],
+    *,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    sort: NearbySort,
+    limit: int,
+    after: Optional[Tuple[Any, int]],
+) -> List[dict]:
+    """
+    The cached area rows within radius_km of the point, with distance_m from it,
+    ordered and paged like crud_image_submission.get_nearby_submissions. Rows that
+    expired since the area was loaded are left out, as the query would.
+    """
+    radius_m = radius_km * 1000
+    now = datetime.datetime.utcnow()
+    page = []
+    for row in rows:
+        if row["expires_at"] <= now:
+            continue
+        distance_m = haversine_m(latitude, longitude, row["latitude"], row["longitude"])
+        if distance_m <= radius_m:
+            page.append({**row, "distance_m": distance_m}) # A copy: cached rows are shared
+    if sort == "distance":
+        if after is not None:
+            page = [row for row in page if (row["distance_m"], row["id"]) > after]
+        page.sort(key=lambda row: (row["distance_m"], row["id"]))
+    else:
+        if after is not None:
+            page = [row for row in page if (row["uploaded_at"], row["id"]) < after]
+        page.sort(key=lambda row: (row["uploaded_at"], row["id"]), reverse=True)
+    return page[:limit]
+
+async def _stream_nearby(
+    *,
+    db: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    sort: NearbySort,
+    limit: int,
+    after: Optional[Tuple[Any, int]],
+    output_format: NearbyFormat,
+) -> StreamingResponse:
+    """
+    GeoJSON / NDJSON mode of /nearby. The query is started here, so errors
+    before the first row still get a 500; rows are then streamed from the
+    server-side cursor while the request's session stays open.
     """
     try:
-        submissions = crud_image_submission.get_nearby_submissions(
+        rows = await crud_image_submission.stream_nearby_submissions(
             db=db,
             latitude=latitude,
             longitude=longitude,
-            radius_km=radius_km
+            radius_km=radius_km,
+            sort=sort,
+            limit=min(limit, settings.NEARBY_STREAM_MAX_LIMIT),
+            after=after,
+            batch_size=settings.NEARBY_STREAM_BATCH_SIZE,
         )
-        return submissions
     except Exception as e:
-        # Basic error handling for potential DB or GeoAlchemy errors
-        print(f"Error fetching nearby submissions: {e}") # Log the error
+        print(f"Error streaming nearby submissions: {e}") # Log the error
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not fetch nearby submissions.",
         )
+    collection = output_format == "geojson"
+    if vote_buffering_enabled():
+        rows = _rows_with_buffered_votes(rows)
+    return StreamingResponse(
+        stream_features(rows, collection=collection),
+        media_type=GEOJSON_MEDIA_TYPE if collection else NDJSON_MEDIA_TYPE,
+    )
+
+async def _get_nearby_delta(*, db: AsyncSession, latitude: float, longitude: float, radius_km: float, since: str) -> NearbyDelta:
+    """
+    Delta mode of /nearby: changes within the radius of the point since the sync token.
+    Changed rows include buffered votes; a submission whose only change is a
+    buffered vote is listed once the vote flush has written it.
+    """
+    try:
+        since_at = decode_sync_token(since)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    now = datetime.datetime.utcnow()
+    next_token = _new_sync_token(now)
+    # Tombstones and expired rows are only kept for a submission lifetime
+    if since_at < now - datetime.timedelta(days=settings.SUBMISSION_LIFETIME_DAYS):
+        return NearbyDelta(since=next_token, reset=True)
+
+    try:
+        changed, removed = await crud_image_submission.get_nearby_changes(
+            db=db,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            since=since_at,
+            now=now,
+            limit=settings.NEARBY_MAX_LIMIT + 1
+        )
+    except Exception as e:
+        print(f"Error fetching nearby changes: {e}") # Log the error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not fetch nearby changes.",
+        )
+
+    # Too many changes for one delta: the client should reload the area instead
+    if len(changed) > settings.NEARBY_MAX_LIMIT:
+        return NearbyDelta(since=next_token, reset=True)
+
+    return NearbyDelta(
+        changed=[_submission_read(submission, distance_m=distance_m) for submission, distance_m in changed],
+        removed=removed,
+        since=next_token
+    )
+
+def _parse_bbox(bbox: str) -> tuple:
+    """
+    Parses a "min_lon,min_lat,max_lon,max_lat" string (Leaflet's toBBoxString format).
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="bbox must be 'min_lon,min_lat,max_lon,max_lat'.")
+    if min_lon >= max_lon or min_lat >= max_lat:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="bbox minimums must be smaller than maximums.")
+    # Clamp to valid coordinates (a zoomed-out map can report bounds beyond the world)
+    return (max(min_lon, -180.0), max(min_lat, -90.0), min(max_lon, 180.0), min(max_lat, 90.0))
+
+@router.get("/in_bounds", response_model=SubmissionsInBounds)
+async def get_submissions_in_bounds_endpoint(
+    *,
+    db: AsyncSession = Depends(get_read_db),
+    bbox: str, # "min_lon,min_lat,max_lon,max_lat"
+    zoom: int = Query(..., ge=0, le=22),
+) -> Any:
+    """
+    Retrieve submissions for a map viewport.
+    Below CLUSTER_MAX_ZOOM, submissions are grouped into grid-cell clusters
+    (count, centroid and a representative image); at higher zoom levels the
+    individual submissions are returned. Either way the response is capped
+    at NEARBY_MAX_LIMIT items.
+    """
+    bounds = _parse_bbox(bbox)
+    try:
+        if zoom < settings.CLUSTER_MAX_ZOOM:
+            rows = await crud_image_submission.get_submission_clusters_in_bounds(
+                db=db,
+                bbox=bounds,
+                zoom=zoom,
+                cell_px=settings.CLUSTER_CELL_PX,
+                limit=settings.NEARBY_MAX_LIMIT
+            )
+            clusters = [SubmissionCluster.model_validate(row._mapping) for row in rows]
+            return SubmissionsInBounds(zoom=zoom, clustered=True, clusters=clusters)
+
+        submissions = await crud_image_submission.get_submissions_in_bounds(
+            db=db, bbox=bounds, limit=settings.NEARBY_MAX_LIMIT
+        )
+        return SubmissionsInBounds(
+            zoom=zoom,
+            clustered=False,
+            submissions=[_submission_read(submission) for submission in submissions]
+        )
+    except Exception as e:
+        print(f"Error fetching submissions in bounds: {e}") # Log the error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not fetch submissions for this area.",
+        )
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+@router.get("/tiles/{z}/{x}/{y}.pbf", response_class=Response)
+async def get_submission_tile_endpoint(
+    *,
+    db: AsyncSession = Depends(get_read_db),
+    z: int,
+    x: int,
+    y: int,
+) -> Any:
+    """
+    Serve submissions as a Mapbox Vector Tile (layer "submissions" with
+    id, thumbs_up_count, thumbs_down_count and thumbnail_url attributes).
+    Tiles are cached in memory until their first submission expires, and
+    dropped from the cache when a submission inside them is created or deleted.
+    The counts are encoded in SQL, so buffered votes only show up after the
+    next vote flush (which also drops the affected tiles).
+    """
+    if not 0 <= z <= settings.TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tile out of range")
+
+    headers = {"Cache-Control": f"public, max-age={settings.TILE_HTTP_MAX_AGE}"}
+    tile = tile_cache.get((z, x, y))
+    if tile is not None:
+        return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=headers)
+
+    try:
+        tile, first_expiry = await crud_image_submission.get_submission_tile(db=db, z=z, x=x, y=y)
+    except Exception as e:
+        print(f"Error building tile {z}/{x}/{y}: {e}") # Log the error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not build tile.",
+        )
+
+    # Keep the tile until its first submission expires (an empty tile only changes on create)
+    ttl = datetime.timedelta(days=settings.SUBMISSION_LIFETIME_DAYS).total_seconds()
+    if first_expiry is not None:
+        ttl = min(ttl, (first_expiry - datetime.datetime.utcnow()).total_seconds())
+    tile_cache.set((z, x, y), tile, ttl)
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=headers)
+
+@router.post("/votes", response_model=List[VoteCounts])
+async def vote_batch(
+    *,
+    db: AsyncSession = Depends(get_db),
+    batch_in: VoteBatch,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Cast several votes at once (value 1 = thumbs up, -1 = thumbs down, 0 = withdraw).
+    Returns the new counts of each voted submission; unknown submissions are left out.
+    """
+    if len(batch_in.votes) > settings.VOTE_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.VOTE_BATCH_MAX_ITEMS} votes per request.",
+        )
+    return await _vote(db, user=current_user, votes=[(vote.submission_id, vote.value) for vote in batch_in.votes])
 
 @router.get("/{submission_id}", response_model=ImageSubmissionRead)
-def get_submission(
+async def get_submission(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     submission_id: int,
     # Optional: Add authentication if needed to view specific submissions
     # current_user: User = Depends(get_current_active_user),
@@ -145,17 +711,39 @@ def get_submission(
     """
     Get details of a specific image submission by ID.
     """
-    submission = crud_image_submission.get_submission_by_id(db=db, submission_id=submission_id)
+    submission = await crud_image_submission.get_submission_by_id(db=db, submission_id=submission_id)
     if not submission:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
     # Optional: Check if submission is expired and return 404 or different status?
-    return submission
+    return _submission_read(submission)
+
+@router.get("/{submission_id}/duplicates", response_model=List[ImageSubmissionRead])
+async def get_submission_duplicates(
+    *,
+    db: AsyncSession = Depends(get_read_db),
+    submission_id: int,
+    limit: int = Query(20, ge=1, le=100),
+) -> Any:
+    """
+    Get submissions that duplicate this one: identical image content, or a visually
+    near-identical image (perceptual hash) posted nearby.
+    """
+    submission = await crud_image_submission.get_submission_by_id(db=db, submission_id=submission_id)
+    if not submission:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
+    return await crud_image_submission.get_duplicate_submissions(
+        db,
+        db_submission=submission,
+        max_distance=settings.DUPLICATE_MAX_HAMMING_DISTANCE,
+        radius_m=settings.DUPLICATE_SEARCH_RADIUS_M,
+        limit=limit,
+    )
 
 
 @router.put("/{submission_id}", response_model=ImageSubmissionRead)
-def update_submission_endpoint(
+async def update_submission_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     submission_id: int,
     submission_in: ImageSubmissionUpdate,
     current_user: User = Depends(get_current_active_user),
@@ -164,13 +752,13 @@ def update_submission_endpoint(
     Update an image submission (e.g., description). Requires authentication.
     Only allowed within the first 10 minutes and by the owner.
     """
-    db_submission = crud_image_submission.get_submission_by_id(db=db, submission_id=submission_id)
+    db_submission = await crud_image_submission.get_submission_by_id(db=db, submission_id=submission_id)
     if not db_submission:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
     if db_submission.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this submission")
 
-    updated_submission = crud_image_submission.update_submission(
+    updated_submission = await crud_image_submission.update_submission(
         db=db, db_submission=db_submission, submission_in=submission_in
     )
 
@@ -185,9 +773,9 @@ def update_submission_endpoint(
 
 
 @router.delete("/{submission_id}", response_model=ImageSubmissionRead)
-def delete_submission_endpoint(
+async def delete_submission_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     submission_id: int,
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
@@ -195,14 +783,18 @@ def delete_submission_endpoint(
     Delete an image submission. Requires authentication.
     Only allowed by the owner.
     """
-    db_submission = crud_image_submission.get_submission_by_id(db=db, submission_id=submission_id)
+    db_submission = await crud_image_submission.get_submission_by_id(db=db, submission_id=submission_id)
     if not db_submission:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
     if db_submission.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this submission")
 
-    # The CRUD function handles S3 deletion placeholder and DB deletion
-    deleted_submission = crud_image_submission.delete_submission(db=db, submission_id=submission_id)
+    # The CRUD function deletes the stored objects (or releases the shared blob) and the row
+    try:
+        deleted_submission = await crud_image_submission.delete_submission(db=db, submission_id=submission_id)
+    except StorageError as e:
+        print(f"Error deleting submission {submission_id} from storage: {e}") # Log the error
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Could not delete the image, please retry.")
 
     if deleted_submission is None:
          # Should not happen if checks above pass, but good practice
@@ -212,34 +804,78 @@ def delete_submission_endpoint(
     return deleted_submission
 
 
-@router.post("/{submission_id}/thumbs_up", response_model=ImageSubmissionRead)
-def thumbs_up_submission(
+async def _vote(db: AsyncSession, *, user: User, votes: List[Tuple[int, VoteValue]]) -> List[VoteCounts]:
+    """
+    Records (submission_id, value) votes of a user and returns the new counts of each
+    submission that exists. With vote buffering, votes are only buffered here and the
+    counts include the votes still waiting to be written.
+    """
+    if not vote_buffering_enabled():
+        results = []
+        for submission_id, value in votes:
+            counts = await crud_vote.cast_vote(db=db, user_id=user.id, submission_id=submission_id, value=value)
+            if counts:
+                results.append(counts)
+        return results
+
+    states = await crud_vote.get_vote_states(
+        db=db, user_id=user.id, submission_ids=list({submission_id for submission_id, _ in votes})
+    )
+    results = []
+    for submission_id, value in votes:
+        if submission_id not in states:
+            continue
+        up, down, stored_vote = states[submission_id]
+        vote_buffer.add(user.id, submission_id, value, stored_vote)
+        delta_up, delta_down = vote_buffer.count_deltas(submission_id)
+        results.append(VoteCounts(
+            id=submission_id, thumbs_up_count=up + delta_up, thumbs_down_count=down + delta_down, user_vote=value
+        ))
+    return results
+
+async def _vote_one(db: AsyncSession, *, user: User, submission_id: int, value: VoteValue) -> VoteCounts:
+    results = await _vote(db, user=user, votes=[(submission_id, value)])
+    if not results:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
+    return results[0]
+
+
+@router.post("/{submission_id}/thumbs_up", response_model=VoteCounts)
+async def thumbs_up_submission(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     submission_id: int,
-    # No authentication needed for now, but could add:
-    # current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Add a thumbs up to a submission.
+    Vote thumbs up on a submission (replaces a thumbs down by the same user).
+    Returns the new counts.
     """
-    updated_submission = crud_image_submission.add_thumbs_up(db=db, submission_id=submission_id)
-    if not updated_submission:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
-    return updated_submission
+    return await _vote_one(db, user=current_user, submission_id=submission_id, value=1)
 
 
-@router.post("/{submission_id}/thumbs_down", response_model=ImageSubmissionRead)
-def thumbs_down_submission(
+@router.post("/{submission_id}/thumbs_down", response_model=VoteCounts)
+async def thumbs_down_submission(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     submission_id: int,
-    # No authentication needed for now
+    current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Add a thumbs down to a submission.
+    Vote thumbs down on a submission (replaces a thumbs up by the same user).
+    Returns the new counts.
     """
-    updated_submission = crud_image_submission.add_thumbs_down(db=db, submission_id=submission_id)
-    if not updated_submission:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
-    return updated_submission
\ No newline at end of file
+    return await _vote_one(db, user=current_user, submission_id=submission_id, value=-1)
+
+
+@router.delete("/{submission_id}/vote", response_model=VoteCounts)
+async def remove_vote(
+    *,
+    db: AsyncSession = Depends(get_db),
+    submission_id: int,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Withdraw the current user's vote on a submission. Returns the new counts.
+    """
+    return await _vote_one(db, user=current_user, submission_id=submission_id, value=0)
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any, Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+class PeriodicTask:
+    """
+    Runs a job every `interval` seconds for the lifetime of the application:
+    coroutine functions on the event loop, blocking functions in a worker thread. Errors are logged and the job runs again on
+    the next tick, so a failed run is simply retried.
+    """
+
+    def __init__(self, name: str, job: Callable[[], Any], interval: float):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if asyncio.iscoroutinefunction(self.job):
+                    await self.job()
+                else:
+                    await run_in_threadpool(self.job)
+            except Exception as e:
+                print(f"Background task {self.name} failed: {e}") # Log the error
+
+# Tasks started by the application lifespan
+_tasks: List[PeriodicTask] = []
+
+def start_periodic_tasks(tasks: List[PeriodicTask]) -> None:
+    """Starts the given tasks (called once at startup)."""
+    for task in tasks:
+        task.start()
+        _tasks.append(task)
+
+async def stop_periodic_tasks() -> None:
+    """Stops all tasks started by start_periodic_tasks (called at shutdown)."""
+    while _tasks:
+        await _tasks.pop().stop()
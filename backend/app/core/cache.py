@@ -0,0 +1,161 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.geo import geohash_cell, haversine_m, tiles_for_point
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache for serialized values with a per-entry
+    time-to-live and a total size limit in bytes (len() of the value unless
+    an explicit size is given).
+    Least recently used entries are evicted when the size limit is exceeded.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict() # key -> (value, expires_at, size)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, size: Optional[int] = None) -> None:
+        """Stores a value for `ttl` seconds. Values larger than the cache are not stored."""
+        if size is None:
+            size = len(value)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Removes a single entry if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes all entries whose key matches the predicate. Returns the number removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Returns counters for monitoring and tuning."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        # Caller must hold the lock
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+# --- Vector Tile Cache ---
+# Keys are (z, x, y). Entries expire when the first submission in the tile
+# expires (at most SUBMISSION_LIFETIME_DAYS), and are invalidated on writes.
+
+tile_cache = TTLCache(max_bytes=settings.TILE_CACHE_MAX_BYTES)
+
+def invalidate_tiles_for_point(lon: float, lat: float) -> None:
+    """Drops every cached tile (at all zoom levels) that can contain the point."""
+    buffer = settings.TILE_BUFFER / settings.TILE_EXTENT
+    for zoom in range(settings.TILE_MAX_ZOOM + 1):
+        for tile in tiles_for_point(lon, lat, zoom, buffer):
+            tile_cache.delete(tile)
+
+# --- Nearby Result Cache ---
+# A /submissions/nearby query is answered from the submissions of its area: every
+# submission within the radius bucket of any point of the query's geohash cell, so
+# clients around the same spot share an entry. Each request then filters the area to
+# its own point and radius, measures distances from its point and pages the result.
+# Values are (row dicts with location_wkt, or None for areas with more than
+# NEARBY_CACHE_MAX_ROWS submissions, sync token).
+
+class NearbyCacheKey(NamedTuple):
+    cell: str
+    latitude: float # Center of the geohash cell (the point the area query is run for)
+    longitude: float
+    radius_km: float # Radius bucket plus the distance from the center to the cell's corners
+
+nearby_cache = TTLCache(max_bytes=settings.NEARBY_CACHE_MAX_BYTES)
+
+def nearby_cache_key(latitude: float, longitude: float, radius_km: float) -> NearbyCacheKey:
+    """Builds the cache key of the area that contains the results of a nearby query."""
+    precision = settings.NEARBY_CACHE_GEOHASH_PRECISION
+    cell, cell_lat, cell_lon = geohash_cell(latitude, longitude, precision)
+    step = settings.NEARBY_CACHE_RADIUS_STEP_KM
+    radius_bucket = math.ceil(radius_km / step) * step
+    # Geohash bits alternate starting with longitude, so longitude gets the odd bit
+    half_height = 90.0 / 2 ** (precision * 5 // 2)
+    half_width = 180.0 / 2 ** ((precision * 5 + 1) // 2)
+    reach_m = max(
+        haversine_m(cell_lat, cell_lon, cell_lat + offset, cell_lon + half_width) for offset in (-half_height, half_height)
+    )
+    # 1% slack: haversine is spherical, PostGIS geography distances are spheroidal
+    return NearbyCacheKey(cell, cell_lat, cell_lon, (radius_bucket * 1000 + reach_m) * 1.01 / 1000)
+
+def invalidate_nearby_for_point(lon: float, lat: float) -> None:
+    """Drops every cached nearby result whose search circle contains the point."""
+    # 1% slack: haversine is spherical, PostGIS geography distances are spheroidal
+    nearby_cache.delete_where(
+        lambda key: haversine_m(key.latitude, key.longitude, lat, lon) <= key.radius_km * 1000 * 1.01
+    )
+
+def invalidate_caches_for_point(lon: float, lat: float) -> None:
+    """Drops cached tiles and nearby results affected by a write at the point."""
+    invalidate_tiles_for_point(lon, lat)
+    invalidate_nearby_for_point(lon, lat)
+
+# --- Auth Caches ---
+# Verified access tokens (token -> subject email, until the token expires) and user
+# principals (email -> column values of the User row), so repeat requests need no
+# JWT decode or user query. Every entry has size 1, so max_bytes counts entries.
+
+token_cache = TTLCache(max_bytes=settings.AUTH_CACHE_MAX_ENTRIES)
+principal_cache = TTLCache(max_bytes=settings.AUTH_CACHE_MAX_ENTRIES)
+
+def invalidate_principal(email: str) -> None:
+    """Drops a cached user principal after the user row changed (in this worker)."""
+    principal_cache.delete(email)
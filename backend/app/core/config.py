@@ -1,29 +1,157 @@
 from pydantic_settings import BaseSettings
+from functools import lru_cache
+from typing import Optional
 import os
 
 class Settings(BaseSettings):
     # Database URL loaded from .env
     DATABASE_URL: str
+    # Read replicas: comma-separated URLs (same form as DATABASE_URL). Read-only
+    # endpoints are spread across healthy replicas and fall back to the primary.
+    DATABASE_REPLICA_URLS: str = ""
+    # Connection pool per engine (per worker process): persistent connections, extra
+    # connections allowed under load, seconds to wait for one, and seconds after which
+    # a connection is replaced. Pre-ping tests each connection before it is handed out.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Replica pools (unset = same as the primary)
+    DB_REPLICA_POOL_SIZE: Optional[int] = None
+    DB_REPLICA_MAX_OVERFLOW: Optional[int] = None
+    DB_REPLICA_POOL_TIMEOUT_SECONDS: Optional[float] = None
+    DB_REPLICA_POOL_RECYCLE_SECONDS: Optional[int] = None
+    DB_REPLICA_POOL_PRE_PING: Optional[bool] = None
+    # Replica health checks: interval and timeout in seconds, and the replication lag
+    # above which a replica gets no reads (keep it below SYNC_TOKEN_SKEW_SECONDS)
+    DB_REPLICA_HEALTH_INTERVAL_SECONDS: int = 10
+    DB_REPLICA_HEALTH_TIMEOUT_SECONDS: float = 2
+    DB_REPLICA_MAX_LAG_SECONDS: float = 4
+    # After a client writes, its reads go to the primary for this many seconds
+    DB_READ_YOUR_WRITES_SECONDS: float = 10
 
     # JWT Settings
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Password hashing: bcrypt cost (stored hashes with another cost are rehashed on login),
+    # worker processes, and how many more calls may wait for a worker before 503s
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_DEPTH: int = 16
+    # Login / registration throttling: attempts per AUTH_RATE_LIMIT_WINDOW_SECONDS per client IP
+    # and per email (0 disables one); "memory" buckets per worker or "postgres" shared by all workers
+    AUTH_RATE_LIMIT_BACKEND: str = "memory"
+    AUTH_RATE_LIMIT_PER_IP: int = 20
+    AUTH_RATE_LIMIT_PER_EMAIL: int = 5
+    AUTH_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    # Per-worker auth caches: verified access tokens (until they expire) and user principals
+    # (for AUTH_PRINCIPAL_CACHE_TTL_SECONDS), at most AUTH_CACHE_MAX_ENTRIES each (0 disables both)
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
 
     # Google OAuth Settings
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_REDIRECT_URI: str = "http://localhost:8000/api/v1/auth/google/callback" # Default for local dev
+    GOOGLE_DISCOVERY_URL: str = "https://accounts.google.com/.well-known/openid-configuration" # Point at a fake provider for testing
+    # OIDC discovery document and signing keys are cached this long; unknown key ids
+    # refetch the keys at most every OIDC_JWKS_MIN_REFRESH_SECONDS
+    OIDC_METADATA_TTL_SECONDS: int = 3600
+    OIDC_JWKS_MIN_REFRESH_SECONDS: int = 60
+    OIDC_HTTP_TIMEOUT_SECONDS: float = 10.0
     SESSION_SECRET_KEY: str = "a_very_secret_key_change_this_in_production" # Add a default or load from .env
     FRONTEND_URL: str = "http://localhost:8080" # Default frontend URL for redirects
 
-    # AWS S3 Settings (loaded from .env)
-    AWS_ACCESS_KEY_ID: str
-    AWS_SECRET_ACCESS_KEY: str
-    S3_BUCKET_NAME: str
-    AWS_REGION: str
+    # Where images are stored: "s3" or "local" (files on this server's disk, served
+    # under LOCAL_STORAGE_URL; for single-node and edge deployments without S3)
+    STORAGE_BACKEND: str = "s3"
+    LOCAL_STORAGE_ROOT: str = "./media"
+    LOCAL_STORAGE_URL: str = "http://localhost:8000/media" # Public URL of the /media routes
+
+    # AWS S3 Settings (loaded from .env; not needed with STORAGE_BACKEND=local)
+    AWS_ACCESS_KEY_ID: str = ""
+    AWS_SECRET_ACCESS_KEY: str = ""
+    S3_BUCKET_NAME: str = ""
+    AWS_REGION: str = ""
     # AWS_SECRET_ACCESS_KEY: str = ""
     # S3_BUCKET_NAME: str = ""
+    # Optional endpoint for S3-compatible storage (e.g. MinIO or moto for local load tests)
+    S3_ENDPOINT_URL: Optional[str] = None
+    # Shared client connection pool size and maximum concurrent transfers per worker
+    S3_MAX_POOL_CONNECTIONS: int = 50
+    S3_MAX_CONCURRENT_TRANSFERS: int = 16
+
+    # Direct-to-storage uploads: maximum image size, presigned URL lifetime, and how
+    # long after expiry (and how often) never-finalized uploads are reaped, in seconds
+    UPLOAD_MAX_BYTES: int = 15 * 1024 * 1024
+    UPLOAD_URL_EXPIRE_SECONDS: int = 600
+    UPLOAD_ORPHAN_GRACE_SECONDS: int = 3600
+    UPLOAD_REAPER_INTERVAL_SECONDS: int = 900
+    # Streaming uploads: size of each multipart part sent to storage (at least 5 MiB).
+    # Bounds the memory held per upload; UPLOAD_MAX_BYTES caps the total size.
+    UPLOAD_PART_SIZE_BYTES: int = 8 * 1024 * 1024
+    # Stored originals no submission references any more are deleted after this many seconds
+    BLOB_REAPER_GRACE_SECONDS: int = 3600
+
+    # Near-duplicate detection: max differing bits of the 64-bit perceptual hash,
+    # and the distance (meters) within which submissions are compared
+    DUPLICATE_MAX_HAMMING_DISTANCE: int = 6
+    DUPLICATE_SEARCH_RADIUS_M: float = 500
+
+    # Image derivatives (marker thumbnail, popup image): worker processes and output format (WEBP or JPEG)
+    IMAGE_PROCESS_WORKERS: int = 2
+    DERIVATIVE_FORMAT: str = "WEBP"
+
+    # Votes are buffered per worker and written in batches every VOTE_FLUSH_INTERVAL_SECONDS,
+    # or as soon as VOTE_FLUSH_MAX_PENDING votes are waiting (0 = write each vote at once).
+    # Votes still buffered when a worker is killed (not shut down) are lost.
+    VOTE_FLUSH_INTERVAL_SECONDS: float = 1
+    VOTE_FLUSH_MAX_PENDING: int = 1000
+    # Most votes accepted by one batch vote request
+    VOTE_BATCH_MAX_ITEMS: int = 100
+
+    # Submissions expire this many days after upload; the expiry reaper removes expired
+    # submissions (and tombstones older than the lifetime) every EXPIRY_REAPER_INTERVAL_SECONDS
+    SUBMISSION_LIFETIME_DAYS: int = 3
+    EXPIRY_REAPER_INTERVAL_SECONDS: int = 300
+    # imagesubmission is partitioned by day of expiry; partitions are created this many
+    # days ahead (must exceed SUBMISSION_LIFETIME_DAYS) and dropped once all rows expired
+    SUBMISSION_PARTITIONS_AHEAD_DAYS: int = 7
+
+    # Nearby query limits (page size when no limit is given, and the server-enforced maximum)
+    NEARBY_DEFAULT_LIMIT: int = 100
+    NEARBY_MAX_LIMIT: int = 500
+    # Streamed formats (format=geojson / ndjson): row cap, and rows fetched per server-side cursor batch
+    NEARBY_STREAM_MAX_LIMIT: int = 100000
+    NEARBY_STREAM_BATCH_SIZE: int = 1000
+
+    # Map viewport clustering: below CLUSTER_MAX_ZOOM points are grouped into
+    # square grid cells of CLUSTER_CELL_PX screen pixels
+    CLUSTER_MAX_ZOOM: int = 16
+    CLUSTER_CELL_PX: int = 60
+
+    # Mapbox Vector Tiles (extent and buffer in tile units, cache size in bytes,
+    # Cache-Control max-age for clients in seconds)
+    TILE_MAX_ZOOM: int = 20
+    TILE_EXTENT: int = 4096
+    TILE_BUFFER: int = 64
+    TILE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    TILE_HTTP_MAX_AGE: int = 60
+
+    # Nearby result cache: geohash precision of the cells queries share entries by
+    # (7 = ~150 m cells), radius bucket size, TTL in seconds and size in bytes.
+    # Areas with more than NEARBY_CACHE_MAX_ROWS submissions are queried directly.
+    NEARBY_CACHE_GEOHASH_PRECISION: int = 7
+    NEARBY_CACHE_RADIUS_STEP_KM: float = 0.5
+    NEARBY_CACHE_TTL_SECONDS: int = 30
+    NEARBY_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    NEARBY_CACHE_MAX_ROWS: int = 2000
+
+    # Delta sync: tokens are backdated by this many seconds so rows committed while
+    # a query ran are not missed (clients apply changes by id, so overlap is harmless)
+    SYNC_TOKEN_SKEW_SECONDS: int = 5
 
     class Config:
         # Specify the .env file relative to the project root (where this script might be run from)
@@ -31,5 +159,19 @@ class Settings(BaseSettings):
         env_file = ".env" # Assumes .env is in the 'backend' directory
         env_file_encoding = 'utf-8'
 
-# Create a single instance of the settings to be imported elsewhere
-settings = Settings()
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    """Reads the settings from the environment and .env (once)."""
+    return Settings()
+
+class _LazySettings:
+    """Stands in for the Settings instance and reads it on first attribute access, so importing modules reads no configuration."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(get_settings(), name, value)
+
+# The settings to be imported elsewhere
+settings: Settings = _LazySettings() # type: ignore[assignment]
\ No newline at end of file
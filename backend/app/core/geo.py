@@ -0,0 +1,99 @@
+import math
+import struct
+from typing import Set, Tuple
+
+# --- Web Map Tile Utilities ---
+
+def tile_fraction(lon: float, lat: float, zoom: int) -> Tuple[float, float]:
+    """
+    Returns the fractional (x, y) tile coordinates of a point at a zoom level
+    (XYZ / slippy map scheme, y grows southwards).
+    """
+    lat = max(min(lat, 85.0511287798), -85.0511287798) # Web Mercator latitude limit
+    n = 2 ** zoom
+    x = (lon + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+def tiles_for_point(lon: float, lat: float, zoom: int, buffer: float = 0.0) -> Set[Tuple[int, int, int]]:
+    """
+    Returns the (z, x, y) tiles whose area, grown by `buffer` (a fraction of the
+    tile size, like the ST_AsMVTGeom buffer / extent), contains the point.
+    """
+    n = 2 ** zoom
+    fx, fy = tile_fraction(lon, lat, zoom)
+    xs = {min(max(int(math.floor(v)), 0), n - 1) for v in (fx - buffer, fx, fx + buffer)}
+    ys = {min(max(int(math.floor(v)), 0), n - 1) for v in (fy - buffer, fy, fy + buffer)}
+    return {(zoom, x, y) for x in xs for y in ys}
+
+# --- Geometry Utilities ---
+
+def point_from_wkb(element) -> Tuple[float, float]:
+    """
+    Returns (lon, lat) from a POINT WKBElement (or raw (E)WKB bytes) without
+    going through Shapely.
+    """
+    data = bytes(getattr(element, "data", element))
+    byte_order = "<" if data[0] == 1 else ">"
+    geom_type = struct.unpack_from(f"{byte_order}I", data, 1)[0]
+    offset = 5
+    if geom_type & 0x20000000: # EWKB SRID flag
+        offset += 4
+    return struct.unpack_from(f"{byte_order}dd", data, offset)
+
+def _wkt_number(value: float) -> str:
+    text = f"{value:.16g}"
+    if "e" in text: # Tiny values: positional notation, like the other coordinates
+        text = f"{value:.17f}".rstrip("0").rstrip(".")
+    return text
+
+def point_wkt(lon: float, lat: float) -> str:
+    """
+    WKT of a point in the same form as Shapely ("POINT (lon lat)", 16 significant
+    digits, trailing zeros trimmed), without building a geometry.
+    """
+    return f"POINT ({_wkt_number(lon)} {_wkt_number(lat)})"
+
+# --- Geohash / Distance Utilities ---
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6371008.8
+
+def geohash_cell(lat: float, lon: float, precision: int) -> Tuple[str, float, float]:
+    """
+    Returns (geohash, center_lat, center_lon) of the geohash cell of the given
+    precision that contains the point.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True # Geohash interleaves bits, starting with longitude
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    center_lat = (lat_range[0] + lat_range[1]) / 2
+    center_lon = (lon_range[0] + lon_range[1]) / 2
+    return "".join(chars), center_lat, center_lon
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
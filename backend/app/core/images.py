@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import io
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.storage import get_storage
+from app.core.config import settings
+
+# --- Derivative Pipeline ---
+# After an original is stored, a resized marker thumbnail and popup image are
+# generated in a process pool (Pillow work is CPU-bound and would hold the GIL),
+# uploaded next to the original, and recorded on the submission together with
+# the image size and a blurhash placeholder.
+
+# Derivative name -> longest side in pixels
+DERIVATIVE_SIZES = {"thumb": 128, "popup": 640}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def init_image_pool() -> None:
+    """Creates the image processing pool. Called once at application startup."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+
+def shutdown_image_pool() -> None:
+    """Releases the image processing pool. Called at shutdown."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+def process_image(data: bytes, image_format: str) -> dict:
+    """
+    Builds the derivatives of an original image (runs in a worker process).
+    Applies the EXIF orientation, drops all metadata, and returns
+    {"width", "height", "blurhash", "perceptual_hash", "derivatives": {name: encoded bytes}}.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+
+    derivatives = {}
+    for name, max_side in DERIVATIVE_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        # Saving a fresh image without exif= strips EXIF (including GPS) from the derivative
+        resized.save(buffer, format=image_format, quality=80)
+        derivatives[name] = buffer.getvalue()
+
+    return {
+        "width": image.width,
+        "height": image.height,
+        "blurhash": blurhash_encode(image),
+        "perceptual_hash": dhash(image),
+        "derivatives": derivatives,
+    }
+
+def derivative_key(object_key: str, name: str, extension: str) -> str:
+    """Storage key of a derivative, e.g. derivatives/{original name}/thumb.webp."""
+    original_name = object_key.rsplit("/", 1)[-1].split(".", 1)[0]
+    return f"derivatives/{original_name}/{name}.{extension}"
+
+def derivative_format() -> tuple[str, str, str]:
+    """Returns (Pillow format, file extension, content type) of the configured DERIVATIVE_FORMAT."""
+    image_format = settings.DERIVATIVE_FORMAT.upper()
+    if image_format == "JPEG":
+        return image_format, "jpg", "image/jpeg"
+    return image_format, image_format.lower(), f"image/{image_format.lower()}"
+
+def derivative_keys(object_key: str) -> list[str]:
+    """Storage keys of all derivatives of an original."""
+    _, extension, _ = derivative_format()
+    return [derivative_key(object_key, name, extension) for name in DERIVATIVE_SIZES]
+
+async def generate_derivatives(
+    submission_id: int, object_key: str, content_hash: Optional[str] = None, content_type: Optional[str] = None
+) -> None:
+    """
+    Background task: downloads the original, processes it in the pool, uploads
+    the derivatives and stores their URLs and image metadata on the submission.
+    Without a `content_hash` (presigned uploads) the original is hashed here and
+    the submission is linked to its blob, dropping the upload if the content was
+    already stored. Derivatives of identical content are reused, not regenerated.
+    Failures are logged; the submission keeps working with the original image.
+    """
+    from app.crud import crud_image_submission
+    from app.db.session import get_engine
+
+    async def reuse_derivatives(sha256: str) -> bool:
+        async with AsyncSession(get_engine()) as db:
+            source = await crud_image_submission.get_submission_with_derivatives(db, content_hash=sha256)
+            if source is None or source.id == submission_id:
+                return False
+            await crud_image_submission.set_submission_derivatives(
+                db,
+                submission_id=submission_id,
+                thumbnail_url=source.thumbnail_url,
+                popup_url=source.popup_url,
+                width=source.width,
+                height=source.height,
+                blurhash=source.blurhash,
+                perceptual_hash=source.perceptual_hash,
+            )
+            return True
+
+    if _pool is None:
+        init_image_pool()
+    image_format, extension, derivative_content_type = derivative_format()
+    try:
+        if content_hash is not None and await reuse_derivatives(content_hash):
+            return
+
+        storage = get_storage()
+        data = await storage.read_bytes(object_key)
+        if content_hash is None:
+            content_hash = hashlib.sha256(data).hexdigest()
+            async with AsyncSession(get_engine()) as db:
+                submission, blob_key = await crud_image_submission.attach_blob(
+                    db,
+                    submission_id=submission_id,
+                    sha256=content_hash,
+                    object_key=object_key,
+                    content_type=content_type or "application/octet-stream",
+                    size=len(data),
+                )
+            if submission is None:
+                return # Deleted in the meantime
+            if blob_key != object_key:
+                # Same content was already stored: drop this copy, the submission now uses the blob
+                await storage.delete_objects_async([object_key])
+                object_key = blob_key # Derivatives are stored next to the blob
+                if await reuse_derivatives(content_hash):
+                    return
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_pool, process_image, data, image_format)
+
+        urls = {}
+        for name, encoded in result["derivatives"].items():
+            key = derivative_key(object_key, name, extension)
+            await storage.save_bytes(encoded, key, derivative_content_type)
+            urls[name] = storage.url(key)
+
+        async with AsyncSession(get_engine()) as db:
+            await crud_image_submission.set_submission_derivatives(
+                db,
+                submission_id=submission_id,
+                thumbnail_url=urls["thumb"],
+                popup_url=urls["popup"],
+                width=result["width"],
+                height=result["height"],
+                blurhash=result["blurhash"],
+                perceptual_hash=result["perceptual_hash"],
+            )
+    except Exception as e:
+        print(f"Derivative generation failed for submission {submission_id}: {e}") # Log the error
+
+def dhash(image) -> int:
+    """
+    64-bit difference hash of a Pillow image as a signed integer (fits BIGINT).
+    Visually similar images differ in only a few bits (Hamming distance).
+    """
+    small = image.convert("L").resize((9, 8))
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+# --- Blurhash ---
+# Compact placeholder string (https://blurha.sh) computed from a 32x32 downsample.
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+def _base83(value: int, length: int) -> str:
+    return "".join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+def blurhash_encode(image, x_components: int = 4, y_components: int = 3) -> str:
+    """Encodes a Pillow RGB image into a blurhash string."""
+    small = image.resize((32, 32))
+    width, height = small.size
+    pixels = [tuple(_srgb_to_linear(c) for c in pixel) for pixel in small.getdata()]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row_basis = normalisation * cos_y[j][y]
+                for x in range(width):
+                    basis = row_basis * cos_x[i][x]
+                    pr, pg, pb = pixels[y * width + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, int(math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _base83(0, 1)
+
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        quantised = [
+            max(0, min(18, int(math.floor(math.copysign(abs(c / max_value) ** 0.5, c) * 9 + 9.5))))
+            for c in factor
+        ]
+        result += _base83(quantised[0] * 19 * 19 + quantised[1] * 19 + quantised[2], 2)
+    return result
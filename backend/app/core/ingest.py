@@ -0,0 +1,114 @@
+import hashlib
+from typing import AsyncIterator, NamedTuple, Optional
+
+from app.core.storage import get_storage
+from app.core.config import settings
+
+# --- Streaming Ingestion ---
+# Reads an upload chunk by chunk straight from the request body: the real image
+# type is sniffed from the first bytes, the size cap is enforced as data arrives,
+# a SHA-256 is computed inline, and full parts are forwarded to storage as a
+# multipart upload. Memory per upload is bounded by UPLOAD_PART_SIZE_BYTES and
+# nothing is spooled to disk.
+
+class UploadTooLarge(Exception):
+    """The upload exceeded UPLOAD_MAX_BYTES."""
+
+class UnsupportedImageType(Exception):
+    """The upload does not start with the signature of a supported image format."""
+
+class IngestResult(NamedTuple):
+    object_key: str
+    content_type: str # Sniffed from the data, not taken from the client
+    size: int
+    sha256: str # Hex digest of the stored bytes
+
+# Bytes needed to recognise every signature below
+SNIFF_BYTES = 12
+
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1"}
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Returns the MIME type for the magic bytes at the start of a file, or None if unknown."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[4:8] == b"ftyp" and header[8:12] in _HEIF_BRANDS:
+        return "image/heic"
+    return None
+
+# File extension per sniffed type, for the object key
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/heic": "heic",
+}
+
+async def ingest_stream(chunks: AsyncIterator[bytes], key_prefix: str) -> IngestResult:
+    """
+    Streams an image from `chunks` into storage under {key_prefix}.{extension}.
+    Raises UnsupportedImageType or UploadTooLarge as soon as the data shows it;
+    any parts already sent are aborted, so no partial object is left behind.
+    Uploads that fit in a single part are stored with one PUT instead.
+    """
+    storage = get_storage()
+    max_bytes = settings.UPLOAD_MAX_BYTES
+    part_size = max(settings.UPLOAD_PART_SIZE_BYTES, storage.min_part_size)
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    size = 0
+    content_type = None
+    object_key = None
+    writer = None
+
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge()
+            digest.update(chunk)
+            buffer += chunk
+
+            if content_type is None:
+                if len(buffer) < SNIFF_BYTES:
+                    continue
+                content_type = sniff_image_type(bytes(buffer[:SNIFF_BYTES]))
+                if content_type is None:
+                    raise UnsupportedImageType()
+                object_key = f"{key_prefix}.{IMAGE_EXTENSIONS[content_type]}"
+
+            while len(buffer) >= part_size:
+                if writer is None:
+                    writer = await storage.begin_multipart(object_key, content_type)
+                part = bytes(buffer[:part_size])
+                del buffer[:part_size]
+                await writer.write_part(part)
+
+        if content_type is None:
+            # Stream ended before the signature was complete
+            content_type = sniff_image_type(bytes(buffer))
+            if content_type is None:
+                raise UnsupportedImageType()
+            object_key = f"{key_prefix}.{IMAGE_EXTENSIONS[content_type]}"
+
+        if writer is None:
+            await storage.save_bytes(bytes(buffer), object_key, content_type)
+        else:
+            if buffer:
+                await writer.write_part(bytes(buffer))
+            await writer.complete()
+    except Exception: # Includes ClientDisconnect from the request stream
+        if writer is not None:
+            await writer.abort()
+        raise
+
+    return IngestResult(object_key=object_key, content_type=content_type, size=size, sha256=digest.hexdigest())
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from urllib.parse import urlencode
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import httpx # Imported on first request to the provider
+
+# --- OpenID Connect Client (Google login) ---
+# The discovery document and the provider's signing keys (JWKS) are cached for
+# OIDC_METADATA_TTL_SECONDS; a token signed with an unknown key id refreshes the
+# JWKS right away (key rotation); such refetches happen at most every
+# OIDC_JWKS_MIN_REFRESH_SECONDS.
+# The id_token from the code exchange is verified locally (signature, issuer,
+# audience, expiry, nonce), so a login costs one round-trip to the provider:
+# the token request. No userinfo call is made.
+
+class OIDCError(Exception):
+    """Raised when the provider cannot be reached or a token does not verify."""
+
+class OIDCProvider:
+    """
+    OpenID Connect relying party for one provider, configured by its discovery URL.
+    `transport` replaces the HTTP transport, e.g. with httpx.ASGITransport around
+    a local fake provider.
+    """
+
+    def __init__(
+        self,
+        discovery_url: str,
+        client_id: str,
+        client_secret: str,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+    ):
+        self.discovery_url = discovery_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._transport = transport
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._metadata: Optional[Dict[str, Any]] = None
+        self._metadata_fetched_at = 0.0
+        self._keys: Dict[str, Dict[str, Any]] = {} # kid -> JWK
+        self._keys_fetched_at = float("-inf")
+        self._miss_refreshed_at = float("-inf")
+        self._metadata_lock = asyncio.Lock()
+        self._keys_lock = asyncio.Lock() # Concurrent logins wait for one refresh instead of each fetching
+        self.discovery_fetches = 0
+        self.jwks_fetches = 0
+        self.verified = 0
+        self.failures = 0
+
+    def _http(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(transport=self._transport, timeout=settings.OIDC_HTTP_TIMEOUT_SECONDS)
+        return self._client
+
+    async def close(self) -> None:
+        """Closes the HTTP client (called at shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def clear(self) -> None:
+        """Drops the cached discovery document and keys."""
+        self._metadata = None
+        self._metadata_fetched_at = 0.0
+        self._keys = {}
+        self._keys_fetched_at = float("-inf")
+        self._miss_refreshed_at = float("-inf")
+
+    async def _get_json(self, url: str) -> Dict[str, Any]:
+        import httpx
+        try:
+            response = await self._http().get(url)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise OIDCError(f"Could not fetch {url}: {e}") from e
+
+    async def metadata(self) -> Dict[str, Any]:
+        """The discovery document, cached; a stale copy is kept if a refresh fails."""
+        if self._metadata is not None and time.monotonic() - self._metadata_fetched_at < settings.OIDC_METADATA_TTL_SECONDS:
+            return self._metadata
+        async with self._metadata_lock:
+            if self._metadata is None or time.monotonic() - self._metadata_fetched_at >= settings.OIDC_METADATA_TTL_SECONDS:
+                try:
+                    self._metadata = await self._get_json(self.discovery_url)
+                    self.discovery_fetches += 1
+                except OIDCError as e:
+                    if self._metadata is None:
+                        raise
+                    print(f"OIDC discovery refresh failed, keeping the cached document: {e}") # Log the error
+                self._metadata_fetched_at = time.monotonic()
+        return self._metadata
+
+    async def _signing_key(self, kid: Optional[str]) -> Dict[str, Any]:
+        """The JWK for a key id, refetching the JWKS when it is stale or the id is unknown."""
+        age = time.monotonic() - self._keys_fetched_at
+        if kid in self._keys and age < settings.OIDC_METADATA_TTL_SECONDS:
+            return self._keys[kid]
+        metadata = await self.metadata()
+        async with self._keys_lock:
+            age = time.monotonic() - self._keys_fetched_at
+            stale = age >= settings.OIDC_METADATA_TTL_SECONDS
+            # Refetches for unknown key ids are throttled, so forged ids cannot make us hammer the provider
+            miss = kid not in self._keys and time.monotonic() - self._miss_refreshed_at >= settings.OIDC_JWKS_MIN_REFRESH_SECONDS
+            if stale or miss:
+                jwks = await self._get_json(metadata["jwks_uri"])
+                self._keys = {key.get("kid"): key for key in jwks.get("keys", [])}
+                self._keys_fetched_at = time.monotonic()
+                if miss and not stale:
+                    self._miss_refreshed_at = self._keys_fetched_at
+                self.jwks_fetches += 1
+        if kid not in self._keys:
+            raise OIDCError(f"Unknown signing key: {kid}")
+        return self._keys[kid]
+
+    async def authorization_url(self, *, redirect_uri: str, state: str, nonce: str, scope: str = "openid email profile") -> str:
+        """Where to send the user to sign in (authorization code flow)."""
+        metadata = await self.metadata()
+        params = {
+            "response_type": "code",
+            "client_id": self.client_id,
+            "redirect_uri": redirect_uri,
+            "scope": scope,
+            "state": state,
+            "nonce": nonce,
+        }
+        return f"{metadata['authorization_endpoint']}?{urlencode(params)}"
+
+    async def exchange_code(self, *, code: str, redirect_uri: str) -> Dict[str, Any]:
+        """Redeems an authorization code at the token endpoint. Returns the token response."""
+        import httpx
+        metadata = await self.metadata()
+        try:
+            response = await self._http().post(metadata["token_endpoint"], data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": redirect_uri,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            })
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise OIDCError(f"Token exchange failed: {e}") from e
+
+    async def verify_id_token(self, id_token: str, *, nonce: Optional[str], access_token: Optional[str] = None) -> Dict[str, Any]:
+        """Verifies an id_token with the cached keys and returns its claims."""
+        try:
+            header = jwt.get_unverified_header(id_token)
+            key = await self._signing_key(header.get("kid"))
+            metadata = await self.metadata()
+            issuer = metadata["issuer"]
+            algorithms = [
+                alg for alg in metadata.get("id_token_signing_alg_values_supported", ["RS256"])
+                if alg[:2] in ("RS", "ES", "PS") # Asymmetric only: never "none" or a shared secret
+            ]
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=algorithms,
+                audience=self.client_id,
+                issuer=(issuer, issuer.removeprefix("https://")), # Google also issues "accounts.google.com"
+                access_token=access_token, # Checks at_hash when present
+                options={"leeway": 30},
+            )
+        except (JWTError, KeyError) as e:
+            self.failures += 1
+            raise OIDCError(f"Invalid id_token: {e}") from e
+        except OIDCError:
+            self.failures += 1
+            raise
+        if nonce is not None and claims.get("nonce") != nonce:
+            self.failures += 1
+            raise OIDCError("Invalid id_token: nonce mismatch")
+        self.verified += 1
+        return claims
+
+    def stats(self) -> dict:
+        return {
+            "discovery_fetches": self.discovery_fetches,
+            "jwks_fetches": self.jwks_fetches,
+            "keys": len(self._keys),
+            "verified": self.verified,
+            "failures": self.failures,
+        }
+
+google = OIDCProvider(settings.GOOGLE_DISCOVERY_URL, settings.GOOGLE_CLIENT_ID, settings.GOOGLE_CLIENT_SECRET)
@@ -0,0 +1,88 @@
+import base64
+import datetime
+import json
+import math
+from typing import Any, Optional, Tuple
+
+def _parse_timestamp(value: Any) -> datetime.datetime:
+    """Parses an ISO timestamp into naive UTC, the form stored in the database."""
+    if not isinstance(value, str):
+        raise ValueError(f"Expected an ISO timestamp, got {value!r}")
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+# --- Keyset Cursor Utilities ---
+# Cursors are opaque to clients: URL-safe base64 of a small JSON document holding
+# the sort mode, the sort key of the last row on the previous page and, optionally,
+# how the key was computed (e.g. which distance formula), so a cursor is only
+# resumed where the same computation applies.
+
+def encode_cursor(sort: str, key: Tuple[Any, int], basis: Optional[str] = None) -> str:
+    """Encodes the sort key (uploaded_at or distance, id) of the last row into a cursor."""
+    value, row_id = key
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    document = {"s": sort, "k": [value, row_id]}
+    if basis is not None:
+        document["b"] = basis
+    payload = json.dumps(document, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def _cursor_payload(cursor: str) -> dict:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    return payload
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """
+    Decodes a cursor created by encode_cursor for the given sort mode; uploaded_at
+    keys come back as naive UTC (timestamps with an offset are converted).
+    Raises ValueError if the cursor is malformed or was issued for another sort.
+    """
+    try:
+        payload = _cursor_payload(cursor)
+        value, row_id = payload["k"]
+        if payload["s"] != sort:
+            raise ValueError("Cursor does not match the requested sort order")
+        if sort == "distance":
+            distance = float(value)
+            if not math.isfinite(distance):
+                raise ValueError(f"Invalid distance {value!r}")
+            return distance, int(row_id)
+        return _parse_timestamp(value), int(row_id)
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+def cursor_basis(cursor: str) -> Optional[str]:
+    """The basis a cursor was encoded with, or None. Raises ValueError if the cursor is malformed."""
+    try:
+        basis = _cursor_payload(cursor).get("b")
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if basis is not None and not isinstance(basis, str):
+        raise ValueError("Invalid cursor: bad basis")
+    return basis
+
+# --- Delta Sync Tokens ---
+# A sync token marks the point in time a client's view of an area was taken.
+
+def encode_sync_token(as_of: datetime.datetime) -> str:
+    """Encodes a (naive UTC) timestamp into an opaque sync token."""
+    payload = json.dumps({"t": as_of.isoformat()}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_sync_token(token: str) -> datetime.datetime:
+    """
+    Decodes a sync token created by encode_sync_token into a naive UTC timestamp
+    (timestamps with an offset are converted). Raises ValueError if the token is malformed.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _parse_timestamp(payload["t"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid sync token: {e}") from e
@@ -0,0 +1,192 @@
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.session import get_engine
+
+# --- Auth Rate Limiting ---
+# Token buckets for /auth/login and /auth/register, one per client IP and one per
+# email, checked before any user lookup or password hashing. A bucket holds `limit`
+# attempts and refills at `limit` per AUTH_RATE_LIMIT_WINDOW_SECONDS, which caps the
+# bcrypt CPU that auth can take. An attempt takes a token from both buckets or, if
+# either is empty, from neither. Keys are hashed, so neither backend stores IPs or emails.
+
+Bucket = Tuple[str, int, float] # (key, capacity, refill rate per second)
+
+class RateLimiter(ABC):
+    """Interface of the token bucket backends."""
+
+    def __init__(self):
+        self.allowed = 0
+        self.rejected = 0
+
+    @abstractmethod
+    async def hit(self, buckets: List[Bucket]) -> float:
+        """
+        Takes a token from each bucket if all of them have one. Returns 0 if allowed,
+        else seconds until every bucket has a token again.
+        """
+
+    @abstractmethod
+    async def prune(self) -> int:
+        """Drops buckets idle for a whole window (they are full again). Returns the number dropped."""
+
+    def stats(self) -> dict:
+        return {"backend": settings.AUTH_RATE_LIMIT_BACKEND, "allowed": self.allowed, "rejected": self.rejected}
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    Buckets in this worker's memory, so each worker enforces the limits on its own.
+    All access happens on the event loop, so no lock is needed.
+    """
+
+    # Once this many buckets are tracked, idle ones are pruned and, if that is not
+    # enough, the least recently hit tenth is dropped (those buckets start full again)
+    MAX_BUCKETS = 100000
+
+    def __init__(self):
+        super().__init__()
+        # key -> (tokens, monotonic time of last hit), least recently hit first
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def hit(self, buckets: List[Bucket]) -> float:
+        now = time.monotonic()
+        levels = []
+        for key, capacity, rate in buckets:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            levels.append(min(capacity, tokens + (now - updated) * rate))
+        retry_after = max(
+            ((1 - tokens) / rate for tokens, (_, _, rate) in zip(levels, buckets) if tokens < 1), default=0.0
+        )
+        if retry_after > 0:
+            return retry_after
+        for tokens, (key, _, _) in zip(levels, buckets):
+            self._buckets.pop(key, None) # Re-inserted at the end, keeping the dict in hit order
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                self._evict()
+            self._buckets[key] = (tokens - 1, now)
+        return 0.0
+
+    def _evict(self) -> None:
+        if self._prune_idle():
+            return
+        for key in list(islice(self._buckets, max(1, self.MAX_BUCKETS // 10))):
+            del self._buckets[key]
+
+    def _prune_idle(self) -> int:
+        cutoff = time.monotonic() - settings.AUTH_RATE_LIMIT_WINDOW_SECONDS
+        idle = []
+        for key, (_, updated) in self._buckets.items():
+            if updated > cutoff:
+                break # The rest were hit later
+            idle.append(key)
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+    async def prune(self) -> int:
+        return self._prune_idle()
+
+# Bucket level after refilling for the time since the last hit (database clock, UTC)
+_NOW = "timezone('utc', statement_timestamp())"
+_REFILL = (
+    f"LEAST(CAST(:capacity AS float8), b.tokens + EXTRACT(EPOCH FROM {_NOW} - b.updated_at) * CAST(:rate AS float8))"
+)
+
+# One atomic upsert per attempt, so concurrent workers share each bucket
+_HIT_SQL = text(f"""
+    INSERT INTO authratelimit AS b (key, tokens, allowed, updated_at)
+    VALUES (:key, CAST(:capacity AS float8) - 1, true, {_NOW})
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = {_REFILL} - CASE WHEN {_REFILL} >= 1 THEN 1 ELSE 0 END,
+        allowed = {_REFILL} >= 1,
+        updated_at = {_NOW}
+    RETURNING tokens, allowed
+""")
+
+_PRUNE_SQL = text(f"""
+    DELETE FROM authratelimit WHERE updated_at < {_NOW} - make_interval(secs => CAST(:window AS float8))
+""")
+
+class PostgresRateLimiter(RateLimiter):
+    """
+    Buckets in the (unlogged) authratelimit table, shared by all workers and nodes.
+    The buckets of an attempt are hit in one transaction, which is rolled back when
+    any of them is empty, so the others keep their tokens. If the database cannot be
+    reached, attempts are let through: login needs the database anyway and fails on its own.
+    """
+
+    async def hit(self, buckets: List[Bucket]) -> float:
+        retry_after = 0.0
+        try:
+            async with AsyncSession(get_engine()) as db:
+                for key, capacity, rate in sorted(buckets): # Row locks in key order, so concurrent attempts cannot deadlock
+                    params = {"key": key, "capacity": float(capacity), "rate": rate}
+                    tokens, allowed = (await db.execute(_HIT_SQL, params)).one()
+                    if not allowed:
+                        retry_after = max(retry_after, (1 - tokens) / rate)
+                if retry_after > 0:
+                    await db.rollback()
+                else:
+                    await db.commit()
+        except Exception as e:
+            print(f"Auth rate limit check failed, allowing the attempt: {e}") # Log the error
+            return 0.0
+        return retry_after
+
+    async def prune(self) -> int:
+        async with AsyncSession(get_engine()) as db:
+            result = await db.execute(_PRUNE_SQL, {"window": settings.AUTH_RATE_LIMIT_WINDOW_SECONDS})
+            await db.commit()
+            return result.rowcount
+
+_limiter: Optional[RateLimiter] = None
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the configured rate limiter backend."""
+    global _limiter
+    if _limiter is None:
+        if settings.AUTH_RATE_LIMIT_BACKEND == "memory":
+            _limiter = MemoryRateLimiter()
+        elif settings.AUTH_RATE_LIMIT_BACKEND == "postgres":
+            _limiter = PostgresRateLimiter()
+        else:
+            raise ValueError(f"Unknown AUTH_RATE_LIMIT_BACKEND: {settings.AUTH_RATE_LIMIT_BACKEND}")
+    return _limiter
+
+def _bucket_key(kind: str, value: str) -> str:
+    return hashlib.sha256(f"{kind}:{value}".encode()).hexdigest()
+
+async def check_auth_rate_limit(request: Request, email: Optional[str]) -> None:
+    """
+    Takes an attempt from the client IP's and the email's buckets, or responds 429
+    with Retry-After when either is empty (taking from neither). Call before any
+    user lookup or hashing.
+    """
+    limiter = get_rate_limiter()
+    window = settings.AUTH_RATE_LIMIT_WINDOW_SECONDS
+    buckets = [
+        (_bucket_key(kind, value), limit, limit / window)
+        for kind, value, limit in (
+            ("ip", request.client.host if request.client else None, settings.AUTH_RATE_LIMIT_PER_IP),
+            ("email", email.strip().lower() if email else None, settings.AUTH_RATE_LIMIT_PER_EMAIL),
+        )
+        if value and limit > 0 # A limit of 0 disables that bucket
+    ]
+    retry_after = await limiter.hit(buckets) if buckets else 0.0
+    if retry_after > 0:
+        limiter.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please retry later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    limiter.allowed += 1
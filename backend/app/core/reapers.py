@@ -0,0 +1,221 @@
+import datetime
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import images
+from app.core.storage import get_storage
+from app.core.config import settings
+from app.crud import crud_image_blob, crud_image_submission, crud_pending_upload
+from app.db import partitions
+from app.db.session import get_engine
+
+class ReaperStats:
+    """Totals of what a reaper removed since startup, and its last run."""
+
+    def __init__(self):
+        self.runs = 0
+        self.rows = 0 # Database rows deleted
+        self.objects = 0 # Storage objects deleted
+        self.bytes = 0 # Size of the deleted objects, where known (stored originals)
+        self.last_run_at: Optional[datetime.datetime] = None
+        self.last_run_seconds: Optional[float] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.monotonic()
+
+    def finish(self) -> None:
+        self.runs += 1
+        self.last_run_at = datetime.datetime.utcnow()
+        self.last_run_seconds = round(time.monotonic() - self._started, 3)
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "rows": self.rows,
+            "objects": self.objects,
+            "bytes": self.bytes,
+            "last_run_at": self.last_run_at,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+# Per worker process, exposed by GET /api/v1/stats/reapers
+reaper_stats: Dict[str, ReaperStats] = {
+    "uploads": ReaperStats(),
+    "blobs": ReaperStats(),
+    "expired": ReaperStats(),
+}
+
+async def reap_orphaned_uploads() -> int:
+    """
+    Removes objects that were uploaded with a presigned URL but never finalized,
+    together with their pending_upload rows. Only uploads older than the URL
+    lifetime plus UPLOAD_ORPHAN_GRACE_SECONDS are touched.
+    Returns the number of uploads reaped.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=settings.UPLOAD_URL_EXPIRE_SECONDS + settings.UPLOAD_ORPHAN_GRACE_SECONDS
+    )
+    storage = get_storage()
+    stats = reaper_stats["uploads"]
+    stats.start()
+    reaped = 0
+    async with AsyncSession(get_engine()) as db:
+        while True:
+            stale = await crud_pending_upload.get_stale_pending_uploads(
+                db, created_before=cutoff, limit=storage.delete_batch_size
+            )
+            if not stale:
+                break
+            keys = [pending.object_key for pending in stale]
+            # Objects first: a crash in between leaves the rows, and the next run retries
+            failed = set(await storage.delete_objects_async(keys))
+            done = [key for key in keys if key not in failed]
+            if not done:
+                break
+            await crud_pending_upload.delete_pending_uploads(db, object_keys=done)
+            reaped += len(done)
+            stats.rows += len(done)
+            stats.objects += len(done)
+    stats.finish()
+    if reaped:
+        print(f"Reaped {reaped} orphaned uploads.")
+    return reaped
+
+async def reap_unreferenced_blobs() -> int:
+    """
+    Removes stored originals (and their derivatives) that no submission has
+    referenced for BLOB_REAPER_GRACE_SECONDS, so an upload of the same content
+    shortly after its release can still reuse it. Uploads take their reference
+    (crud_image_blob.acquire_blob) before reusing a blob, which locks the row until
+    they commit; locked rows are skipped, and a blob deleted first is stored anew.
+    Returns the number of blobs reaped.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.BLOB_REAPER_GRACE_SECONDS)
+    # Each blob has its original plus one object per derivative, within one delete_objects batch
+    storage = get_storage()
+    batch_size = storage.delete_batch_size // (1 + len(images.DERIVATIVE_SIZES))
+    stats = reaper_stats["blobs"]
+    stats.start()
+    reaped = 0
+    async with AsyncSession(get_engine()) as db:
+        while True:
+            # Rows first: a crash in between leaks objects instead of leaving rows without objects
+            blobs = await crud_image_blob.delete_unreferenced_blobs(db, released_before=cutoff, limit=batch_size)
+            if not blobs:
+                break
+            keys = []
+            for object_key, _ in blobs:
+                keys.append(object_key)
+                keys.extend(images.derivative_keys(object_key))
+            failed = await storage.delete_objects_async(keys)
+            if failed:
+                print(f"Could not delete {len(failed)} unreferenced objects: {failed[:10]}")
+            reaped += len(blobs)
+            stats.rows += len(blobs)
+            stats.objects += len(keys) - len(failed)
+            stats.bytes += sum(size for object_key, size in blobs if object_key not in failed)
+    stats.finish()
+    if reaped:
+        print(f"Reaped {reaped} unreferenced blobs.")
+    return reaped
+
+async def ensure_submission_partitions() -> int:
+    """
+    Creates the daily imagesubmission partitions for the next
+    SUBMISSION_PARTITIONS_AHEAD_DAYS days (run at startup and by the expiry reaper).
+    """
+    today = datetime.datetime.utcnow().date()
+    async with AsyncSession(get_engine()) as db:
+        created = await partitions.ensure_partitions(db, first_day=today, days=settings.SUBMISSION_PARTITIONS_AHEAD_DAYS)
+    if created:
+        print(f"Created {created} imagesubmission partitions.")
+    return created
+
+async def _delete_owned_objects(rows: List[Any]) -> Tuple[Set[int], int]:
+    """
+    Deletes the objects of submissions that own them. Returns the ids of submissions
+    whose objects could not all be deleted, and the number of objects deleted.
+    """
+    keys_by_id = {row.id: crud_image_submission.owned_object_keys(row) for row in rows}
+    keys = [key for row_keys in keys_by_id.values() for key in row_keys]
+    failed = set(await get_storage().delete_objects_async(keys)) if keys else set()
+    failed_ids = {row_id for row_id, row_keys in keys_by_id.items() if failed.intersection(row_keys)}
+    return failed_ids, len(keys) - len(failed)
+
+async def reap_expired_submissions() -> int:
+    """
+    Removes expired submissions, and tombstones older than the submission lifetime.
+    Daily partitions whose rows have all expired are dropped whole; the default
+    partition (rows outside the daily partitions) is reaped in batches of rows.
+    Submissions that reference a blob just release it (the blob reaper removes the
+    objects); others own their objects, which are deleted first: a crash in between
+    leaves expired rows whose objects are gone, and the next run deletes them again,
+    so nothing leaks and work resumes where it stopped.
+    Returns the number of submissions reaped.
+    """
+    await ensure_submission_partitions()
+    now = datetime.datetime.utcnow()
+    storage = get_storage()
+    batch_size = storage.delete_batch_size // (1 + len(images.DERIVATIVE_SIZES))
+    stats = reaper_stats["expired"]
+    stats.start()
+    reaped = 0
+    async with AsyncSession(get_engine()) as db:
+        # Partitions ending at or before today's midnight (UTC) hold expired rows only
+        for day in await partitions.list_partition_days(db):
+            if day + datetime.timedelta(days=1) > now.date():
+                break
+            after_id, complete = 0, True
+            while True:
+                rows = await partitions.get_partition_objects(db, day=day, after_id=after_id, limit=batch_size)
+                if not rows:
+                    break
+                failed_ids, deleted_objects = await _delete_owned_objects(rows)
+                stats.objects += deleted_objects
+                complete = complete and not failed_ids
+                after_id = rows[-1].id
+            if not complete:
+                print(f"Keeping partition {partitions.partition_name(day)}: not all objects could be deleted.")
+                continue # Retried next run
+            deleted = await partitions.drop_partition(db, day=day)
+            reaped += deleted
+            stats.rows += deleted
+
+        default_partition = partitions.partition_table(partitions.DEFAULT_PARTITION)
+        after = None
+        while True:
+            # Pages by (expires_at, id), so rows kept for a retry don't stop the ones behind them
+            expired = await crud_image_submission.get_expired_submissions(
+                db, expired_before=now, limit=batch_size, source=default_partition, after=after
+            )
+            if not expired:
+                break
+            after = (expired[-1].expires_at, expired[-1].id)
+            failed_ids, deleted_objects = await _delete_owned_objects(
+                [submission for submission in expired if submission.content_hash is None]
+            )
+            stats.objects += deleted_objects
+            # Submissions with objects left are retried next run
+            ids = [submission.id for submission in expired if submission.id not in failed_ids]
+            if not ids:
+                continue
+            deleted = await crud_image_submission.delete_expired_submissions(db, submission_ids=ids, expired_before=now)
+            reaped += deleted
+            stats.rows += deleted
+
+        # Delta sync tokens older than the lifetime get a full reload, so older tombstones are unused
+        tombstone_cutoff = now - datetime.timedelta(days=settings.SUBMISSION_LIFETIME_DAYS)
+        while True:
+            deleted = await crud_image_submission.delete_old_tombstones(
+                db, deleted_before=tombstone_cutoff, limit=storage.delete_batch_size
+            )
+            stats.rows += deleted
+            if deleted < storage.delete_batch_size:
+                break
+    stats.finish()
+    if reaped:
+        print(f"Reaped {reaped} expired submissions.")
+    return reaped
@@ -0,0 +1,66 @@
+from typing import Any, AsyncIterator, List
+
+import orjson
+from fastapi.responses import JSONResponse
+
+def dumps(content: Any) -> bytes:
+    """Encodes plain data (dicts, lists, datetimes, ...) to JSON bytes with orjson."""
+    return orjson.dumps(content)
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, for endpoints that return plain data built
+    without Pydantic models. Bytes are sent as they are (bodies encoded ahead of
+    time, e.g. cached pages).
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+# --- Streamed GeoJSON / NDJSON ---
+
+GEOJSON_MEDIA_TYPE = "application/geo+json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def geojson_feature(row: dict) -> dict:
+    """GeoJSON Point feature of a row with latitude and longitude; the other columns become properties."""
+    properties = dict(row)
+    longitude = properties.pop("longitude")
+    latitude = properties.pop("latitude")
+    return {
+        "type": "Feature",
+        "id": properties.get("id"),
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+        "properties": properties,
+    }
+
+async def stream_features(rows: AsyncIterator[dict], *, collection: bool, chunk_rows: int = 100) -> AsyncIterator[bytes]:
+    """
+    Encodes rows as GeoJSON features while they arrive: one FeatureCollection
+    (collection=True) or one feature per line (NDJSON). Features are sent in
+    chunks of `chunk_rows`, so memory stays flat however many rows there are.
+    An error mid-stream is re-raised, which aborts the response instead of
+    ending it with a truncated but well-formed body.
+    """
+    separator = b"," if collection else b""
+    terminator = b"" if collection else b"\n"
+    if collection:
+        yield b'{"type":"FeatureCollection","features":['
+    chunk: List[bytes] = []
+    first = True
+    try:
+        async for row in rows:
+            chunk.append((b"" if first else separator) + dumps(geojson_feature(row)) + terminator)
+            first = False
+            if len(chunk) >= chunk_rows:
+                yield b"".join(chunk)
+                chunk = []
+    except Exception as e:
+        print(f"Error streaming features: {e}") # Log the error
+        raise
+    if chunk:
+        yield b"".join(chunk)
+    if collection:
+        yield b"]}"
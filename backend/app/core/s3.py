@@ -0,0 +1,191 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List, Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .config import settings
+
+# --- Shared S3 Client ---
+# boto3 clients are thread-safe, so one client (and its connection pool) is shared
+# by all requests of a worker. Blocking transfers run in a dedicated thread pool
+# so they never stall the event loop, and a semaphore bounds concurrent transfers.
+
+_client = None
+_client_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_transfer_slots: Optional[asyncio.Semaphore] = None
+
+# Multipart settings for upload_fileobj; transfers already run in the pool,
+# so each one uses a small number of threads of its own
+_transfer_config = TransferConfig(max_concurrency=4)
+
+def get_s3_client():
+    """Returns the shared S3 client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client(
+                    's3',
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_REGION,
+                    endpoint_url=settings.S3_ENDPOINT_URL, # None for AWS, set for MinIO/moto
+                    config=Config(
+                        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                        retries={"max_attempts": 3, "mode": "standard"},
+                        tcp_keepalive=True,
+                    ),
+                )
+    return _client
+
+def init_s3() -> None:
+    """Creates the shared client and transfer pool. Called once at application startup."""
+    global _executor, _transfer_slots
+    get_s3_client()
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.S3_MAX_CONCURRENT_TRANSFERS, thread_name_prefix="s3-transfer"
+        )
+        _transfer_slots = asyncio.Semaphore(settings.S3_MAX_CONCURRENT_TRANSFERS)
+
+def shutdown_s3() -> None:
+    """Waits for running transfers and releases the transfer pool. Called at shutdown."""
+    global _executor, _transfer_slots
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+        _transfer_slots = None
+
+async def run_transfer(func, *args, **kwargs):
+    """
+    Runs a blocking S3 call in the transfer pool, waiting for a free slot first.
+    At most S3_MAX_CONCURRENT_TRANSFERS calls run at once; further callers wait
+    on the event loop without holding a thread.
+    """
+    if _executor is None:
+        init_s3()
+    loop = asyncio.get_running_loop()
+    async with _transfer_slots:
+        return await loop.run_in_executor(_executor, lambda: func(*args, **kwargs))
+
+async def upload_fileobj(fileobj: BinaryIO, object_key: str, content_type: str) -> None:
+    """Uploads a file-like object to the bucket without blocking the event loop."""
+    await run_transfer(
+        get_s3_client().upload_fileobj,
+        fileobj,
+        settings.S3_BUCKET_NAME,
+        object_key,
+        ExtraArgs={'ContentType': content_type}, # Set content type for proper browser handling
+        Config=_transfer_config,
+    )
+
+async def put_object(body: bytes, object_key: str, content_type: str) -> None:
+    """Stores a small in-memory object with a single PUT."""
+    await run_transfer(
+        get_s3_client().put_object,
+        Bucket=settings.S3_BUCKET_NAME, Key=object_key, Body=body, ContentType=content_type,
+    )
+
+# --- Multipart Uploads ---
+# Used by streaming ingestion: parts are sent as they arrive, so only one part is
+# held in memory at a time. S3 requires every part except the last to be >= 5 MiB.
+
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024
+
+async def create_multipart_upload(object_key: str, content_type: str) -> str:
+    """Starts a multipart upload and returns its upload id."""
+    response = await run_transfer(
+        get_s3_client().create_multipart_upload,
+        Bucket=settings.S3_BUCKET_NAME, Key=object_key, ContentType=content_type,
+    )
+    return response["UploadId"]
+
+async def upload_part(object_key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+    """Uploads one part; returns the {"PartNumber", "ETag"} entry needed to complete the upload."""
+    response = await run_transfer(
+        get_s3_client().upload_part,
+        Bucket=settings.S3_BUCKET_NAME, Key=object_key, UploadId=upload_id, PartNumber=part_number, Body=body,
+    )
+    return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+async def complete_multipart_upload(object_key: str, upload_id: str, parts: List[dict]) -> None:
+    await run_transfer(
+        get_s3_client().complete_multipart_upload,
+        Bucket=settings.S3_BUCKET_NAME, Key=object_key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+    )
+
+async def abort_multipart_upload(object_key: str, upload_id: str) -> None:
+    """Discards the parts uploaded so far. Errors are logged, not raised."""
+    try:
+        await run_transfer(
+            get_s3_client().abort_multipart_upload,
+            Bucket=settings.S3_BUCKET_NAME, Key=object_key, UploadId=upload_id,
+        )
+    except (ClientError, BotoCoreError) as e:
+        print(f"S3 Abort Multipart Error for {object_key}: {e}") # Log the error
+
+async def download_bytes(object_key: str) -> bytes:
+    """Downloads an object into memory without blocking the event loop."""
+    def download() -> bytes:
+        response = get_s3_client().get_object(Bucket=settings.S3_BUCKET_NAME, Key=object_key)
+        return response["Body"].read()
+    return await run_transfer(download)
+
+def generate_presigned_post(object_key: str, content_type: str, max_bytes: int, expires_in: int) -> dict:
+    """
+    Presigned POST for uploading one object directly to the bucket.
+    The policy pins the key and content type and limits the size to max_bytes.
+    Signing is local (no network call), so this is safe to call on the event loop.
+    """
+    return get_s3_client().generate_presigned_post(
+        Bucket=settings.S3_BUCKET_NAME,
+        Key=object_key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, max_bytes],
+        ],
+        ExpiresIn=expires_in,
+    )
+
+async def head_object(object_key: str) -> Optional[dict]:
+    """Returns the object's metadata (ContentLength, ContentType, ...) or None if it does not exist."""
+    try:
+        return await run_transfer(get_s3_client().head_object, Bucket=settings.S3_BUCKET_NAME, Key=object_key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+# S3 DeleteObjects accepts at most 1000 keys per call
+DELETE_BATCH_SIZE = 1000
+
+def delete_objects(object_keys: List[str]) -> List[str]:
+    """
+    Deletes objects in batches of up to 1000 keys (blocking; call from a worker thread).
+    Returns the keys that could not be deleted.
+    """
+    client = get_s3_client()
+    failed = []
+    for start in range(0, len(object_keys), DELETE_BATCH_SIZE):
+        batch = object_keys[start:start + DELETE_BATCH_SIZE]
+        response = client.delete_objects(
+            Bucket=settings.S3_BUCKET_NAME,
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+        )
+        failed.extend(error["Key"] for error in response.get("Errors", []))
+    return failed
+
+def object_url(object_key: str) -> str:
+    """Public URL of an object in the bucket."""
+    if settings.S3_ENDPOINT_URL:
+        # Path-style URL for S3-compatible stand-ins (MinIO, moto)
+        return f"{settings.S3_ENDPOINT_URL.rstrip('/')}/{settings.S3_BUCKET_NAME}/{object_key}"
+    # Consider using CloudFront in production for better performance/security
+    return f"https://{settings.S3_BUCKET_NAME}.s3.{settings.AWS_REGION}.amazonaws.com/{object_key}"
@@ -0,0 +1,102 @@
+from typing import BinaryIO, Dict, List, Optional
+
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import BotoCoreError, ClientError
+
+from app.core import s3
+from app.core.storage import MultipartWriter, ObjectInfo, StorageBackend, StorageError
+
+# --- S3 Storage Backend ---
+# Kept apart from app.core.storage so boto3 is only imported when STORAGE_BACKEND
+# is "s3" (get_storage imports this module on first use).
+
+class _S3MultipartWriter(MultipartWriter):
+    def __init__(self, key: str, upload_id: str):
+        self.key = key
+        self.upload_id = upload_id
+        self.parts: List[dict] = []
+
+    async def write_part(self, data: bytes) -> None:
+        try:
+            self.parts.append(await s3.upload_part(self.key, self.upload_id, len(self.parts) + 1, data))
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    async def complete(self) -> None:
+        try:
+            await s3.complete_multipart_upload(self.key, self.upload_id, self.parts)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    async def abort(self) -> None:
+        await s3.abort_multipart_upload(self.key, self.upload_id)
+
+class S3Storage(StorageBackend):
+    """
+    Objects in the S3_BUCKET_NAME bucket, using the shared client in app.core.s3.
+    botocore errors (ClientError for S3 responses, BotoCoreError for connection and
+    credential problems) and failed managed uploads are raised as StorageError.
+    """
+
+    min_part_size = s3.MULTIPART_MIN_PART_SIZE
+    delete_batch_size = s3.DELETE_BATCH_SIZE
+
+    def startup(self) -> None:
+        s3.init_s3()
+
+    def shutdown(self) -> None:
+        s3.shutdown_s3()
+
+    async def save(self, fileobj: BinaryIO, key: str, content_type: str) -> None:
+        try:
+            await s3.upload_fileobj(fileobj, key, content_type)
+        except (ClientError, BotoCoreError, S3UploadFailedError) as e: # The transfer manager wraps ClientError
+            raise StorageError(str(e)) from e
+
+    async def save_bytes(self, data: bytes, key: str, content_type: str) -> None:
+        try:
+            await s3.put_object(data, key, content_type)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    async def begin_multipart(self, key: str, content_type: str) -> MultipartWriter:
+        try:
+            return _S3MultipartWriter(key, await s3.create_multipart_upload(key, content_type))
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    async def read_bytes(self, key: str) -> bytes:
+        try:
+            return await s3.download_bytes(key)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    async def head(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            head = await s3.head_object(key)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+        if head is None:
+            return None
+        return ObjectInfo(size=head["ContentLength"], content_type=head.get("ContentType", ""), etag=head.get("ETag"))
+
+    def delete_objects(self, keys: List[str]) -> List[str]:
+        try:
+            return s3.delete_objects(keys)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    async def delete_objects_async(self, keys: List[str]) -> List[str]:
+        try:
+            return await s3.run_transfer(s3.delete_objects, keys)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def url(self, key: str) -> str:
+        return s3.object_url(key)
+
+    def presigned_upload(self, key: str, content_type: str, max_bytes: int, expires_in: int) -> Dict:
+        try:
+            return s3.generate_presigned_post(key, content_type, max_bytes=max_bytes, expires_in=expires_in)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
@@ -1,24 +1,102 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Optional, Tuple
 
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 from .config import settings
 
 # Password Hashing Context
-# Using bcrypt as the default scheme
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Using bcrypt as the default scheme; hashes made with other rounds count as outdated.
+# Built on first use (in the hashing pool's processes), so passlib stays out of startup.
+_pwd_context = None
+
+def get_pwd_context():
+    """Returns the shared passlib CryptContext, creating it on first use."""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS)
+    return _pwd_context
 
 # --- Password Utilities ---
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hashes a plain password."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+# --- Password Hashing Pool ---
+# A bcrypt call burns 100-300 ms of CPU holding the GIL, so hashing runs in its own
+# process pool instead of the threadpool, where a burst of logins would starve other
+# requests. At most PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_DEPTH calls wait for
+# the pool at a time; beyond that calls fail fast with PasswordHasherBusy.
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashing calls are waiting for the pool."""
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pending = 0 # Calls running or queued (only touched on the event loop)
+_hash_stats = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0}
+
+def init_password_pool() -> None:
+    """Creates the password hashing pool. Called once at application startup."""
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+
+def shutdown_password_pool() -> None:
+    """Releases the password hashing pool. Called at shutdown."""
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=True, cancel_futures=True)
+        _hash_pool = None
+
+async def _run_in_hash_pool(func: Callable[..., Any], *args: Any) -> Any:
+    global _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_DEPTH:
+        _hash_stats["rejected"] += 1
+        raise PasswordHasherBusy()
+    if _hash_pool is None:
+        init_password_pool()
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, func, *args)
+    finally:
+        _hash_pending -= 1
+
+async def hash_password(password: str) -> str:
+    """Hashes a plain password in the hashing pool."""
+    hashed = await _run_in_hash_pool(get_password_hash, password)
+    _hash_stats["hashed"] += 1
+    return hashed
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password in the hashing pool. Returns (valid, new_hash): new_hash is
+    set when the stored hash uses outdated parameters (e.g. fewer bcrypt rounds than
+    PASSWORD_BCRYPT_ROUNDS) and should replace it.
+    """
+    valid, new_hash = await _run_in_hash_pool(_verify_and_update, plain_password, hashed_password)
+    _hash_stats["verified"] += 1
+    if new_hash:
+        _hash_stats["rehashed"] += 1
+    return valid, new_hash
+
+def password_pool_stats() -> dict:
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "pending": _hash_pending,
+        "max_pending": settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_DEPTH,
+        **_hash_stats,
+    }
 
 # --- JWT Utilities ---
 
@@ -0,0 +1,310 @@
+import hashlib
+import hmac
+import io
+import json
+import mimetypes
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from urllib.parse import urlencode
+from typing import BinaryIO, Dict, List, NamedTuple, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+# --- Storage Backends ---
+# Originals and derivatives are stored through a StorageBackend selected by
+# STORAGE_BACKEND: "s3" (the default) or "local", which keeps files on the
+# API server's disk and serves them itself (single-node and edge deployments).
+
+class StorageError(Exception):
+    """A storage operation failed (S3 client error or file system error)."""
+
+class ObjectInfo(NamedTuple):
+    size: int
+    content_type: str
+    etag: Optional[str] # Strong validator of the stored bytes, if known
+
+class MultipartWriter(ABC):
+    """
+    Receives an object part by part (in order) and stores it on complete().
+    Backend failures raise StorageError, as in StorageBackend.
+    """
+
+    @abstractmethod
+    async def write_part(self, data: bytes) -> None:
+        """Uploads the next part. Raises StorageError."""
+
+    @abstractmethod
+    async def complete(self) -> None:
+        """Stores the object from the parts written. Raises StorageError."""
+
+    @abstractmethod
+    async def abort(self) -> None:
+        """Discards what was written so far. Errors are logged, not raised."""
+
+class StorageBackend(ABC):
+    """
+    Interface implemented by S3Storage (app.core.s3_storage) and LocalStorage.
+    Implementations raise StorageError for every failure of the store itself (S3
+    errors, unreachable endpoints, file system errors), never the client library's
+    own exceptions, so callers only handle StorageError. Other exceptions are bugs.
+    """
+
+    # Smallest part accepted by write_part (except for the last part)
+    min_part_size = 0
+    # Most keys delete_objects handles in one call
+    delete_batch_size = 1000
+
+    def startup(self) -> None:
+        """Creates long-lived resources. Called once at application startup."""
+
+    def shutdown(self) -> None:
+        """Releases long-lived resources. Called at shutdown."""
+
+    @abstractmethod
+    async def save(self, fileobj: BinaryIO, key: str, content_type: str) -> None:
+        """Stores a file object under the key. Raises StorageError."""
+
+    @abstractmethod
+    async def save_bytes(self, data: bytes, key: str, content_type: str) -> None:
+        """Stores bytes under the key. Raises StorageError."""
+
+    @abstractmethod
+    async def begin_multipart(self, key: str, content_type: str) -> MultipartWriter:
+        """Starts an object that is written part by part. Raises StorageError."""
+
+    @abstractmethod
+    async def read_bytes(self, key: str) -> bytes:
+        """Returns the bytes of a stored object. Raises StorageError, also if it does not exist."""
+
+    @abstractmethod
+    async def head(self, key: str) -> Optional[ObjectInfo]:
+        """Returns size and content type of a stored object, or None if it does not exist. Raises StorageError."""
+
+    @abstractmethod
+    def delete_objects(self, keys: List[str]) -> List[str]:
+        """
+        Deletes objects (blocking; call from a worker thread). Returns the keys that
+        could not be deleted; raises StorageError when the store cannot be reached at all.
+        """
+
+    async def delete_objects_async(self, keys: List[str]) -> List[str]:
+        """delete_objects off the event loop. Same result and errors."""
+        return await run_in_threadpool(self.delete_objects, keys)
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """Public URL of a stored object. Does no I/O and raises nothing."""
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        """Key of the object a url() points to, or None for URLs of other stores."""
+        prefix = self.url("")
+        if url and url.startswith(prefix) and len(url) > len(prefix):
+            return url[len(prefix):]
+        return None
+
+    @abstractmethod
+    def presigned_upload(self, key: str, content_type: str, max_bytes: int, expires_in: int) -> Dict:
+        """
+        Returns {"url", "fields"} for a browser form POST that stores one object
+        (fields first, file last), limited to the key, content type and size.
+        Raises StorageError.
+        """
+
+# --- Local Disk ---
+# Files live under LOCAL_STORAGE_ROOT/{key}, each with a {key}.meta.json sidecar
+# holding its content type, size and SHA-256 (the strong ETag). Writes go to a
+# temporary file that is renamed into place, so readers never see partial files.
+# Files are served by the /media router (app/api/v1/endpoints/media.py).
+
+META_SUFFIX = ".meta.json"
+
+class _LocalMultipartWriter(MultipartWriter):
+    def __init__(self, storage: "LocalStorage", key: str, content_type: str):
+        self.storage = storage
+        self.key = key
+        self.content_type = content_type
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.tmp_file = None
+
+    async def write_part(self, data: bytes) -> None:
+        def write() -> None:
+            if self.tmp_file is None:
+                self.tmp_file = self.storage._open_temp(self.key)
+            self.tmp_file.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        await run_in_threadpool(self.storage._io, write)
+
+    async def complete(self) -> None:
+        def finish() -> None:
+            if self.tmp_file is None:
+                self.tmp_file = self.storage._open_temp(self.key)
+            self.storage._commit_temp(self.tmp_file, self.key, self.content_type, self.size, self.digest.hexdigest())
+        await run_in_threadpool(self.storage._io, finish)
+
+    async def abort(self) -> None:
+        if self.tmp_file is not None:
+            self.tmp_file.close()
+            try:
+                os.unlink(self.tmp_file.name)
+            except OSError as e:
+                print(f"Could not remove partial upload {self.tmp_file.name}: {e}") # Log the error
+
+class LocalStorage(StorageBackend):
+    """Files on the local disk, served by the API itself (FileResponse with Range and ETag support)."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+
+    def startup(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        """File path of a key. Raises StorageError for keys that would leave the storage root."""
+        path = (self.root / key).resolve()
+        if path == self.root or self.root not in path.parents or key.endswith(META_SUFFIX):
+            raise StorageError(f"Invalid storage key: {key}")
+        return path
+
+    def _io(self, func, *args):
+        # Runs a blocking file operation, reporting OS errors as StorageError
+        try:
+            return func(*args)
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def _open_temp(self, key: str):
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=path.parent, prefix=".upload-", delete=False)
+
+    def _commit_temp(self, tmp_file, key: str, content_type: str, size: int, sha256: str) -> None:
+        path = self.path(key)
+        tmp_file.flush()
+        tmp_file.close()
+        meta = {"content_type": content_type, "size": size, "sha256": sha256}
+        meta_path = path.with_name(path.name + META_SUFFIX)
+        meta_path.write_text(json.dumps(meta))
+        os.replace(tmp_file.name, path)
+
+    def _write(self, fileobj: BinaryIO, key: str, content_type: str) -> None:
+        digest = hashlib.sha256()
+        size = 0
+        tmp_file = self._open_temp(key)
+        try:
+            for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+                digest.update(chunk)
+                size += len(chunk)
+                tmp_file.write(chunk)
+            self._commit_temp(tmp_file, key, content_type, size, digest.hexdigest())
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+
+    async def save(self, fileobj: BinaryIO, key: str, content_type: str) -> None:
+        await run_in_threadpool(self._io, self._write, fileobj, key, content_type)
+
+    async def save_bytes(self, data: bytes, key: str, content_type: str) -> None:
+        await self.save(io.BytesIO(data), key, content_type)
+
+    async def begin_multipart(self, key: str, content_type: str) -> MultipartWriter:
+        self.path(key) # Validate the key before any data arrives
+        return _LocalMultipartWriter(self, key, content_type)
+
+    async def read_bytes(self, key: str) -> bytes:
+        return await run_in_threadpool(self._io, self.path(key).read_bytes)
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        """Blocking variant of head(), used when serving files."""
+        path = self.path(key)
+        try:
+            meta = json.loads(path.with_name(path.name + META_SUFFIX).read_text())
+        except (OSError, ValueError):
+            meta = None
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        if meta is None:
+            # File placed without a sidecar: guess the type, no strong ETag
+            return ObjectInfo(size=size, content_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream", etag=None)
+        return ObjectInfo(size=size, content_type=meta["content_type"], etag=f'"{meta["sha256"]}"')
+
+    async def head(self, key: str) -> Optional[ObjectInfo]:
+        return await run_in_threadpool(self._io, self.stat, key)
+
+    def delete_objects(self, keys: List[str]) -> List[str]:
+        failed = []
+        for key in keys:
+            try:
+                path = self.path(key)
+                for file_path in (path, path.with_name(path.name + META_SUFFIX)):
+                    try:
+                        file_path.unlink()
+                    except FileNotFoundError:
+                        pass
+            except (OSError, StorageError) as e:
+                print(f"Could not delete {key}: {e}") # Log the error
+                failed.append(key)
+        return failed
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    # Presigned uploads: the form fields carry an HMAC over the key, content type,
+    # size limit and expiry, checked by the /media upload route (like an S3 POST policy).
+
+    def _signature(self, key: str, content_type: str, max_bytes: int, expires: int) -> str:
+        message = f"{key}\n{content_type}\n{max_bytes}\n{expires}".encode()
+        return hmac.new(settings.JWT_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+    def presigned_upload(self, key: str, content_type: str, max_bytes: int, expires_in: int) -> Dict:
+        self.path(key)
+        expires = int(time.time()) + expires_in
+        fields = {
+            "key": key,
+            "Content-Type": content_type,
+            "max_bytes": str(max_bytes),
+            "expires": str(expires),
+            "signature": self._signature(key, content_type, max_bytes, expires),
+        }
+        # The signed policy also travels in the query string, so /media/upload can
+        # check it before reading the body; the form fields are kept for S3 parity
+        return {"url": f"{self.base_url}/upload?{urlencode(fields)}", "fields": fields}
+
+    def verify_upload(self, fields: Dict[str, str]) -> bool:
+        """Checks the signature and expiry of presigned upload fields."""
+        try:
+            key = fields["key"]
+            content_type = fields["Content-Type"]
+            max_bytes = int(fields["max_bytes"])
+            expires = int(fields["expires"])
+            signature = fields["signature"]
+        except (KeyError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(signature, self._signature(key, content_type, max_bytes, expires))
+
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    """Returns the configured storage backend."""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "local":
+            _storage = LocalStorage(settings.LOCAL_STORAGE_ROOT, settings.LOCAL_STORAGE_URL)
+        elif settings.STORAGE_BACKEND == "s3":
+            from app.core.s3_storage import S3Storage # boto3 is only loaded when S3 is used
+            _storage = S3Storage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return _storage
@@ -0,0 +1,108 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.crud import crud_vote
+from app.db.session import get_engine
+
+def _counts(value: int) -> Tuple[int, int]:
+    """(thumbs up, thumbs down) contributed by a vote value."""
+    return (1 if value > 0 else 0, 1 if value < 0 else 0)
+
+class VoteBuffer:
+    """
+    Write-behind buffer for votes. Votes are coalesced per (user, submission), so
+    only a user's last vote is written, and flushed in one batch statement
+    (crud_vote.apply_votes) per interval or once max_pending votes are waiting.
+    Until then, count_deltas() and overlay() let responses include the buffered votes.
+    The batch statement computes the counter changes from the stored votes, so the
+    deltas kept here only affect what is displayed, never what is written.
+    All methods run on the event loop, so no lock is needed around the dicts.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[int, int], int] = {} # (user_id, submission_id) -> value
+        self._deltas: Dict[int, Tuple[int, int]] = {} # submission_id -> (up, down) not yet written
+        self._flushing: Dict[Tuple[int, int], int] = {} # Batch being written
+        self._in_flight: Dict[int, Tuple[int, int]] = {} # Its deltas
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.votes = 0
+        self.flushes = 0
+        self.counter_updates = 0
+
+    def add(self, user_id: int, submission_id: int, value: int, stored_value: int) -> None:
+        """
+        Buffers a vote. `stored_value` is the user's vote as read from the database;
+        a vote still waiting in the buffer takes its place.
+        """
+        key = (user_id, submission_id)
+        old_up, old_down = _counts(self.user_vote(user_id, submission_id, stored_value))
+        new_up, new_down = _counts(value)
+        up, down = self._deltas.get(submission_id, (0, 0))
+        self._deltas[submission_id] = (up + new_up - old_up, down + new_down - old_down)
+        self._pending[key] = value
+        self.votes += 1
+        if len(self._pending) >= self.max_pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    def user_vote(self, user_id: int, submission_id: int, stored_value: int) -> int:
+        """The user's vote including buffered votes."""
+        key = (user_id, submission_id)
+        return self._pending.get(key, self._flushing.get(key, stored_value))
+
+    def count_deltas(self, submission_id: int) -> Tuple[int, int]:
+        """(up, down) to add to the stored counts of a submission for buffered votes."""
+        up, down = self._deltas.get(submission_id, (0, 0))
+        flying_up, flying_down = self._in_flight.get(submission_id, (0, 0))
+        return (up + flying_up, down + flying_down)
+
+    def overlay(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Adds buffered votes to thumbs_up_count / thumbs_down_count of a submission row dict (in place)."""
+        if self._deltas or self._in_flight:
+            up, down = self.count_deltas(row["id"])
+            if up or down:
+                row["thumbs_up_count"] += up
+                row["thumbs_down_count"] += down
+        return row
+
+    async def flush(self) -> None:
+        """Writes all buffered votes. Failed batches are put back and retried on the next flush."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch = self._flushing = self._pending
+            self._pending = {}
+            self._in_flight, self._deltas = self._deltas, {}
+            try:
+                async with AsyncSession(get_engine()) as db:
+                    self.counter_updates += await crud_vote.apply_votes(
+                        db, votes=[(user_id, submission_id, value) for (user_id, submission_id), value in batch.items()]
+                    )
+                self.flushes += 1
+            except Exception as e:
+                print(f"Vote flush of {len(batch)} votes failed: {e}") # Log the error
+                # Votes cast since the batch was taken are newer and win
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+                for submission_id, (up, down) in self._in_flight.items():
+                    pending_up, pending_down = self._deltas.get(submission_id, (0, 0))
+                    self._deltas[submission_id] = (up + pending_up, down + pending_down)
+            finally:
+                self._flushing, self._in_flight = {}, {}
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "votes": self.votes,
+            "flushes": self.flushes,
+            "counter_updates": self.counter_updates,
+        }
+
+vote_buffer = VoteBuffer(settings.VOTE_FLUSH_MAX_PENDING)
+
+def vote_buffering_enabled() -> bool:
+    return settings.VOTE_FLUSH_INTERVAL_SECONDS > 0
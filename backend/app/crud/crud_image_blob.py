@@ -0,0 +1,80 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import case, delete, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from typing import Dict, List, Tuple
+import datetime
+
+from app.models.image_blob import ImageBlob
+
+async def acquire_blob(db: AsyncSession, *, sha256: str, object_key: str, content_type: str, size: int) -> Tuple[str, bool]:
+    """
+    Add a reference to the blob for `sha256`, registering it under `object_key` if it is new.
+    Single atomic upsert, so concurrent uploads of the same content never lose a count.
+    Returns (object key of the blob, created): the existing key if it was already stored,
+    and whether the row was inserted by this call (its object then still has to be stored
+    under `object_key` if the caller has not done so yet).
+    Not committed here: the reference is committed together with the submission using it.
+    The row stays locked until then, so the blob reaper cannot delete it in between.
+    """
+    now = datetime.datetime.utcnow()
+    statement = insert(ImageBlob).values(
+        sha256=sha256, object_key=object_key, content_type=content_type, size=size, ref_count=1, updated_at=now
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ImageBlob.sha256],
+        set_={"ref_count": ImageBlob.ref_count + 1, "updated_at": now},
+    ).returning(ImageBlob.object_key, literal_column("xmax = 0").label("created")) # xmax is 0 for a fresh insert
+    row = (await db.exec(statement)).one()
+    return row.object_key, row.created
+
+async def release_blob(db: AsyncSession, *, sha256: str) -> None:
+    """
+    Drop one reference to a blob. Unreferenced blobs are left for the blob reaper,
+    so an upload of the same content shortly after can still reuse them.
+    Not committed here: the release is committed together with the submission deletion.
+    """
+    await db.exec(
+        ImageBlob.__table__.update()
+        .where(ImageBlob.sha256 == sha256)
+        .values(ref_count=ImageBlob.ref_count - 1, updated_at=datetime.datetime.utcnow())
+    )
+
+async def release_blobs(db: AsyncSession, *, references: Dict[str, int]) -> None:
+    """
+    Drop several references at once ({sha256: number of references}) in one UPDATE.
+    Not committed here, like release_blob.
+    """
+    if not references:
+        return
+    await db.exec(
+        ImageBlob.__table__.update()
+        .where(ImageBlob.sha256.in_(list(references)))
+        .values(
+            ref_count=ImageBlob.ref_count - case(references, value=ImageBlob.sha256),
+            updated_at=datetime.datetime.utcnow(),
+        )
+    )
+
+async def delete_unreferenced_blobs(db: AsyncSession, *, released_before: datetime.datetime, limit: int) -> List[Tuple[str, int]]:
+    """
+    Delete up to `limit` blob rows that have had no references since `released_before`.
+    Rows locked by a concurrent acquire are skipped. Returns (object key, size) of the
+    deleted blobs, whose objects the caller must remove from storage.
+    """
+    candidates = (
+        select(ImageBlob.sha256)
+        .where(ImageBlob.ref_count <= 0)
+        .where(ImageBlob.updated_at < released_before)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    statement = (
+        delete(ImageBlob)
+        .where(ImageBlob.sha256.in_(candidates.scalar_subquery()))
+        .where(ImageBlob.ref_count <= 0)
+        .returning(ImageBlob.object_key, ImageBlob.size)
+    )
+    deleted = [(row.object_key, row.size) for row in (await db.exec(statement)).all()]
+    await db.commit()
+    return deleted
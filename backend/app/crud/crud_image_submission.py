@@ -1,81 +1,317 @@
-from sqlmodel import Session, select
-from sqlalchemy.sql.expression import func # Use func for SQL functions
-from geoalchemy2.functions import ST_DistanceSphere, ST_MakePoint # Import GeoAlchemy functions
-from typing import List, Optional # Import Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.sql.expression import and_, cast, func, or_, tuple_ # Use func for SQL functions
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncMappingResult
+from sqlalchemy.dialects.postgresql import BIT
+from geoalchemy2.functions import ST_DWithin, ST_MakePoint # Import GeoAlchemy functions
+from typing import Any, List, Optional, Tuple # Import Optional
+import math
 
-from app.models.image_submission import ImageSubmission, ImageSubmissionCreate, ImageSubmissionUpdate # Import Update schema
+from app.models.image_submission import ImageSubmission, ImageSubmissionCreate, ImageSubmissionUpdate, NearbySort, SubmissionTombstone # Import Update schema
 from app.models.user import User # Needed for type hinting user object
+from app.models.vote import Vote
+from app.core.config import settings
+from app.core.cache import invalidate_caches_for_point
+from app.core.geo import point_from_wkb
+from app.core.storage import StorageError, get_storage
+from app.crud import crud_image_blob
 import datetime
 
-def create_image_submission(db: Session, *, submission_in: ImageSubmissionCreate, user: User, image_url: str) -> ImageSubmission:
+async def create_image_submission(
+    db: AsyncSession, *, submission_in: ImageSubmissionCreate, user: User, image_url: str, content_hash: Optional[str] = None
+) -> ImageSubmission:
     """
     Create a new image submission in the database.
+    `content_hash` links the submission to the ImageBlob it references (acquired by the caller).
     """
     # Convert lat/lon to WKT format for GeoAlchemy2 POINT
     # SRID=4326 is assumed based on the model definition
     location_wkt = f'SRID=4326;POINT({submission_in.longitude} {submission_in.latitude})'
 
     # Calculate expiration date (e.g., 3 days from now)
-    expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=3)
+    expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=settings.SUBMISSION_LIFETIME_DAYS)
 
     # Create the database model instance
     db_submission = ImageSubmission(
         description=submission_in.description,
         location=location_wkt,
         image_url=image_url, # Provided after S3 upload
+        content_hash=content_hash,
         expires_at=expires_at,
         user_id=user.id,
         # Defaults for thumbs_up_count, thumbs_down_count, is_locked are handled by the model
     )
 
     db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
+    await db.commit()
+    await db.refresh(db_submission)
+    invalidate_caches_for_point(submission_in.longitude, submission_in.latitude)
     return db_submission
 
-def get_nearby_submissions(db: Session, *, latitude: float, longitude: float, radius_km: float) -> List[ImageSubmission]:
+def _geography(expr):
     """
-    Get image submissions within a certain radius of a given point,
-    filtering out expired ones.
+    Wrap a geometry expression in geography(). Matches the expression used by
+    idx_imagesubmission_location_geog so the planner can use that GiST index.
     """
+    return func.geography(expr)
+
+# Columns of list rows; the geometry is replaced by its coordinates
+_LIST_COLUMNS = [column for column in ImageSubmission.__table__.columns if column.name != "location"]
+
+def _nearby_statement(
+    *,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    sort: NearbySort,
+    limit: Optional[int],
+    after: Optional[Tuple[Any, int]],
+) -> Any:
+    """Query of get_nearby_submissions and stream_nearby_submissions."""
     # Convert radius from km to meters
     radius_meters = radius_km * 1000
 
-    # Create a POINT geometry for the center location using ST_MakePoint
-    # Note: Longitude comes first in ST_MakePoint(x, y)
-    center_point = ST_MakePoint(longitude, latitude)
-    # Set SRID explicitly if needed, though often inferred or handled by GeoAlchemy
-    # center_point = func.ST_SetSRID(center_point, 4326) # Usually not needed if column has SRID
+    # Create a POINT for the center location (longitude comes first in ST_MakePoint(x, y))
+    # and cast both sides to geography so ST_DWithin works in meters.
+    center = _geography(func.ST_SetSRID(ST_MakePoint(longitude, latitude), 4326))
+    location = _geography(ImageSubmission.location)
+    distance_m = func.ST_Distance(location, center).label("distance_m")
 
     # Get current time to filter expired submissions
     now = datetime.datetime.utcnow()
 
-    # Build the query using ST_DistanceSphere for accurate distance calculation
-    # ST_DistanceSphere returns distance in meters
+    # ST_DWithin on geography is index-aware: it adds a bbox `&&` check against the
+    # functional GiST index before the exact spheroid distance test, unlike
+    # ST_DistanceSphere(...) <= radius which has to be evaluated for every row.
+    statement = (
+        select(
+            *_LIST_COLUMNS,
+            func.ST_Y(ImageSubmission.location).label("latitude"),
+            func.ST_X(ImageSubmission.location).label("longitude"),
+            distance_m,
+        )
+        .where(ImageSubmission.expires_at > now)
+        .where(ST_DWithin(location, center, radius_meters))
+    )
+    # Keyset seek: continue strictly after the last row of the previous page.
+    # Row-value comparison on (uploaded_at, id) is a range scan on ix_imagesubmission_uploaded_at_id.
+    if sort == "distance":
+        if after is not None:
+            statement = statement.where(tuple_(distance_m, ImageSubmission.id) > tuple_(*after))
+        statement = statement.order_by(distance_m, ImageSubmission.id)
+    else:
+        if after is not None:
+            statement = statement.where(tuple_(ImageSubmission.uploaded_at, ImageSubmission.id) < tuple_(*after))
+        statement = statement.order_by(ImageSubmission.uploaded_at.desc(), ImageSubmission.id.desc())
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+async def get_nearby_submissions(
+    db: AsyncSession,
+    *,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    sort: NearbySort = "newest",
+    limit: Optional[int] = None,
+    after: Optional[Tuple[Any, int]] = None,
+) -> List[dict]:
+    """
+    Get image submissions within a certain radius of a given point,
+    filtering out expired ones, newest first or nearest first.
+    Returns plain dicts with the submission columns, latitude and longitude
+    (ST_Y/ST_X, instead of the geometry) and distance_m, ready to be serialized
+    without building ORM objects.
+
+    Pagination is keyset-based: `after` is the sort key of the last row of the
+    previous page, (uploaded_at, id) for "newest" or (distance_m, id) for "distance".
+    """
+    statement = _nearby_statement(
+        latitude=latitude, longitude=longitude, radius_km=radius_km, sort=sort, limit=limit, after=after
+    )
+    results = await db.execute(statement)
+    return [dict(row) for row in results.mappings()]
+
+async def stream_nearby_submissions(
+    db: AsyncSession,
+    *,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    sort: NearbySort = "newest",
+    limit: Optional[int] = None,
+    after: Optional[Tuple[Any, int]] = None,
+    batch_size: int = 1000,
+) -> AsyncMappingResult:
+    """
+    Same rows as get_nearby_submissions, read through a server-side cursor
+    `batch_size` rows at a time, so the result never sits in memory as a whole.
+    The query is running once this returns; the session must stay open until
+    the result has been consumed.
+    """
+    statement = _nearby_statement(
+        latitude=latitude, longitude=longitude, radius_km=radius_km, sort=sort, limit=limit, after=after
+    ).execution_options(yield_per=batch_size)
+    results = await db.stream(statement)
+    return results.mappings()
+
+async def get_nearby_changes(
+    db: AsyncSession,
+    *,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    since: datetime.datetime,
+    now: datetime.datetime,
+    limit: int,
+) -> Tuple[List[Tuple[ImageSubmission, float]], List[int]]:
+    """
+    Get what changed within a radius between `since` and `now`:
+    - (submission, distance in meters) pairs created or updated since then (at most `limit`),
+    - IDs of submissions deleted (tombstones) or expired since then.
+    """
+    radius_meters = radius_km * 1000
+    center = _geography(func.ST_SetSRID(ST_MakePoint(longitude, latitude), 4326))
+    location = _geography(ImageSubmission.location)
+    in_radius = ST_DWithin(location, center, radius_meters)
+
+    changed_statement = (
+        select(ImageSubmission, func.ST_Distance(location, center).label("distance_m"))
+        .where(ImageSubmission.updated_at > since)
+        .where(ImageSubmission.expires_at > now)
+        .where(in_radius)
+        .order_by(ImageSubmission.updated_at, ImageSubmission.id)
+        .limit(limit)
+    )
+    changed = (await db.exec(changed_statement)).all()
+
+    expired_statement = (
+        select(ImageSubmission.id)
+        .where(ImageSubmission.expires_at > since)
+        .where(ImageSubmission.expires_at <= now)
+        .where(in_radius)
+    )
+    deleted_statement = (
+        select(SubmissionTombstone.submission_id)
+        .where(SubmissionTombstone.deleted_at > since)
+        .where(ST_DWithin(_geography(SubmissionTombstone.location), center, radius_meters))
+    )
+    removed = list((await db.exec(expired_statement)).all()) + list((await db.exec(deleted_statement)).all())
+    return changed, removed
+
+# Web Mercator (EPSG:3857) world width in meters, used to size clustering cells
+WEB_MERCATOR_WORLD_M = 2 * math.pi * 6378137
+
+def _envelope(bbox: Tuple[float, float, float, float]):
+    """Builds an SRID 4326 envelope from (min_lon, min_lat, max_lon, max_lat)."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+
+async def get_submissions_in_bounds(
+    db: AsyncSession, *, bbox: Tuple[float, float, float, float], limit: int
+) -> List[ImageSubmission]:
+    """
+    Get up to `limit` non-expired submissions inside a bounding box, newest first.
+    The `&&` bbox operator is answered by the idx_imagesubmission_location GiST index.
+    """
+    now = datetime.datetime.utcnow()
     statement = (
         select(ImageSubmission)
         .where(ImageSubmission.expires_at > now)
-        .where(
-            ST_DistanceSphere(
-                ImageSubmission.location, # The geometry column in the table
-                center_point              # The point we created
-            ) <= radius_meters
+        .where(ImageSubmission.location.op("&&")(_envelope(bbox)))
+        .order_by(ImageSubmission.uploaded_at.desc(), ImageSubmission.id.desc())
+        .limit(limit)
+    )
+    return (await db.exec(statement)).all()
+
+async def get_submission_clusters_in_bounds(
+    db: AsyncSession, *, bbox: Tuple[float, float, float, float], zoom: int, cell_px: int, limit: int
+) -> List[Any]:
+    """
+    Group non-expired submissions inside a bounding box into square grid cells
+    of `cell_px` screen pixels at the given zoom level.
+    Snapping happens in Web Mercator so cells are square on screen; the number of
+    cells depends on the viewport size, not on how many rows fall inside it.
+    Returns rows with count, latitude, longitude, representative_id and representative_image_url.
+    """
+    # Size of one cell in meters at this zoom (256 px tiles)
+    cell_size_m = WEB_MERCATOR_WORLD_M / (256 * 2 ** zoom) * cell_px
+    cell = func.ST_SnapToGrid(func.ST_Transform(ImageSubmission.location, 3857), cell_size_m)
+    centroid = func.ST_Centroid(func.ST_Collect(ImageSubmission.location))
+    newest_first = ImageSubmission.uploaded_at.desc()
+
+    now = datetime.datetime.utcnow()
+    statement = (
+        select(
+            func.count().label("count"),
+            func.ST_Y(centroid).label("latitude"),
+            func.ST_X(centroid).label("longitude"),
+            array_agg(aggregate_order_by(ImageSubmission.id, newest_first))[1].label("representative_id"),
+            array_agg(aggregate_order_by(
+                func.coalesce(ImageSubmission.thumbnail_url, ImageSubmission.image_url), newest_first
+            ))[1].label("representative_image_url"),
         )
-        .order_by(ImageSubmission.uploaded_at.desc()) # Optional: order by newest first
+        .where(ImageSubmission.expires_at > now)
+        .where(ImageSubmission.location.op("&&")(_envelope(bbox)))
+        .group_by(cell)
+        .order_by(func.count().desc())
+        .limit(limit)
     )
+    return (await db.exec(statement)).all()
 
-    results = db.exec(statement).all()
-    return results
+# Vector tile query: points of one XYZ tile encoded with ST_AsMVT, plus the earliest
+# expiry in the tile so the cached tile can be dropped when its first point expires.
+# Only the attributes the map needs are included. Parameters are cast explicitly:
+# asyncpg sends each named parameter once with a single inferred type.
+_TILE_SQL = text("""
+    WITH mvtgeom AS (
+        SELECT ST_AsMVTGeom(ST_Transform(s.location, 3857), ST_TileEnvelope(:z, :x, :y), CAST(:extent AS integer), CAST(:buffer AS integer), true) AS geom,
+               s.id,
+               s.thumbs_up_count,
+               s.thumbs_down_count,
+               coalesce(s.thumbnail_url, s.image_url) AS thumbnail_url,
+               s.expires_at
+        FROM imagesubmission s
+        WHERE s.expires_at > :now
+          AND s.location && ST_Transform(ST_TileEnvelope(:z, :x, :y, margin => (CAST(:buffer AS float8) / CAST(:extent AS float8))), 4326)
+    )
+    SELECT
+        (SELECT ST_AsMVT(t, 'submissions', CAST(:extent AS integer), 'geom')
+         FROM (SELECT geom, id, thumbs_up_count, thumbs_down_count, thumbnail_url FROM mvtgeom WHERE geom IS NOT NULL) AS t) AS tile,
+        (SELECT min(expires_at) FROM mvtgeom) AS first_expiry
+""")
 
-def get_submission_by_id(db: Session, *, submission_id: int) -> Optional[ImageSubmission]:
+async def get_submission_tile(db: AsyncSession, *, z: int, x: int, y: int) -> Tuple[bytes, Optional[datetime.datetime]]:
+    """
+    Build the Mapbox Vector Tile for tile (z, x, y) from non-expired submissions.
+    Returns the encoded tile and the earliest expires_at among its points (None if empty).
+    """
+    result = await db.execute(
+        _TILE_SQL,
+        {
+            "z": z,
+            "x": x,
+            "y": y,
+            "extent": settings.TILE_EXTENT,
+            "buffer": settings.TILE_BUFFER,
+            "now": datetime.datetime.utcnow(),
+        },
+    )
+    row = result.one()
+    return bytes(row.tile or b""), row.first_expiry
+
+async def get_submission_by_id(db: AsyncSession, *, submission_id: int) -> Optional[ImageSubmission]:
     """
     Get an image submission by its ID.
     """
     statement = select(ImageSubmission).where(ImageSubmission.id == submission_id)
-    submission = db.exec(statement).first()
+    submission = (await db.exec(statement)).first()
     return submission
 
-def update_submission(db: Session, *, db_submission: ImageSubmission, submission_in: ImageSubmissionUpdate) -> Optional[ImageSubmission]:
+async def update_submission(db: AsyncSession, *, db_submission: ImageSubmission, submission_in: ImageSubmissionUpdate) -> Optional[ImageSubmission]:
     """
     Update an image submission's description, only if within the 10-minute window.
     Returns the updated submission or None if the update is disallowed.
@@ -94,58 +330,236 @@ def update_submission(db: Session, *, db_submission: ImageSubmission, submission
         # Add other updatable fields here if needed in the future
 
     db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
+    await db.commit()
+    await db.refresh(db_submission)
+    invalidate_caches_for_point(*point_from_wkb(db_submission.location))
     return db_submission
 
-def delete_submission(db: Session, *, submission_id: int) -> Optional[ImageSubmission]:
+async def set_submission_derivatives(
+    db: AsyncSession,
+    *,
+    submission_id: int,
+    thumbnail_url: str,
+    popup_url: str,
+    width: int,
+    height: int,
+    blurhash: str,
+    perceptual_hash: Optional[int] = None,
+) -> Optional[ImageSubmission]:
     """
-    Delete an image submission by its ID.
-    Returns the deleted submission object or None if not found.
+    Store the derivative URLs and image metadata produced by the image pipeline.
+    Returns the updated submission or None if it was deleted in the meantime.
     """
-    db_submission = get_submission_by_id(db=db, submission_id=submission_id)
+    db_submission = await get_submission_by_id(db=db, submission_id=submission_id)
     if not db_submission:
         return None
 
-    # --- Placeholder for S3 Deletion Logic ---
-    # Before deleting from DB, delete the corresponding file from S3
-    # Example: await delete_from_s3(db_submission.image_url)
-    print(f"Placeholder: Would delete {db_submission.image_url} from S3 now.")
-    # --- End Placeholder ---
-
-    db.delete(db_submission)
-    db.commit()
-    # The object is expired after commit, so we return the object fetched before delete
+    db_submission.thumbnail_url = thumbnail_url
+    db_submission.popup_url = popup_url
+    db_submission.width = width
+    db_submission.height = height
+    db_submission.blurhash = blurhash
+    db_submission.perceptual_hash = perceptual_hash
+    db.add(db_submission)
+    await db.commit()
+    await db.refresh(db_submission)
+    invalidate_caches_for_point(*point_from_wkb(db_submission.location))
     return db_submission
 
-def add_thumbs_up(db: Session, *, submission_id: int) -> Optional[ImageSubmission]:
+async def attach_blob(
+    db: AsyncSession, *, submission_id: int, sha256: str, object_key: str, content_type: str, size: int
+) -> Tuple[Optional[ImageSubmission], str]:
     """
-    Increment the thumbs_up_count for a submission.
-    Returns the updated submission or None if not found.
+    Link a submission whose original was uploaded without a known hash (presigned
+    uploads) to the blob for its content. If that content was already stored, the
+    submission is pointed at the existing object.
+    Returns (updated submission or None if it was deleted, object key of the blob);
+    if the key differs from `object_key`, the caller removes the redundant upload.
     """
-    db_submission = get_submission_by_id(db=db, submission_id=submission_id)
+    db_submission = await get_submission_by_id(db=db, submission_id=submission_id)
     if not db_submission:
-        return None
+        return None, object_key
+    if db_submission.content_hash is not None:
+        return db_submission, object_key
 
-    # Simple increment - no duplicate check for now
-    db_submission.thumbs_up_count += 1
+    blob_key, _ = await crud_image_blob.acquire_blob(
+        db, sha256=sha256, object_key=object_key, content_type=content_type, size=size
+    )
+    db_submission.content_hash = sha256
+    db_submission.image_url = get_storage().url(blob_key)
     db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    return db_submission
+    await db.commit()
+    await db.refresh(db_submission)
+    invalidate_caches_for_point(*point_from_wkb(db_submission.location))
+    return db_submission, blob_key
+
+async def get_submission_with_derivatives(db: AsyncSession, *, content_hash: str) -> Optional[ImageSubmission]:
+    """
+    Get a submission of the same content whose derivatives are already generated,
+    so they can be reused instead of processing the image again.
+    """
+    statement = (
+        select(ImageSubmission)
+        .where(ImageSubmission.content_hash == content_hash)
+        .where(ImageSubmission.thumbnail_url.is_not(None))
+        .limit(1)
+    )
+    return (await db.exec(statement)).first()
+
+async def get_duplicate_submissions(
+    db: AsyncSession, *, db_submission: ImageSubmission, max_distance: int, radius_m: float, limit: int
+) -> List[ImageSubmission]:
+    """
+    Get non-expired submissions that duplicate the given one: byte-identical content
+    anywhere, or a perceptual hash within `max_distance` bits within `radius_m` meters.
+    The radius keeps the Hamming distance check to the few rows the GiST index returns.
+    """
+    now = datetime.datetime.utcnow()
+    conditions = []
+    if db_submission.content_hash is not None:
+        conditions.append(ImageSubmission.content_hash == db_submission.content_hash)
+    if db_submission.perceptual_hash is not None:
+        # bit_count(a # b) = number of differing bits (PostgreSQL 14+)
+        hamming = func.bit_count(cast(ImageSubmission.perceptual_hash.op("#")(db_submission.perceptual_hash), BIT(64)))
+        conditions.append(and_(
+            ST_DWithin(_geography(ImageSubmission.location), _geography(db_submission.location), radius_m),
+            ImageSubmission.perceptual_hash.is_not(None),
+            hamming <= max_distance,
+        ))
+    if not conditions:
+        return []
+
+    statement = (
+        select(ImageSubmission)
+        .where(ImageSubmission.id != db_submission.id)
+        .where(ImageSubmission.expires_at > now)
+        .where(or_(*conditions))
+        .order_by(ImageSubmission.uploaded_at.desc(), ImageSubmission.id.desc())
+        .limit(limit)
+    )
+    return (await db.exec(statement)).all()
+
+def owned_object_keys(submission: Any) -> List[str]:
+    """Storage keys of a submission that does not reference a shared blob (original and derivatives)."""
+    storage = get_storage()
+    keys = [storage.key_from_url(url) for url in (submission.image_url, submission.thumbnail_url, submission.popup_url)]
+    return [key for key in keys if key]
 
-def add_thumbs_down(db: Session, *, submission_id: int) -> Optional[ImageSubmission]:
+async def delete_submission(db: AsyncSession, *, submission_id: int) -> Optional[ImageSubmission]:
     """
-    Increment the thumbs_down_count for a submission.
-    Returns the updated submission or None if not found.
+    Delete an image submission by its ID.
+    Returns the deleted submission object or None if not found.
+    Objects the submission owns are deleted from storage first; if that fails,
+    StorageError is raised and the row is kept, so the delete can be retried.
     """
-    db_submission = get_submission_by_id(db=db, submission_id=submission_id)
+    db_submission = await get_submission_by_id(db=db, submission_id=submission_id)
     if not db_submission:
         return None
 
-    # Simple increment - no duplicate check for now
-    db_submission.thumbs_down_count += 1
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    return db_submission
\ No newline at end of file
+    if db_submission.content_hash is not None:
+        # The stored original is shared by content; the blob reaper removes it
+        # (and its derivatives) once no submission references it any more
+        await crud_image_blob.release_blob(db, sha256=db_submission.content_hash)
+    else:
+        # Legacy rows and uploads not yet attached to a blob own their objects
+        keys = owned_object_keys(db_submission)
+        failed = await get_storage().delete_objects_async(keys) if keys else []
+        if failed:
+            raise StorageError(f"Could not delete {len(failed)} of {len(keys)} objects of submission {submission_id}")
+
+    lon, lat = point_from_wkb(db_submission.location)
+    # Leave a tombstone so delta sync clients learn about the deletion
+    db.add(SubmissionTombstone(submission_id=db_submission.id, location=f'SRID=4326;POINT({lon} {lat})'))
+    # No foreign key from vote to the partitioned imagesubmission table, so no cascade
+    await db.exec(delete(Vote).where(Vote.submission_id == db_submission.id))
+    await db.delete(db_submission)
+    await db.commit()
+    invalidate_caches_for_point(lon, lat)
+    # The object is expired after commit, so we return the object fetched before delete
+    return db_submission
+
+async def get_expired_submissions(
+    db: AsyncSession,
+    *,
+    expired_before: datetime.datetime,
+    limit: int,
+    source: Any = None,
+    after: Optional[Tuple[datetime.datetime, int]] = None,
+) -> List[Any]:
+    """
+    Get up to `limit` submissions that expired before the given time, oldest first
+    (an index range scan on the expires_at index), from `source` (a partition's
+    table, see app.db.partitions.partition_table) or from all of imagesubmission.
+    `after` is the (expires_at, id) of the last row of the previous batch.
+    Returns rows with id, expires_at, image_url, thumbnail_url, popup_url and content_hash.
+    """
+    source = ImageSubmission.__table__ if source is None else source
+    statement = (
+        select(
+            source.c.id, source.c.expires_at, source.c.image_url, source.c.thumbnail_url,
+            source.c.popup_url, source.c.content_hash,
+        )
+        .where(source.c.expires_at < expired_before)
+        .order_by(source.c.expires_at, source.c.id)
+        .limit(limit)
+    )
+    if after is not None:
+        statement = statement.where(tuple_(source.c.expires_at, source.c.id) > tuple_(*after))
+    return (await db.exec(statement)).all()
+
+# Deletes the given expired submissions and leaves a tombstone for each (dated at its
+# expiry), so delta sync clients that have not seen the expiry yet still learn about it.
+# Their votes are deleted with them.
+_DELETE_EXPIRED_SQL = text("""
+    WITH deleted AS (
+        DELETE FROM imagesubmission
+        WHERE id = ANY(CAST(:ids AS integer[])) AND expires_at < CAST(:expired_before AS timestamp)
+        RETURNING id, location, expires_at, content_hash
+    ),
+    tombstones AS (
+        INSERT INTO submissiontombstone (submission_id, location, deleted_at)
+        SELECT id, location, expires_at FROM deleted
+        ON CONFLICT (submission_id) DO NOTHING
+    ),
+    votes AS (
+        DELETE FROM vote WHERE submission_id IN (SELECT id FROM deleted)
+    )
+    SELECT id, content_hash, ST_X(location) AS longitude, ST_Y(location) AS latitude FROM deleted
+""")
+
+async def delete_expired_submissions(
+    db: AsyncSession, *, submission_ids: List[int], expired_before: datetime.datetime
+) -> int:
+    """
+    Delete expired submissions by ID (rows that are not expired are left alone) and
+    release their blobs, in one transaction. Returns the number of rows deleted.
+    """
+    rows = (await db.execute(_DELETE_EXPIRED_SQL, {"ids": submission_ids, "expired_before": expired_before})).all()
+    references: dict = {}
+    for row in rows:
+        if row.content_hash is not None:
+            references[row.content_hash] = references.get(row.content_hash, 0) + 1
+    await crud_image_blob.release_blobs(db, references=references)
+    await db.commit()
+    for row in rows:
+        invalidate_caches_for_point(row.longitude, row.latitude)
+    return len(rows)
+
+async def delete_old_tombstones(db: AsyncSession, *, deleted_before: datetime.datetime, limit: int) -> int:
+    """
+    Delete up to `limit` tombstones older than `deleted_before` (delta sync resets
+    clients whose token is that old anyway). Returns the number deleted.
+    """
+    candidates = (
+        select(SubmissionTombstone.submission_id)
+        .where(SubmissionTombstone.deleted_at < deleted_before)
+        .limit(limit)
+    )
+    statement = (
+        delete(SubmissionTombstone)
+        .where(SubmissionTombstone.submission_id.in_(candidates.scalar_subquery()))
+        .returning(SubmissionTombstone.submission_id)
+    )
+    deleted = len((await db.exec(statement)).all())
+    await db.commit()
+    return deleted
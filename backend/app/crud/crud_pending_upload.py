@@ -0,0 +1,52 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+import datetime
+
+from app.models.pending_upload import PendingUpload
+
+async def create_pending_upload(db: AsyncSession, *, object_key: str, user_id: int, content_type: str) -> PendingUpload:
+    """
+    Record an object key handed out with a presigned upload URL.
+    """
+    pending = PendingUpload(object_key=object_key, user_id=user_id, content_type=content_type)
+    db.add(pending)
+    await db.commit()
+    await db.refresh(pending)
+    return pending
+
+async def get_pending_upload(db: AsyncSession, *, object_key: str) -> Optional[PendingUpload]:
+    """
+    Get a pending upload by its object key.
+    """
+    statement = select(PendingUpload).where(PendingUpload.object_key == object_key)
+    return (await db.exec(statement)).first()
+
+async def consume_pending_upload(db: AsyncSession, *, pending: PendingUpload) -> None:
+    """
+    Mark a pending upload as finalized by deleting its row.
+    Not committed here: the deletion is committed together with the new
+    submission, so the reaper can never remove an object that is in use.
+    """
+    await db.delete(pending)
+
+async def get_stale_pending_uploads(db: AsyncSession, *, created_before: datetime.datetime, limit: int) -> List[PendingUpload]:
+    """
+    Get pending uploads created before the given time (never finalized).
+    """
+    statement = (
+        select(PendingUpload)
+        .where(PendingUpload.created_at < created_before)
+        .order_by(PendingUpload.created_at)
+        .limit(limit)
+    )
+    return (await db.exec(statement)).all()
+
+async def delete_pending_uploads(db: AsyncSession, *, object_keys: List[str]) -> None:
+    """
+    Delete pending upload rows by object key.
+    """
+    statement = select(PendingUpload).where(PendingUpload.object_key.in_(object_keys))
+    for pending in (await db.exec(statement)).all():
+        await db.delete(pending)
+    await db.commit()
@@ -1,24 +1,28 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
 
+from app.core.cache import invalidate_principal
 from app.models.user import User, UserCreate, UserUpdate
 
-def get_user_by_email(db: Session, *, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, *, email: str) -> Optional[User]:
     """
     Retrieves a user from the database by their email address.
     """
     statement = select(User).where(User.email == email)
-    user = db.exec(statement).first()
+    user = (await db.exec(statement)).first()
     return user
 
-def create_user(db: Session, *, user_in: UserCreate) -> User:
+async def create_user(db: AsyncSession, *, user_in: UserCreate) -> User:
     """
     Creates a new user in the database.
     Hashes the password before storing.
     """
-    from app.core.security import get_password_hash # Import here to avoid circular dependency issues
+    from app.core.security import hash_password # Import here to avoid circular dependency issues
 
-    hashed_password = get_password_hash(user_in.password)
+    # bcrypt is CPU-bound; hashed in the password hashing pool (may raise PasswordHasherBusy)
+    hashed_password = await hash_password(user_in.password)
     # Create a User instance from UserCreate, excluding the plain password
     # and adding the hashed password.
     # Note: home_location handling might need adjustment if input isn't directly compatible
@@ -26,11 +30,11 @@ def create_user(db: Session, *, user_in: UserCreate) -> User:
     db_user = User(**user_data, hashed_password=hashed_password)
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def update_user(db: Session, *, db_user: User, user_in: UserUpdate) -> User:
+async def update_user(db: AsyncSession, *, db_user: User, user_in: UserUpdate) -> User:
     """
     Update a user's details.
     """
@@ -45,46 +49,53 @@ def update_user(db: Session, *, db_user: User, user_in: UserUpdate) -> User:
         setattr(db_user, field, value)
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    invalidate_principal(db_user.email) # Cached by the auth dependency
+    await db.refresh(db_user)
     return db_user
 
-def get_user_by_google_id(db: Session, *, google_id: str) -> Optional[User]:
+async def update_password_hash(db: AsyncSession, *, user: User, hashed_password: str) -> User:
     """
-    Retrieves a user from the database by their Google ID.
+    Replaces a user's password hash, e.g. with a rehash made with the current
+    cost parameters after a successful login.
     """
-    statement = select(User).where(User.google_id == google_id)
-    user = db.exec(statement).first()
-    return user
-
-def update_user_google_id(db: Session, *, user: User, google_id: str, avatar_url: Optional[str] = None) -> User:
-    """
-    Updates an existing user's Google ID and optionally their avatar URL.
-    Used for linking an existing email account to Google login.
-    """
-    user.google_id = google_id
-    if avatar_url and not user.avatar_url: # Only update avatar if not already set
-        user.avatar_url = avatar_url
+    user.hashed_password = hashed_password
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_principal(user.email)
     return user
 
-def create_user_with_google(db: Session, *, email: str, google_id: str, avatar_url: Optional[str] = None) -> User:
+# Google login in one statement: the user linked to the Google account if there is one,
+# otherwise the user with that email (linked now, avatar filled in if missing), otherwise
+# a new user. ON CONFLICT covers concurrent first logins with the same email.
+_UPSERT_GOOGLE_USER_SQL = text("""
+    WITH by_google AS (
+        SELECT * FROM "user" WHERE google_id = :google_id
+    ), upserted AS (
+        INSERT INTO "user" (email, google_id, avatar_url, default_radius_km)
+        SELECT :email, :google_id, :avatar_url, :default_radius_km
+        WHERE NOT EXISTS (SELECT 1 FROM by_google)
+        ON CONFLICT (email) DO UPDATE SET
+            google_id = EXCLUDED.google_id,
+            avatar_url = COALESCE("user".avatar_url, EXCLUDED.avatar_url)
+        RETURNING *
+    )
+    SELECT * FROM by_google UNION ALL SELECT * FROM upserted
+""")
+
+async def upsert_google_user(db: AsyncSession, *, email: str, google_id: str, avatar_url: Optional[str] = None) -> User:
     """
-    Creates a new user using details from Google OAuth.
-    Assumes hashed_password can be null in the User model.
+    Returns the user for a Google login, linking an existing account with the same
+    email or creating one (without password) as needed, in a single round-trip.
+    The email must be verified by Google, since it links to an existing account.
     """
-    # Create a User instance directly
-    # Note: Requires User model's hashed_password field to be nullable
-    db_user = User(
+    statement = select(User).from_statement(_UPSERT_GOOGLE_USER_SQL.bindparams(
         email=email,
         google_id=google_id,
         avatar_url=avatar_url,
-        hashed_password=None # Set password to None initially
-        # Set defaults for home_location, default_radius_km if needed, or rely on model defaults
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
\ No newline at end of file
+        default_radius_km=User.model_fields["default_radius_km"].default,
+    ))
+    user = (await db.execute(statement)).scalars().one()
+    await db.commit()
+    invalidate_principal(user.email) # The link or avatar may have changed
+    return user
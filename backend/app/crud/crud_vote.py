@@ -0,0 +1,163 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.sql.expression import and_
+from typing import Dict, List, Optional, Tuple
+import datetime
+
+from app.core.cache import invalidate_caches_for_point
+from app.models.image_submission import ImageSubmission
+from app.models.vote import Vote, VoteCounts, VoteValue
+
+# Each statement below records the vote change as (old_value, new_value) in a `changed`
+# CTE that is empty when nothing changed. _COUNTS_SQL then applies it to the counters
+# of the submission in the same statement, so concurrent votes never lose updates.
+
+# Set a +1/-1 vote (only on submissions that exist and have not expired; the expiry
+# reaper relies on expired rows getting no new votes). The conflict WHERE sees the latest
+# committed row, so a row it updates held the opposite value (votes are only +1 or -1);
+# xmax = 0 means inserted.
+_SET_VOTE_CTE = """
+    changed AS (
+        INSERT INTO vote (user_id, submission_id, value, created_at, updated_at)
+        SELECT CAST(:user_id AS integer), CAST(:submission_id AS integer), CAST(:value AS integer),
+               CAST(:now AS timestamp), CAST(:now AS timestamp)
+        WHERE EXISTS (
+            SELECT 1 FROM imagesubmission
+            WHERE id = CAST(:submission_id AS integer) AND expires_at > CAST(:now AS timestamp)
+        )
+        ON CONFLICT (user_id, submission_id) DO UPDATE
+            SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at
+            WHERE vote.value <> EXCLUDED.value
+        RETURNING CASE WHEN xmax = 0 THEN 0 ELSE -vote.value END AS old_value, vote.value AS new_value
+    )
+"""
+
+# Remove a vote
+_CLEAR_VOTE_CTE = """
+    changed AS (
+        DELETE FROM vote
+        WHERE user_id = :user_id AND submission_id = :submission_id
+        RETURNING value AS old_value, 0 AS new_value
+    )
+"""
+
+# Adjust the counters by the change (if any) and return them; with no change, the
+# current counts are read instead. Either way this is a single round trip.
+_COUNTS_SQL = """
+    updated AS (
+        UPDATE imagesubmission AS s
+        SET thumbs_up_count = s.thumbs_up_count + (c.new_value > 0)::int - (c.old_value > 0)::int,
+            thumbs_down_count = s.thumbs_down_count + (c.new_value < 0)::int - (c.old_value < 0)::int,
+            updated_at = CAST(:now AS timestamp)
+        FROM changed AS c
+        WHERE s.id = :submission_id
+        RETURNING s.id, s.thumbs_up_count, s.thumbs_down_count,
+                  ST_X(s.location) AS longitude, ST_Y(s.location) AS latitude, true AS changed
+    )
+    SELECT * FROM updated
+    UNION ALL
+    SELECT s.id, s.thumbs_up_count, s.thumbs_down_count,
+           ST_X(s.location) AS longitude, ST_Y(s.location) AS latitude, false AS changed
+    FROM imagesubmission AS s
+    WHERE s.id = :submission_id AND NOT EXISTS (SELECT 1 FROM changed)
+"""
+
+SET_VOTE_SQL = text("WITH" + _SET_VOTE_CTE + "," + _COUNTS_SQL)
+CLEAR_VOTE_SQL = text("WITH" + _CLEAR_VOTE_CTE + "," + _COUNTS_SQL)
+
+async def cast_vote(
+    db: AsyncSession, *, user_id: int, submission_id: int, value: VoteValue
+) -> Optional[VoteCounts]:
+    """
+    Set (+1/-1) or remove (0) a user's vote on a submission and adjust its counters,
+    in one statement. Voting the same way twice changes nothing.
+    Returns the new counts, or None if the submission does not exist.
+    """
+    params = {
+        "user_id": user_id,
+        "submission_id": submission_id,
+        "value": value,
+        "now": datetime.datetime.utcnow(),
+    }
+    row = (await db.execute(SET_VOTE_SQL if value else CLEAR_VOTE_SQL, params)).first()
+    await db.commit()
+    if row is None:
+        return None
+    if row.changed:
+        invalidate_caches_for_point(row.longitude, row.latitude)
+    return VoteCounts(
+        id=row.id, thumbs_up_count=row.thumbs_up_count, thumbs_down_count=row.thumbs_down_count, user_vote=value
+    )
+
+async def get_vote_states(
+    db: AsyncSession, *, user_id: int, submission_ids: List[int]
+) -> Dict[int, Tuple[int, int, int]]:
+    """
+    Current counts of the given submissions and the user's stored vote on each.
+    Returns {submission_id: (thumbs_up_count, thumbs_down_count, vote)} for the
+    submissions that exist (vote is 0 when the user has not voted).
+    """
+    statement = (
+        select(ImageSubmission.id, ImageSubmission.thumbs_up_count, ImageSubmission.thumbs_down_count, Vote.value)
+        .outerjoin(Vote, and_(Vote.submission_id == ImageSubmission.id, Vote.user_id == user_id))
+        .where(ImageSubmission.id.in_(submission_ids))
+    )
+    rows = (await db.exec(statement)).all()
+    return {row[0]: (row[1], row[2], row[3] or 0) for row in rows}
+
+# Batch form of the statements above: (user_id, submission_id, value) triples with
+# unique (user_id, submission_id), value 0 removing the vote. Votes on submissions that
+# no longer exist or have expired are skipped, and the counters of each submission are adjusted once.
+APPLY_VOTES_SQL = text("""
+    WITH batch AS (
+        SELECT * FROM unnest(CAST(:user_ids AS integer[]), CAST(:submission_ids AS integer[]), CAST(:vote_values AS integer[]))
+            AS b(user_id, submission_id, value)
+    ),
+    set_votes AS (
+        INSERT INTO vote (user_id, submission_id, value, created_at, updated_at)
+        SELECT b.user_id, b.submission_id, b.value, CAST(:now AS timestamp), CAST(:now AS timestamp)
+        FROM batch AS b JOIN imagesubmission AS s ON s.id = b.submission_id
+        WHERE b.value <> 0 AND s.expires_at > CAST(:now AS timestamp)
+        ON CONFLICT (user_id, submission_id) DO UPDATE
+            SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at
+            WHERE vote.value <> EXCLUDED.value
+        RETURNING vote.submission_id, CASE WHEN xmax = 0 THEN 0 ELSE -vote.value END AS old_value, vote.value AS new_value
+    ),
+    cleared AS (
+        DELETE FROM vote AS v USING batch AS b
+        WHERE b.value = 0 AND v.user_id = b.user_id AND v.submission_id = b.submission_id
+        RETURNING v.submission_id, v.value AS old_value, 0 AS new_value
+    ),
+    deltas AS (
+        SELECT submission_id,
+               sum((new_value > 0)::int - (old_value > 0)::int) AS up,
+               sum((new_value < 0)::int - (old_value < 0)::int) AS down
+        FROM (SELECT * FROM set_votes UNION ALL SELECT * FROM cleared) AS changed
+        GROUP BY submission_id
+    )
+    UPDATE imagesubmission AS s
+    SET thumbs_up_count = s.thumbs_up_count + d.up,
+        thumbs_down_count = s.thumbs_down_count + d.down,
+        updated_at = CAST(:now AS timestamp)
+    FROM deltas AS d
+    WHERE s.id = d.submission_id
+    RETURNING ST_X(s.location) AS longitude, ST_Y(s.location) AS latitude
+""")
+
+async def apply_votes(db: AsyncSession, *, votes: List[Tuple[int, int, int]]) -> int:
+    """
+    Write a batch of votes and adjust the counters of every affected submission,
+    in one statement. Returns the number of submissions whose counts changed.
+    """
+    params = {
+        "user_ids": [user_id for user_id, _, _ in votes],
+        "submission_ids": [submission_id for _, submission_id, _ in votes],
+        "vote_values": [value for _, _, value in votes],
+        "now": datetime.datetime.utcnow(),
+    }
+    rows = (await db.execute(APPLY_VOTES_SQL, params)).all()
+    await db.commit()
+    for row in rows:
+        invalidate_caches_for_point(row.longitude, row.latitude)
+    return len(rows)
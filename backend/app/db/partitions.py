@@ -0,0 +1,142 @@
+import datetime
+from typing import Any, List, Optional
+
+from sqlalchemy import column, table, text
+from sqlalchemy.exc import DBAPIError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.image_submission import ImageSubmission
+
+# imagesubmission is range-partitioned by day of expires_at (migration 5f0a9b3e7d21):
+# imagesubmission_pYYYYMMDD holds the rows expiring on that day (UTC), and rows outside
+# every daily partition go to imagesubmission_default. Queries that filter on
+# expires_at > now only scan the partitions of the next SUBMISSION_LIFETIME_DAYS days,
+# and a day of expired rows is removed by dropping its partition instead of DELETEs.
+
+PARENT = "imagesubmission"
+DEFAULT_PARTITION = "imagesubmission_default"
+_PREFIX = "imagesubmission_p"
+
+def partition_name(day: datetime.date) -> str:
+    return f"{_PREFIX}{day:%Y%m%d}"
+
+def partition_day(name: str) -> Optional[datetime.date]:
+    """Day of a daily partition, or None for other tables (such as the default partition)."""
+    if not name.startswith(_PREFIX):
+        return None
+    try:
+        return datetime.datetime.strptime(name[len(_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+def partition_table(name: str) -> Any:
+    """A table construct for one partition, with the columns of ImageSubmission."""
+    return table(name, *(column(c.name, c.type) for c in ImageSubmission.__table__.columns))
+
+async def list_partition_days(db: AsyncSession) -> List[datetime.date]:
+    """Days that have a daily partition, oldest first."""
+    rows = await db.execute(text("""
+        SELECT c.relname FROM pg_inherits AS i JOIN pg_class AS c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+    """), {"parent": PARENT})
+    return sorted(day for (name,) in rows.all() if (day := partition_day(name)) is not None)
+
+async def ensure_partitions(db: AsyncSession, *, first_day: datetime.date, days: int) -> int:
+    """
+    Creates the missing daily partitions from first_day on, each in its own
+    transaction (indexes come from the parent). Returns the number created.
+    """
+    existing = set(await list_partition_days(db))
+    created = 0
+    for offset in range(days):
+        day = first_day + datetime.timedelta(days=offset)
+        if day in existing:
+            continue
+        try:
+            await db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {PARENT} "
+                f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + datetime.timedelta(days=1)).isoformat()}')"
+            ))
+            await db.commit()
+            created += 1
+        except DBAPIError as e:
+            # E.g. rows for that day already sit in the default partition (created too late)
+            await db.rollback()
+            print(f"Could not create partition {partition_name(day)}: {e}") # Log the error
+    return created
+
+async def get_partition_objects(db: AsyncSession, *, day: datetime.date, after_id: int, limit: int) -> List[Any]:
+    """
+    Rows of a daily partition that own their stored objects (no shared blob), by id
+    after `after_id`. Returns rows with id, image_url, thumbnail_url and popup_url.
+    """
+    rows = await db.execute(text(f"""
+        SELECT id, image_url, thumbnail_url, popup_url FROM {partition_name(day)}
+        WHERE content_hash IS NULL AND id > :after_id
+        ORDER BY id LIMIT :limit
+    """), {"after_id": after_id, "limit": limit})
+    return rows.all()
+
+# Releases the blob references of a partition's rows by deleting those rows (with
+# tombstones and votes), so a rerun after a crash cannot release them twice
+_RELEASE_BLOB_ROWS_SQL = """
+    WITH deleted AS (
+        DELETE FROM {name} WHERE content_hash IS NOT NULL
+        RETURNING id, location, expires_at, content_hash
+    ),
+    tombstones AS (
+        INSERT INTO submissiontombstone (submission_id, location, deleted_at)
+        SELECT id, location, expires_at FROM deleted
+        ON CONFLICT (submission_id) DO NOTHING
+    ),
+    votes AS (
+        DELETE FROM vote WHERE submission_id IN (SELECT id FROM deleted)
+    ),
+    released AS (
+        UPDATE imageblob AS b
+        SET ref_count = b.ref_count - r.n, updated_at = CAST(:now AS timestamp)
+        FROM (SELECT content_hash, count(*) AS n FROM deleted GROUP BY content_hash) AS r
+        WHERE b.sha256 = r.content_hash
+    )
+    SELECT count(*) FROM deleted
+"""
+
+# Longest wait for the lock on imagesubmission when detaching; a partition that
+# cannot be detached in time is retried next run instead of queueing every query behind it
+DETACH_LOCK_TIMEOUT = "5s"
+
+async def drop_partition(db: AsyncSession, *, day: datetime.date) -> int:
+    """
+    Drops a daily partition whose rows have all expired. Objects owned by the rows
+    must be deleted from storage before. The bookkeeping runs while the partition is
+    still attached, with row locks only: rows referencing a blob are deleted (which
+    releases the blob), and the other rows get tombstones (dated at expiry, for delta
+    sync) and lose their votes. Every step can be rerun, and apply_votes skips expired
+    submissions, so no vote can reach these rows afterwards. Then the partition is
+    detached and dropped in a short transaction of its own; detaching locks the parent
+    table, but only for the catalog change. Returns the number of rows removed.
+    """
+    name = partition_name(day)
+    now = datetime.datetime.utcnow()
+    released = (await db.execute(text(_RELEASE_BLOB_ROWS_SQL.format(name=name)), {"now": now})).scalar_one()
+    await db.commit()
+    await db.execute(text(f"""
+        INSERT INTO submissiontombstone (submission_id, location, deleted_at)
+        SELECT id, location, expires_at FROM {name}
+        ON CONFLICT (submission_id) DO NOTHING
+    """))
+    await db.commit()
+    await db.execute(text(f"DELETE FROM vote WHERE submission_id IN (SELECT id FROM {name})"))
+    rows = (await db.execute(text(f"SELECT count(*) FROM {name}"))).scalar_one()
+    await db.commit()
+    # DETACH ... CONCURRENTLY is not allowed while the parent has a default partition
+    try:
+        await db.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+        await db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        await db.execute(text(f"DROP TABLE {name}"))
+        await db.commit()
+    except DBAPIError as e:
+        await db.rollback()
+        print(f"Could not detach partition {name}, retrying next run: {e}") # Log the error
+        return released
+    return released + rows
@@ -1,23 +1,266 @@
-from sqlmodel import create_engine, Session
+import asyncio
+import datetime
+import hashlib
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
 
-# Create the SQLAlchemy engine
-# connect_args is recommended for SQLite, but generally not needed for PostgreSQL
-# engine = create_engine(settings.DATABASE_URL, echo=True, connect_args={"check_same_thread": False}) # echo=True for debugging SQL
-engine = create_engine(settings.DATABASE_URL, echo=False)
+def async_database_url(url: str) -> str:
+    """Same database as `url`, through the asyncpg driver."""
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+def _create_engine(url: str, pool_size: int, max_overflow: int, pool_timeout: float, pool_recycle: int, pool_pre_ping: bool) -> AsyncEngine:
+    return create_async_engine(
+        async_database_url(url),
+        echo=False, # echo=True for debugging SQL
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+    )
+
+def _or_primary(value: Any, primary: Any) -> Any:
+    return primary if value is None else value
+
+# The SQLAlchemy engines
+# DATABASE_URL keeps the psycopg2 form (Alembic uses it as is); the API talks to the
+# same database through asyncpg, so DB I/O never blocks the event loop or ties up a
+# threadpool worker. The primary takes all writes; see get_read_db for replicas.
+# Engines are created at startup (init_engines, from the app's lifespan) or on first
+# use in scripts, never at import, and dispose_engines drops them again.
+_engine: Optional[AsyncEngine] = None
+
+def get_engine() -> AsyncEngine:
+    """Returns the engine of the primary database, creating it on first use."""
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(
+            settings.DATABASE_URL,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+    return _engine
+
+class Replica:
+    """A read replica engine and the result of its last health check."""
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True # Until the first check says otherwise
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[datetime.datetime] = None
+
+class ReadRouter:
+    """
+    Picks the engine for read-only requests: healthy replicas round-robin, or the
+    primary when there is none or the client wrote within DB_READ_YOUR_WRITES_SECONDS
+    (so it sees its own changes despite replication lag).
+    Write times are kept per worker process, keyed by the client's Authorization
+    header (or address); all access happens on the event loop, so no lock is needed.
+    """
+
+    # Expired write times are dropped once this many clients are tracked
+    MAX_TRACKED_CLIENTS = 10000
+
+    def __init__(self, replicas: List[Replica]):
+        self.replicas = replicas
+        self._counter = itertools.count()
+        self._recent_writes: Dict[str, float] = {} # client key -> monotonic deadline
+        self.primary_reads = 0
+        self.replica_reads = 0
+        self.sticky_reads = 0
+
+    def mark_write(self, client: str) -> None:
+        now = time.monotonic()
+        if len(self._recent_writes) >= self.MAX_TRACKED_CLIENTS:
+            self._recent_writes = {key: deadline for key, deadline in self._recent_writes.items() if deadline > now}
+        self._recent_writes[client] = now + settings.DB_READ_YOUR_WRITES_SECONDS
+
+    def pick(self, client: str) -> Optional[Replica]:
+        """Returns the replica to read from, or None for the primary."""
+        deadline = self._recent_writes.get(client)
+        if deadline is not None:
+            if deadline > time.monotonic():
+                self.sticky_reads += 1
+                self.primary_reads += 1
+                return None
+            del self._recent_writes[client]
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self.primary_reads += 1
+            return None
+        self.replica_reads += 1
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_unhealthy(self, replica: Replica, error: Exception) -> None:
+        """Fails over after a connection error; the next successful health check restores it."""
+        if replica.healthy:
+            print(f"Read replica {replica.name} marked unhealthy: {error}") # Log the error
+        replica.healthy = False
+        replica.last_error = str(error)
+
+    def stats(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+            "sticky_reads": self.sticky_reads,
+            "sticky_clients": len(self._recent_writes),
+        }
 
-def get_db():
+def _replica_urls() -> List[str]:
+    return [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+_read_router: Optional[ReadRouter] = None
+
+def get_read_router() -> ReadRouter:
+    """Returns the read router with an engine per replica, creating them on first use."""
+    global _read_router
+    if _read_router is None:
+        _read_router = ReadRouter([
+            Replica(
+                f"replica-{i}",
+                _create_engine(
+                    url,
+                    pool_size=_or_primary(settings.DB_REPLICA_POOL_SIZE, settings.DB_POOL_SIZE),
+                    max_overflow=_or_primary(settings.DB_REPLICA_MAX_OVERFLOW, settings.DB_MAX_OVERFLOW),
+                    pool_timeout=_or_primary(settings.DB_REPLICA_POOL_TIMEOUT_SECONDS, settings.DB_POOL_TIMEOUT_SECONDS),
+                    pool_recycle=_or_primary(settings.DB_REPLICA_POOL_RECYCLE_SECONDS, settings.DB_POOL_RECYCLE_SECONDS),
+                    pool_pre_ping=_or_primary(settings.DB_REPLICA_POOL_PRE_PING, settings.DB_POOL_PRE_PING),
+                ),
+            )
+            for i, url in enumerate(_replica_urls())
+        ])
+    return _read_router
+
+def init_engines() -> None:
+    """Creates the primary and replica engines (called at application startup)."""
+    get_engine()
+    get_read_router()
+
+# Requests with these methods do not write
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def _client_key(request: Request) -> str:
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return "auth:" + hashlib.sha256(authorization.encode()).hexdigest()
+    return "addr:" + (request.client.host if request.client else "")
+
+async def get_db(request: Request):
     """
-    FastAPI dependency that provides a database session.
+    FastAPI dependency that provides an async database session on the primary.
     Ensures the session is closed after the request.
+    Objects stay usable after commit (no implicit refresh, which would need I/O).
+    Writing requests pin the client's reads to the primary for a short while.
     """
-    with Session(engine) as session:
+    if request.method not in _READ_METHODS:
+        get_read_router().mark_write(_client_key(request))
+    async with AsyncSession(get_engine(), expire_on_commit=False) as session:
         yield session
 
+async def get_read_db(request: Request):
+    """
+    Like get_db, but for read-only endpoints: the session may be on a replica,
+    so data can lag the primary by up to DB_REPLICA_MAX_LAG_SECONDS.
+    """
+    read_router = get_read_router()
+    replica = read_router.pick(_client_key(request))
+    engine = replica.engine if replica else get_engine()
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        try:
+            yield session
+        except (OperationalError, InterfaceError, OSError) as e:
+            if replica is not None:
+                read_router.mark_unhealthy(replica, e)
+            raise
+
+# Replication lag in seconds (0 when fully replayed, or when the server is not a standby)
+_LAG_SQL = text("""
+    SELECT COALESCE(CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END, 0)
+""")
+
+async def _replica_lag(replica: Replica) -> float:
+    async with replica.engine.connect() as conn:
+        return await conn.scalar(_LAG_SQL)
+
+async def _check_replica(replica: Replica) -> None:
+    try:
+        lag = await asyncio.wait_for(_replica_lag(replica), timeout=settings.DB_REPLICA_HEALTH_TIMEOUT_SECONDS)
+    except Exception as e:
+        get_read_router().mark_unhealthy(replica, e)
+    else:
+        replica.lag_seconds = float(lag)
+        healthy = replica.lag_seconds <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        if healthy != replica.healthy:
+            print(f"Read replica {replica.name} {'healthy' if healthy else 'lagging'} (lag {replica.lag_seconds:.1f}s)")
+        replica.healthy = healthy
+        replica.last_error = None if healthy else "replication lag"
+    replica.checked_at = datetime.datetime.now(datetime.timezone.utc)
+
+async def check_replicas() -> None:
+    """Health check of all replicas (connectivity and replication lag), run periodically."""
+    await asyncio.gather(*(_check_replica(replica) for replica in get_read_router().replicas))
+
+async def dispose_engines() -> None:
+    """Closes all pooled connections and drops the engines (called at shutdown)."""
+    global _engine, _read_router
+    engines = [_engine] if _engine is not None else []
+    if _read_router is not None:
+        engines += [replica.engine for replica in _read_router.replicas]
+    _engine, _read_router = None, None
+    await asyncio.gather(*(engine.dispose() for engine in engines))
+
+def _pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    return {
+        "url": engine.url.render_as_string(hide_password=True),
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+def pool_stats() -> dict:
+    """Live connection pool usage of every engine in this worker, and replica health."""
+    read_router = get_read_router()
+    return {
+        "primary": _pool_stats(get_engine()),
+        "replicas": [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag_seconds,
+                "last_error": replica.last_error,
+                "checked_at": replica.checked_at,
+                **_pool_stats(replica.engine),
+            }
+            for replica in read_router.replicas
+        ],
+        "routing": read_router.stats(),
+    }
+
 # Optional: Function to create tables (useful for initial setup without Alembic or for testing)
-# def create_db_and_tables():
+# async def create_db_and_tables():
 #     from sqlmodel import SQLModel
 #     # Import models here if needed
 #     # from app.models.user import User
 #     # from app.models.image_submission import ImageSubmission
-#     SQLModel.metadata.create_all(engine)
\ No newline at end of file
+#     async with get_engine().begin() as conn:
+#         await conn.run_sync(SQLModel.metadata.create_all)
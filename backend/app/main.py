@@ -1,10 +1,54 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware # Import SessionMiddleware
 from fastapi.middleware.cors import CORSMiddleware # Import CORSMiddleware
-from app.api.v1.endpoints import auth, submissions, users # Import routers
-from app.core.config import settings # Import settings
 
-app = FastAPI(title="LocalPhoto API")
+# Serve with `uvicorn app.main:create_app --factory`. Importing this module reads no
+# settings and creates nothing: the app modules are imported by create_app(), and the
+# engines, clients and pools are created by the lifespan at startup.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates long-lived resources at startup and releases them at shutdown.
+    """
+    from app.core.config import settings
+    from app.core import images, oidc
+    from app.core.ratelimit import get_rate_limiter
+    from app.core.security import init_password_pool, shutdown_password_pool
+    from app.core.storage import get_storage
+    from app.core.background import PeriodicTask, start_periodic_tasks, stop_periodic_tasks
+    from app.core.reapers import ensure_submission_partitions, reap_expired_submissions, reap_orphaned_uploads, reap_unreferenced_blobs
+    from app.core.votes import vote_buffer, vote_buffering_enabled
+    from app.db.session import check_replicas, dispose_engines, init_engines
+
+    init_engines() # Connection pools of the primary and the replicas (connections open on first use)
+    get_storage().startup() # Shared S3 client and transfer pool, or the local storage directory
+    images.init_image_pool() # Process pool for thumbnails
+    init_password_pool() # Process pool for bcrypt
+    await check_replicas() # Replicas get reads only once they are known to be reachable
+    try:
+        await ensure_submission_partitions() # New submissions need a partition for their expiry day
+    except Exception as e:
+        print(f"Could not create submission partitions at startup: {e}") # The expiry reaper retries
+    tasks = [
+        PeriodicTask("upload-reaper", reap_orphaned_uploads, settings.UPLOAD_REAPER_INTERVAL_SECONDS),
+        PeriodicTask("blob-reaper", reap_unreferenced_blobs, settings.UPLOAD_REAPER_INTERVAL_SECONDS),
+        PeriodicTask("expiry-reaper", reap_expired_submissions, settings.EXPIRY_REAPER_INTERVAL_SECONDS),
+        PeriodicTask("replica-health", check_replicas, settings.DB_REPLICA_HEALTH_INTERVAL_SECONDS),
+        PeriodicTask("ratelimit-prune", get_rate_limiter().prune, settings.AUTH_RATE_LIMIT_WINDOW_SECONDS),
+    ]
+    if vote_buffering_enabled():
+        tasks.append(PeriodicTask("vote-flush", vote_buffer.flush, settings.VOTE_FLUSH_INTERVAL_SECONDS))
+    start_periodic_tasks(tasks)
+    yield
+    await stop_periodic_tasks()
+    await vote_buffer.flush() # Write votes still in the buffer
+    images.shutdown_image_pool()
+    shutdown_password_pool()
+    get_storage().shutdown()
+    await oidc.google.close()
+    await dispose_engines()
 
 # CORS Middleware Configuration
 # IMPORTANT: In production, replace "*" with the specific origins of your frontend
@@ -16,31 +60,50 @@ origins = [
     # "https://yourdomain.com"
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True, # Allow cookies/auth headers
-    allow_methods=["*"],    # Allow all methods (GET, POST, etc.)
-    allow_headers=["*"],    # Allow all headers
-)
-
-
-# Add Session Middleware (after CORS, before routers)
-# IMPORTANT: Change the secret_key in production!
-app.add_middleware(
-    SessionMiddleware, secret_key=settings.SESSION_SECRET_KEY
-)
-
-@app.get("/")
 async def read_root():
     """
     Root endpoint providing a welcome message.
     """
     return {"message": "Welcome to the LocalPhoto API!"}
 
-# Include the authentication router
-app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
-app.include_router(submissions.router, prefix="/api/v1/submissions", tags=["submissions"])
-app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
+def create_app() -> FastAPI:
+    """
+    Builds the API application: middleware, routers and the lifespan that creates and
+    releases the long-lived resources (engines, storage client, worker pools, OIDC
+    client). Nothing connects or spawns until startup, so tests and tools can build
+    their own instance cheaply. Heavy dependencies (boto3, passlib, Pillow, httpx)
+    are imported on first use; tests/test_startup.py checks this.
+    """
+    from app.api.v1.endpoints import auth, media, stats, submissions, users # Import routers
+    from app.core.config import settings # Import settings
+
+    app = FastAPI(title="LocalPhoto API", lifespan=lifespan)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True, # Allow cookies/auth headers
+        allow_methods=["*"],    # Allow all methods (GET, POST, etc.)
+        allow_headers=["*"],    # Allow all headers
+        expose_headers=["X-Next-Cursor", "X-Sync-Token"], # Let the frontend read the pagination cursor and sync token
+    )
+
+    # Add Session Middleware (after CORS, before routers)
+    # IMPORTANT: Change the secret_key in production!
+    app.add_middleware(
+        SessionMiddleware, secret_key=settings.SESSION_SECRET_KEY
+    )
+
+    app.add_api_route("/", read_root, methods=["GET"])
+
+    # Include the authentication router
+    app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
+    app.include_router(submissions.router, prefix="/api/v1/submissions", tags=["submissions"])
+    app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
+    app.include_router(stats.router, prefix="/api/v1/stats", tags=["stats"])
+    if settings.STORAGE_BACKEND == "local":
+        # Images are stored on this server and served from here
+        app.include_router(media.router, prefix="/media", tags=["media"])
 
-# Add other routers and configurations below as needed
\ No newline at end of file
+    # Add other routers and configurations below as needed
+    return app
@@ -0,0 +1,13 @@
+from sqlmodel import SQLModel, Field
+import datetime
+
+class ImageBlob(SQLModel, table=True):
+    # One stored original per distinct content (SHA-256 of the bytes), shared by every
+    # submission with that content. ref_count counts those submissions; blobs that drop
+    # to zero are removed (with their derivatives) by the blob reaper after a grace period.
+    sha256: str = Field(primary_key=True, max_length=64)
+    object_key: str
+    content_type: str
+    size: int
+    ref_count: int = Field(default=0)
+    updated_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, index=True)
@@ -1,34 +1,75 @@
 from sqlmodel import SQLModel, Field, Column, Relationship
-from typing import Optional, Any
+from sqlalchemy import BigInteger, Index, text
+from typing import Optional, Any, List, Literal
 from geoalchemy2 import Geometry
 from geoalchemy2.elements import WKBElement # Import WKBElement
-from geoalchemy2.shape import to_shape # Import to_shape for serialization
 from pydantic import computed_field # Import computed_field
 import datetime
 
+from app.core.geo import point_from_wkb, point_wkt
+
 # Forward reference for the relationship
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .user import User
 
+# Ordering options for nearby queries
+NearbySort = Literal["newest", "distance"]
+# Output formats of nearby queries: a JSON page, or a streamed GeoJSON FeatureCollection / NDJSON features
+NearbyFormat = Literal["json", "geojson", "ndjson"]
+
 class ImageSubmissionBase(SQLModel):
     description: Optional[str] = Field(default=None, max_length=256)
     # Location stored as a POINT geometry
     location: Any = Field(sa_column=Column(Geometry(geometry_type='POINT', srid=4326))) # Changed type hint from str to Any
     image_url: str # URL from S3 storage
+    # Derivatives and metadata, filled in by the image pipeline shortly after upload
+    thumbnail_url: Optional[str] = None # Small marker thumbnail
+    popup_url: Optional[str] = None # Popup-sized image
+    width: Optional[int] = None # Original size after EXIF orientation
+    height: Optional[int] = None
+    blurhash: Optional[str] = None # Tiny placeholder shown while images load
+    # SHA-256 of the original (key of its ImageBlob) and 64-bit dHash for near-duplicate checks
+    content_hash: Optional[str] = Field(default=None, max_length=64, index=True)
+    perceptual_hash: Optional[int] = Field(default=None, sa_type=BigInteger) # Not indexed: compared by Hamming distance
     uploaded_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
-    expires_at: datetime.datetime
+    # Bumped on every UPDATE (votes, edits) so delta sync can find changed rows
+    updated_at: datetime.datetime = Field(
+        default_factory=datetime.datetime.utcnow,
+        index=True,
+        sa_column_kwargs={"onupdate": datetime.datetime.utcnow},
+    )
+    expires_at: datetime.datetime = Field(index=True) # Expired rows are removed by the expiry reaper
     thumbs_up_count: int = Field(default=0)
     thumbs_down_count: int = Field(default=0)
     is_locked: bool = Field(default=False) # Locked after 10 mins
 
 class ImageSubmission(ImageSubmissionBase, table=True):
+    # Partitioned by day of expires_at, with primary key (id, expires_at) in the database;
+    # created by migration, not by metadata.create_all (see app/db/partitions.py).
+    # Functional GiST index on geography(location) so ST_DWithin in meters can use an index scan,
+    # and a composite index for keyset pagination on (uploaded_at, id)
+    __table_args__ = (
+        Index("idx_imagesubmission_location_geog", text("geography(location)"), postgresql_using="gist"),
+        Index("ix_imagesubmission_uploaded_at_id", "uploaded_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
 
     # Define the relationship back to the User model
     user: "User" = Relationship(back_populates="submissions") # Assuming User model will have a 'submissions' relationship field
 
+class SubmissionTombstone(SQLModel, table=True):
+    # Record of a deleted submission, so delta sync clients can remove it
+    __table_args__ = (
+        Index("idx_submissiontombstone_location_geog", text("geography(location)"), postgresql_using="gist"),
+    )
+
+    submission_id: int = Field(primary_key=True)
+    location: Any = Field(sa_column=Column(Geometry(geometry_type='POINT', srid=4326, spatial_index=False)))
+    deleted_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, index=True)
+
 # Pydantic models for API input/output
 class ImageSubmissionCreate(SQLModel):
     description: Optional[str] = Field(default=None, max_length=256)
@@ -46,9 +87,26 @@ class ImageSubmissionRead(ImageSubmissionBase):
     # Exclude the original 'location' field (WKBElement) from the response model
     # It's still available internally for the computed_field below.
     location: WKBElement | None = Field(default=None, exclude=True)
+    # Distance from the query center in meters (only set for nearby queries)
+    distance_m: Optional[float] = None
     # Optionally include user details if needed
     # user: Optional["UserRead"] = None
 
+    # Coordinates and WKT are read straight from the (E)WKB point, without Shapely
+    @computed_field(return_type=Optional[float])
+    @property
+    def latitude(self) -> Optional[float]:
+        if isinstance(self.location, WKBElement):
+            return point_from_wkb(self.location)[1]
+        return None
+
+    @computed_field(return_type=Optional[float])
+    @property
+    def longitude(self) -> Optional[float]:
+        if isinstance(self.location, WKBElement):
+            return point_from_wkb(self.location)[0]
+        return None
+
     # Use computed_field to provide the WKT string representation in the response.
     @computed_field(return_type=str) # Explicitly set return type for clarity
     @property
@@ -59,8 +117,7 @@ class ImageSubmissionRead(ImageSubmissionBase):
         # self.location refers to the excluded field populated by SQLModel/SQLAlchemy
         if isinstance(self.location, WKBElement):
             try:
-                shape = to_shape(self.location)
-                return shape.wkt # Return WKT string
+                return point_wkt(*point_from_wkb(self.location)) # Same "POINT (lon lat)" form as Shapely
             except Exception as e:
                 print(f"Error computing location field: {e}")
                 return "Error: Invalid location data" # Fallback string
@@ -70,6 +127,54 @@ class ImageSubmissionRead(ImageSubmissionBase):
         # Fallback if it's neither WKBElement nor string
         return "Error: Unknown location format"
 
+class ImageSubmissionListItem(SQLModel):
+    # Row of a /nearby page, with the same JSON fields as ImageSubmissionRead.
+    # Pages are built from plain SQL rows (coordinates via ST_X/ST_Y) and encoded
+    # with orjson, skipping model validation; this model only documents the schema.
+    id: int
+    user_id: int
+    description: Optional[str] = None
+    image_url: str
+    thumbnail_url: Optional[str] = None
+    popup_url: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    blurhash: Optional[str] = None
+    content_hash: Optional[str] = None
+    perceptual_hash: Optional[int] = None
+    uploaded_at: datetime.datetime
+    updated_at: datetime.datetime
+    expires_at: datetime.datetime
+    thumbs_up_count: int
+    thumbs_down_count: int
+    is_locked: bool
+    distance_m: Optional[float] = None
+    latitude: float
+    longitude: float
+    location_wkt: str
+
+class SubmissionCluster(SQLModel):
+    # Aggregated marker for all submissions in one grid cell of the viewport
+    count: int
+    latitude: float # Centroid of the submissions in the cell
+    longitude: float
+    representative_id: int # Newest submission in the cell
+    representative_image_url: str
+
+class SubmissionsInBounds(SQLModel):
+    # Either clusters (low zoom) or individual submissions (high zoom) are filled
+    zoom: int
+    clustered: bool
+    clusters: List[SubmissionCluster] = []
+    submissions: List[ImageSubmissionRead] = []
+
+class NearbyDelta(SQLModel):
+    # Changes within a nearby query area since a sync token
+    changed: List[ImageSubmissionRead] = [] # Created or updated (votes, edits) since the token
+    removed: List[int] = [] # IDs deleted or expired since the token
+    since: str # Token to send with the next delta request
+    reset: bool = False # True if the token is too old: discard local state and reload fully
+
 class ImageSubmissionUpdate(SQLModel):
     # Only description can be updated within the time limit
     description: Optional[str] = Field(default=None, max_length=256)
@@ -0,0 +1,28 @@
+from sqlmodel import SQLModel, Field
+from typing import Dict, Optional
+import datetime
+
+class PendingUpload(SQLModel, table=True):
+    # Object key handed out with a presigned upload URL, not yet finalized into a submission.
+    # Rows left behind after the URL expired are removed (with their objects) by the upload reaper.
+    object_key: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    content_type: str
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, index=True)
+
+# Pydantic models for API input/output
+class UploadUrlRequest(SQLModel):
+    content_type: str # MIME type of the image the client is about to upload
+
+class UploadUrlRead(SQLModel):
+    object_key: str
+    url: str # Presigned POST target
+    fields: Dict[str, str] # Form fields to send along with the file (file must be the last field)
+    expires_in: int # Seconds until the presigned POST expires
+    max_bytes: int # Largest accepted upload
+
+class SubmissionFinalize(SQLModel):
+    object_key: str
+    description: Optional[str] = Field(default=None, max_length=256)
+    latitude: float
+    longitude: float
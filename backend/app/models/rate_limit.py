@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field
+import datetime
+
+class AuthRateLimit(SQLModel, table=True):
+    # Token bucket of the shared auth rate limiter (AUTH_RATE_LIMIT_BACKEND=postgres), keyed by
+    # a hash of the client IP or email. UNLOGGED: losing the buckets on a crash only resets limits.
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: str = Field(primary_key=True, max_length=64)
+    tokens: float
+    allowed: bool # Whether the last attempt got a token
+    updated_at: datetime.datetime = Field(index=True) # Idle buckets are full again and get pruned
@@ -1,9 +1,10 @@
 from sqlmodel import SQLModel, Field, Column, Relationship
 from typing import Optional, List
 from geoalchemy2 import Geometry
-from geoalchemy2.shape import to_shape # Import to_shape for serialization
 from pydantic import field_serializer # Import field_serializer
 
+from app.core.geo import point_from_wkb, point_wkt
+
 # Forward reference for the relationship
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -43,10 +44,9 @@ class UserRead(UserBase):
     @field_serializer('home_location')
     def serialize_home_location(self, location):
         if location is not None:
-            # Convert the WKBElement to a Shapely geometry and then to WKT
+            # Convert the WKBElement to WKT (read from the WKB directly, no Shapely)
             try:
-                shape = to_shape(location)
-                return shape.wkt
+                return point_wkt(*point_from_wkb(location))
             except Exception as e:
                 # Handle potential errors during conversion (optional)
                 print(f"Error serializing home_location: {e}")
@@ -0,0 +1,35 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import CheckConstraint
+from typing import List, Literal
+import datetime
+
+class Vote(SQLModel, table=True):
+    # One vote per user and submission: +1 (thumbs up) or -1 (thumbs down).
+    # ImageSubmission.thumbs_up_count/thumbs_down_count are kept in step with these rows.
+    # submission_id has no foreign key (imagesubmission is partitioned, see app/db/partitions.py);
+    # votes are deleted together with their submission.
+    __table_args__ = (
+        CheckConstraint("value IN (1, -1)", name="ck_vote_value"),
+    )
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True, ondelete="CASCADE")
+    submission_id: int = Field(primary_key=True, index=True)
+    value: int
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    updated_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+
+# Pydantic models for API input/output
+VoteValue = Literal[1, 0, -1] # 0 = no vote
+
+class VoteCounts(SQLModel):
+    id: int # Submission id
+    thumbs_up_count: int
+    thumbs_down_count: int
+    user_vote: VoteValue # The caller's vote after the change
+
+class VoteItem(SQLModel):
+    submission_id: int
+    value: VoteValue
+
+class VoteBatch(SQLModel):
+    votes: List[VoteItem]
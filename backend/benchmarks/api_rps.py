@@ -0,0 +1,103 @@
+"""
+Load test: requests per second on /submissions/nearby and the vote endpoints.
+
+Runs a fixed number of concurrent clients against one or more running API servers
+for a fixed duration and reports throughput and p50/p99 latency per endpoint.
+Compare the sync (psycopg2, threadpool) and async (asyncpg) database layers by
+running the old and new code side by side, with the same worker count:
+
+    git worktree add /tmp/localphoto-sync <commit before the async DB layer>
+    (cd /tmp/localphoto-sync/backend && uvicorn app.main:app --workers 1 --port 8001)
+    uvicorn app.main:create_app --factory --workers 1 --port 8000
+    python -m benchmarks.api_rps --target sync=http://127.0.0.1:8001 --target async=http://127.0.0.1:8000
+
+Both servers must use the same database, which needs some submissions around
+--latitude/--longitude (votes go to the submissions /nearby returns). Nearby
+queries move on every request so the nearby cache does not answer them.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.upload_load import percentile
+
+
+async def nearby_worker(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list, args, offsets) -> None:
+    """Calls /nearby back to back with a moving position until stopped."""
+    while not stop.is_set():
+        params = {
+            "latitude": args.latitude + next(offsets),
+            "longitude": args.longitude,
+            "radius_km": args.radius_km,
+        }
+        started = time.perf_counter()
+        response = await client.get("/api/v1/submissions/nearby", params=params)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def vote_worker(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list, submission_ids: list) -> None:
+    """Votes on the given submissions round-robin until stopped."""
+    for submission_id in itertools.cycle(submission_ids):
+        if stop.is_set():
+            return
+        started = time.perf_counter()
+        response = await client.post(f"/api/v1/submissions/{submission_id}/thumbs_up")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run_target(name: str, base_url: str, args) -> None:
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        response = await client.get("/api/v1/submissions/nearby", params={
+            "latitude": args.latitude, "longitude": args.longitude, "radius_km": args.radius_km,
+        })
+        response.raise_for_status()
+        submission_ids = [item["id"] for item in response.json()]
+
+        for endpoint in ("nearby", "vote"):
+            if endpoint == "vote" and not submission_ids:
+                print(f"{name:<8} {endpoint:<8} skipped: no submissions near the given position")
+                continue
+            stop = asyncio.Event()
+            latencies: list = []
+            offsets = itertools.count(0, 0.0005) # ~55 m per request
+            if endpoint == "nearby":
+                workers = [nearby_worker(client, stop, latencies, args, offsets) for _ in range(args.concurrency)]
+            else:
+                workers = [vote_worker(client, stop, latencies, submission_ids) for _ in range(args.concurrency)]
+            tasks = [asyncio.create_task(worker) for worker in workers]
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+            print(f"{name:<8} {endpoint:<8} {len(latencies) / args.duration:>8.1f} "
+                  f"{statistics.median(latencies):>8.1f} {percentile(latencies, 99):>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", default=[],
+                        help="name=base_url of a server to test (repeatable), e.g. async=http://127.0.0.1:8000")
+    parser.add_argument("--token", default=os.getenv("LOADTEST_TOKEN"), help="Bearer token for votes")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients per endpoint")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per endpoint")
+    parser.add_argument("--latitude", type=float, default=37.7749)
+    parser.add_argument("--longitude", type=float, default=-122.4194)
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    args = parser.parse_args()
+    targets = [target.split("=", 1) for target in args.target] or [["server", "http://127.0.0.1:8000"]]
+
+    print(f"{'target':<8} {'endpoint':<8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, base_url in targets:
+        asyncio.run(run_target(name, base_url, args))
+
+
+if __name__ == "__main__":
+    main()
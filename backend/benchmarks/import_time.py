@@ -0,0 +1,88 @@
+"""
+Import-time budget: how long building the app takes in a fresh interpreter.
+
+Runs `python -X importtime -c "from app.main import create_app; create_app()"` a
+few times, takes the fastest run (the others are mostly disk cache noise) and
+prints the slowest modules by cumulative import time. Exits with status 1 when
+the imports take longer than --budget-ms or pull in a module that should only
+load on first use (boto3 and botocore, passlib, Pillow, httpx):
+
+    python -m benchmarks.import_time --budget-ms 1500
+
+tests/test_startup.py asserts the same budget. Heavy dependencies belong inside
+the function that needs them (see app.core.images or app.core.storage.get_storage).
+Runs offline; the settings only have to validate, no database or S3 is contacted.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Loaded on first use only: S3 storage, password hashing, image processing, OIDC
+DEFERRED_MODULES = ("boto3", "botocore", "passlib", "PIL", "httpx")
+
+BUILD_APP = "from app.main import create_app; create_app()"
+
+
+def import_times(code: str) -> Tuple[Dict[str, int], List[str]]:
+    """Cumulative import time in microseconds per module, and the order of the top-level imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"{code} failed:\n{result.stderr[-2000:]}")
+    cumulative: Dict[str, int] = {}
+    top_level: List[str] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        if not cumulative_us.strip().isdigit():
+            continue # The header line
+        cumulative[name.strip()] = int(cumulative_us)
+        if not name.startswith("  "):
+            top_level.append(name.strip())
+    return cumulative, top_level
+
+
+def total_ms(cumulative: Dict[str, int], top_level: List[str]) -> float:
+    return sum(cumulative[name] for name in top_level) / 1000
+
+
+def deferred_imports(cumulative: Dict[str, int]) -> List[str]:
+    """Modules of DEFERRED_MODULES that were imported."""
+    return sorted(name for name in cumulative if name.split(".")[0] in DEFERRED_MODULES and "." not in name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--code", default=BUILD_APP, help="Statement to time")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Fail above this import time")
+    parser.add_argument("--runs", type=int, default=3, help="Fastest of this many runs counts")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    args = parser.parse_args()
+
+    runs = [import_times(args.code) for _ in range(args.runs)]
+    cumulative, top_level = min(runs, key=lambda run: total_ms(*run))
+    total = total_ms(cumulative, top_level)
+
+    print(f"{'module':<50} {'cumulative ms':>14}")
+    for name, micros in sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<50} {micros / 1000:>14.1f}")
+    print(f"\n{args.code}: {total:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    deferred = deferred_imports(cumulative)
+    if deferred:
+        print(f"FAIL: imported at startup, should load on first use: {', '.join(deferred)}")
+        failed = True
+    if total > args.budget_ms:
+        print("FAIL: over the import-time budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Load test: /submissions/nearby latency during a burst of logins.
+
+Measures /nearby latency (p50/p99) against a running API server twice: once on its
+own and once while several clients log in back to back. With bcrypt in the
+password hashing pool, p99 of /nearby should stay flat; logins beyond the pool's
+queue depth are answered 503 instead of piling up.
+
+    uvicorn app.main:create_app --factory --workers 1 --port 8000
+    python -m benchmarks.login_load --logins 32 --duration 20
+
+Compare with the threadpool-based hashing by running the commit before the
+password hashing pool (e.g. from a `git worktree`) on another port with --base-url.
+A scratch user (bench-login-*@example.invalid) is registered for the logins and
+left in the database.
+"""
+import argparse
+import asyncio
+import statistics
+import uuid
+
+import httpx
+
+from benchmarks.upload_load import percentile, probe_nearby
+
+
+async def login_loop(client: httpx.AsyncClient, stop: asyncio.Event, counts: dict, credentials: dict) -> None:
+    """Logs in back to back until stopped, counting successes and 503s."""
+    while not stop.is_set():
+        response = await client.post("/api/v1/auth/login", data=credentials)
+        if response.status_code == 503:
+            counts["busy"] += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+            continue
+        response.raise_for_status()
+        counts["ok"] += 1
+
+
+async def run_phase(args, logins: int, credentials: dict) -> tuple:
+    """Runs one measurement phase, returning (nearby latencies, login counts)."""
+    stop = asyncio.Event()
+    latencies: list = []
+    counts = {"ok": 0, "busy": 0}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120) as client:
+        tasks = [asyncio.create_task(probe_nearby(client, stop, latencies, args))]
+        tasks += [asyncio.create_task(login_loop(client, stop, counts, credentials)) for _ in range(logins)]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return latencies, counts
+
+
+async def register(args) -> dict:
+    credentials = {"username": f"bench-login-{uuid.uuid4().hex[:12]}@example.invalid", "password": uuid.uuid4().hex}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120) as client:
+        response = await client.post("/api/v1/auth/register", json={
+            "email": credentials["username"], "password": credentials["password"],
+        })
+        response.raise_for_status()
+    return credentials
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--logins", type=int, default=32, help="Concurrent login clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per phase")
+    parser.add_argument("--latitude", type=float, default=37.7749)
+    parser.add_argument("--longitude", type=float, default=-122.4194)
+    args = parser.parse_args()
+
+    credentials = asyncio.run(register(args))
+
+    print(f"{'phase':<16} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'logins':>8} {'503s':>8}")
+    for name, logins in (("nearby only", 0), (f"{args.logins} logins", args.logins)):
+        latencies, counts = asyncio.run(run_phase(args, logins, credentials))
+        print(f"{name:<16} {len(latencies):>9} {statistics.median(latencies):>8.1f} "
+              f"{percentile(latencies, 99):>8.1f} {counts['ok']:>8} {counts['busy']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark for the nearby submissions query.
+
+Compares the legacy predicate (ST_DistanceSphere(location, point) <= radius) with the
+index-driven one used by crud_image_submission.get_nearby_submissions
+(ST_DWithin(geography(location), geography(point), radius)) on synthetic tables of
+increasing size, and prints the plan's scan node plus the median execution time.
+
+Usage (from the backend directory, needs a PostGIS database in DATABASE_URL):
+    python -m benchmarks.nearby_query
+    python -m benchmarks.nearby_query --sizes 10000,100000 --radius-km 5 --runs 7
+
+The script works on its own scratch table (bench_imagesubmission) and drops it at the end.
+"""
+import argparse
+import json
+import statistics
+
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+
+TABLE = "bench_imagesubmission"
+
+# Center of the synthetic data set (San Francisco, the map's default view)
+CENTER_LAT = 37.7749
+CENTER_LON = -122.4194
+# Points are spread uniformly over +/- SPREAD_DEG around the center
+SPREAD_DEG = 2.0
+
+QUERIES = {
+    "distance_sphere (legacy)": f"""
+        SELECT id, image_url FROM {TABLE}
+        WHERE expires_at > now()
+          AND ST_DistanceSphere(location, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)) <= :radius
+        ORDER BY uploaded_at DESC
+    """,
+    "dwithin geography": f"""
+        SELECT id, image_url,
+               ST_Distance(geography(location), geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326))) AS distance_m
+        FROM {TABLE}
+        WHERE expires_at > now()
+          AND ST_DWithin(geography(location), geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)), :radius)
+        ORDER BY uploaded_at DESC
+    """,
+}
+
+
+def setup_table(conn, rows: int) -> None:
+    """Create and fill the scratch table with `rows` random points, then build the indexes."""
+    conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    conn.execute(text(f"""
+        CREATE TABLE {TABLE} (
+            id bigserial PRIMARY KEY,
+            location geometry(POINT, 4326),
+            image_url varchar NOT NULL,
+            uploaded_at timestamp NOT NULL,
+            expires_at timestamp NOT NULL
+        )
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {TABLE} (location, image_url, uploaded_at, expires_at)
+        SELECT ST_SetSRID(ST_MakePoint(:lon + (random() * 2 - 1) * :spread,
+                                       :lat + (random() * 2 - 1) * :spread), 4326),
+               'https://example.invalid/' || g,
+               now() - random() * interval '3 days',
+               now() + random() * interval '3 days'
+        FROM generate_series(1, :rows) AS g
+    """), {"lon": CENTER_LON, "lat": CENTER_LAT, "spread": SPREAD_DEG, "rows": rows})
+    conn.execute(text(f"CREATE INDEX ON {TABLE} USING gist (location)"))
+    conn.execute(text(f"CREATE INDEX ON {TABLE} USING gist (geography(location))"))
+    conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+def scan_nodes(plan: dict) -> list:
+    """Collect the scan node types (and index names) from an EXPLAIN JSON plan."""
+    nodes = []
+    if "Scan" in plan["Node Type"]:
+        label = plan["Node Type"]
+        if plan.get("Index Name"):
+            label += f" ({plan['Index Name']})"
+        nodes.append(label)
+    for child in plan.get("Plans", []):
+        nodes.extend(scan_nodes(child))
+    return nodes
+
+
+def run_query(conn, sql: str, params: dict, runs: int):
+    """Run EXPLAIN ANALYZE `runs` times, returning (scan nodes, median ms, row count)."""
+    timings = []
+    plan = None
+    for _ in range(runs):
+        raw = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), params).scalar()
+        explained = raw if isinstance(raw, list) else json.loads(raw)
+        plan = explained[0]
+        timings.append(plan["Execution Time"])
+    return scan_nodes(plan["Plan"]), statistics.median(timings), plan["Plan"]["Actual Rows"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000,10000000", help="Comma-separated table sizes")
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--runs", type=int, default=5, help="EXPLAIN ANALYZE runs per query (median is reported)")
+    args = parser.parse_args()
+
+    params = {"lon": CENTER_LON, "lat": CENTER_LAT, "radius": args.radius_km * 1000}
+    engine = create_engine(settings.DATABASE_URL, echo=False)
+
+    print(f"{'rows':>10}  {'query':<26} {'median ms':>10} {'matched':>8}  plan")
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            with engine.begin() as conn:
+                setup_table(conn, size)
+            with engine.connect() as conn:
+                for name, sql in QUERIES.items():
+                    nodes, median_ms, matched = run_query(conn, sql, params, args.runs)
+                    print(f"{size:>10}  {name:<26} {median_ms:>10.2f} {matched:>8}  {', '.join(nodes)}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark: Google login callback latency against a local fake OIDC provider.
+
+Runs the API app and a fake OpenID Connect provider (discovery document, JWKS,
+authorize and token endpoints, RS256 id_tokens) in-process and logs in through
+/auth/google and /auth/google/callback many times, once with the OIDC client's
+discovery/JWKS cache dropped before every login and once with it warm. Reports
+p50/p99 of the callback in milliseconds and the requests made to the provider:
+
+    python -m benchmarks.oidc_login --logins 200 --provider-latency-ms 20
+
+--provider-latency-ms delays every provider response to stand in for the round
+trip to Google. --rotate-every rotates the signing key every N logins, which
+the warm cache has to pick up by refetching the JWKS.
+
+Uses the database in DATABASE_URL; the scratch users (bench-oidc-*@example.invalid)
+are deleted again.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Form, Request
+from fastapi.responses import RedirectResponse
+from jose import jwk, jwt
+from sqlmodel import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import oidc
+from app.core.config import settings
+from app.db.session import get_engine, dispose_engines
+from app.main import create_app
+from app.models.user import User
+
+from benchmarks.upload_load import percentile
+
+ISSUER = "https://fake-idp.test"
+
+
+class FakeProvider:
+    """A minimal OIDC provider; counts requests per endpoint."""
+
+    def __init__(self, client_id: str, latency: float):
+        self.client_id = client_id
+        self.latency = latency
+        self.codes: dict = {} # code -> (email, nonce)
+        self.requests = {"discovery": 0, "jwks": 0, "token": 0}
+        self.rotate()
+        self.app = self._build_app()
+
+    def rotate(self) -> None:
+        """Generates a new signing key; the JWKS only lists the current one."""
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.kid = uuid.uuid4().hex[:8]
+        self.private_pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+        public_pem = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        self.public_jwk = {**jwk.construct(public_pem, "RS256").to_dict(), "kid": self.kid, "use": "sig", "alg": "RS256"}
+
+    def _build_app(self) -> FastAPI:
+        fake = FastAPI()
+
+        @fake.get("/.well-known/openid-configuration")
+        async def discovery():
+            self.requests["discovery"] += 1
+            await asyncio.sleep(self.latency)
+            return {
+                "issuer": ISSUER,
+                "authorization_endpoint": f"{ISSUER}/authorize",
+                "token_endpoint": f"{ISSUER}/token",
+                "jwks_uri": f"{ISSUER}/jwks",
+                "id_token_signing_alg_values_supported": ["RS256"],
+            }
+
+        @fake.get("/jwks")
+        async def jwks():
+            self.requests["jwks"] += 1
+            await asyncio.sleep(self.latency)
+            return {"keys": [self.public_jwk]}
+
+        @fake.get("/authorize")
+        async def authorize(request: Request):
+            # Signs in whoever login_hint names, without a consent screen
+            params = request.query_params
+            code = uuid.uuid4().hex
+            self.codes[code] = (params["login_hint"], params["nonce"])
+            query = urlencode({"code": code, "state": params["state"]})
+            return RedirectResponse(f"{params['redirect_uri']}?{query}")
+
+        @fake.post("/token")
+        async def token(code: str = Form(...), client_id: str = Form(...)):
+            self.requests["token"] += 1
+            await asyncio.sleep(self.latency)
+            email, nonce = self.codes.pop(code)
+            access_token = uuid.uuid4().hex
+            now = int(time.time())
+            id_token = jwt.encode(
+                {
+                    "iss": ISSUER,
+                    "aud": client_id,
+                    "sub": f"fake-{email}",
+                    "email": email,
+                    "email_verified": True,
+                    "nonce": nonce,
+                    "iat": now,
+                    "exp": now + 3600,
+                },
+                self.private_pem,
+                algorithm="RS256",
+                headers={"kid": self.kid},
+                access_token=access_token, # Adds at_hash
+            )
+            return {"access_token": access_token, "id_token": id_token, "token_type": "Bearer", "expires_in": 3600}
+
+        return fake
+
+
+async def login(api: httpx.AsyncClient, provider: httpx.AsyncClient, email: str) -> float:
+    """One Google login; returns the callback latency in milliseconds."""
+    response = await api.get("/api/v1/auth/google")
+    authorize = urlsplit(response.headers["location"])
+    response = await provider.get(f"{authorize.path}?{authorize.query}&{urlencode({'login_hint': email})}")
+    callback = urlsplit(response.headers["location"])
+    started = time.perf_counter()
+    response = await api.get(f"{callback.path}?{callback.query}")
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != 307 or "#token=" not in response.headers["location"]:
+        raise RuntimeError(f"Login failed: {response.status_code} {response.text}")
+    return elapsed
+
+
+async def run(args) -> None:
+    fake = FakeProvider(settings.GOOGLE_CLIENT_ID, args.provider_latency_ms / 1000)
+    fake_transport = httpx.ASGITransport(app=fake.app)
+    oidc.google = oidc.OIDCProvider(
+        f"{ISSUER}/.well-known/openid-configuration", settings.GOOGLE_CLIENT_ID, "bench-secret", transport=fake_transport
+    )
+    prefix = f"bench-oidc-{uuid.uuid4().hex[:8]}"
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app()), base_url="http://testserver") as api, \
+                httpx.AsyncClient(transport=fake_transport, base_url=ISSUER) as provider:
+            print(f"{'mode':<8} {'logins':>7} {'p50 ms':>8} {'p99 ms':>8} {'discovery':>10} {'jwks':>6} {'token':>6}")
+            for name, cached in (("cold", False), ("cached", True)):
+                oidc.google.clear()
+                fake.requests = dict.fromkeys(fake.requests, 0)
+                latencies = []
+                for i in range(args.logins):
+                    if not cached:
+                        oidc.google.clear()
+                    if args.rotate_every and i and i % args.rotate_every == 0:
+                        fake.rotate()
+                    # Half the logins are repeat logins of an already linked user
+                    latencies.append(await login(api, provider, f"{prefix}-{i // 2}@example.invalid"))
+                print(f"{name:<8} {len(latencies):>7} {statistics.median(latencies):>8.1f} "
+                      f"{percentile(latencies, 99):>8.1f} {fake.requests['discovery']:>10} "
+                      f"{fake.requests['jwks']:>6} {fake.requests['token']:>6}")
+    finally:
+        await oidc.google.close()
+        async with AsyncSession(get_engine()) as db:
+            await db.exec(delete(User).where(User.email.like(f"{prefix}-%")))
+            await db.commit()
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200, help="Logins per mode")
+    parser.add_argument("--provider-latency-ms", type=float, default=20.0, help="Delay of every provider response")
+    parser.add_argument("--rotate-every", type=int, default=0, help="Rotate the signing key every N logins (0: never)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
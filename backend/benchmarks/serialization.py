@@ -0,0 +1,125 @@
+"""
+Benchmark: serialization throughput of /nearby pages, in rows per second.
+
+Encodes the same synthetic rows three ways and reports rows/s for each page size:
+
+    orm+shapely   ORM objects validated into ImageSubmissionRead, location_wkt via
+                  Shapely (to_shape(...).wkt) -- the path before the lean rows
+    orm           the same, with location_wkt read from the WKB directly
+    lean+orjson   plain row dicts as returned by get_nearby_submissions (lat/lon
+                  from ST_Y/ST_X) plus location_wkt, encoded with orjson
+
+    python -m benchmarks.serialization --rows 50,200,1000
+
+Runs offline, without a database; driver and row mapping costs are not included.
+"""
+import argparse
+import datetime
+import random
+import struct
+import time
+from typing import List
+
+from geoalchemy2.elements import WKBElement
+from geoalchemy2.shape import to_shape
+from pydantic import TypeAdapter, computed_field
+
+import app.models.user # noqa: F401 -- registers the User mapper for the relationship
+from app.core.geo import point_wkt
+from app.core.responses import dumps
+from app.models.image_submission import ImageSubmission, ImageSubmissionRead
+
+
+class ShapelyImageSubmissionRead(ImageSubmissionRead):
+    """ImageSubmissionRead with the former Shapely-based location_wkt."""
+
+    @computed_field(return_type=str)
+    @property
+    def location_wkt(self) -> str:
+        return to_shape(self.location).wkt
+
+
+def make_rows(count: int, seed: int = 0) -> list:
+    """(row dict, ORM object) pairs with the same values."""
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    pairs = []
+    for i in range(count):
+        lon, lat = -122.4194 + rng.uniform(-0.05, 0.05), 37.7749 + rng.uniform(-0.05, 0.05)
+        row = {
+            "id": i + 1,
+            "user_id": rng.randint(1, 1000),
+            "description": f"Submission {i}",
+            "image_url": f"https://example.com/images/{i}.jpg",
+            "thumbnail_url": f"https://example.com/images/{i}_thumb.webp",
+            "popup_url": f"https://example.com/images/{i}_popup.webp",
+            "width": 4032,
+            "height": 3024,
+            "blurhash": "LEHV6nWB2yk8pyo0adR*.7kCMdnj",
+            "content_hash": f"{rng.getrandbits(256):064x}",
+            "perceptual_hash": rng.getrandbits(63),
+            "uploaded_at": now - datetime.timedelta(seconds=i),
+            "updated_at": now,
+            "expires_at": now + datetime.timedelta(days=7),
+            "thumbs_up_count": rng.randint(0, 50),
+            "thumbs_down_count": rng.randint(0, 10),
+            "is_locked": True,
+        }
+        location = WKBElement(struct.pack("<BIIdd", 1, 0x20000001, 4326, lon, lat), srid=4326, extended=True)
+        submission = ImageSubmission(**row, location=location)
+        distance_m = rng.uniform(0, 5000)
+        pairs.append(({**row, "latitude": lat, "longitude": lon, "distance_m": distance_m}, (submission, distance_m)))
+    return pairs
+
+
+def orm_page(model, adapter: TypeAdapter, submissions: list) -> bytes:
+    return adapter.dump_json([
+        model.model_validate(submission, update={"distance_m": distance_m})
+        for submission, distance_m in submissions
+    ])
+
+
+def lean_page(rows: List[dict]) -> bytes:
+    # Same steps as the /nearby endpoint (rows are copied since the endpoint gets fresh ones)
+    page = [dict(row) for row in rows]
+    for row in page:
+        row["location_wkt"] = point_wkt(row["longitude"], row["latitude"])
+    return dumps(page)
+
+
+def rows_per_second(encode, rows: int, min_seconds: float) -> float:
+    encode() # Warm up
+    pages = 0
+    started = time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < min_seconds:
+        encode()
+        pages += 1
+    return pages * rows / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="50,200,1000", help="Comma-separated page sizes")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Minimum run time per path and page size")
+    args = parser.parse_args()
+
+    shapely_adapter = TypeAdapter(List[ShapelyImageSubmissionRead])
+    adapter = TypeAdapter(List[ImageSubmissionRead])
+    paths = {
+        "orm+shapely": lambda rows, orm: orm_page(ShapelyImageSubmissionRead, shapely_adapter, orm),
+        "orm": lambda rows, orm: orm_page(ImageSubmissionRead, adapter, orm),
+        "lean+orjson": lambda rows, orm: lean_page(rows),
+    }
+
+    print(f"{'rows':>6} " + " ".join(f"{name:>12}" for name in paths) + f" {'speedup':>8}")
+    for count in (int(size) for size in args.rows.split(",")):
+        pairs = make_rows(count)
+        rows = [row for row, _ in pairs]
+        orm = [submission for _, submission in pairs]
+        rates = {name: rows_per_second(lambda: encode(rows, orm), count, args.seconds) for name, encode in paths.items()}
+        print(f"{count:>6} " + " ".join(f"{rate:>12,.0f}" for rate in rates.values())
+              + f" {rates['lean+orjson'] / rates['orm+shapely']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
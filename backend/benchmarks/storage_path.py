@@ -0,0 +1,105 @@
+"""
+Offline benchmark: upload-and-view path per storage backend.
+
+For each backend, streams N images through the ingestion path (app.core.ingest)
+and then fetches each one back the way a browser would: through the /media route
+(FileResponse) for the local backend, with a GET on the object for S3. Reports
+p50/p99 latency of both steps. Needs no database and no running server.
+
+    python -m benchmarks.storage_path --images 200 --size-kb 2048
+    python -m benchmarks.storage_path --s3        # also S3, via moto (pip install moto)
+                                                  # or S3_ENDPOINT_URL if set
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from app.core import ingest, storage as storage_module
+from app.core.config import settings
+from benchmarks.upload_load import percentile
+
+
+async def chunks(data: bytes, size: int = 64 * 1024):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def run_backend(name: str, backend, fetch, args) -> None:
+    """Uploads and fetches args.images images, printing latencies in ms."""
+    storage_module._storage = backend
+    backend.startup()
+    payload = b"\xff\xd8\xff\xe0" + os.urandom(args.size_kb * 1024) # JPEG magic bytes, then filler
+    upload_ms, view_ms = [], []
+    try:
+        for i in range(args.images):
+            started = time.perf_counter()
+            result = await ingest.ingest_stream(chunks(payload), key_prefix=f"bench/{i}")
+            upload_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            body = await fetch(result.object_key)
+            view_ms.append((time.perf_counter() - started) * 1000)
+            assert len(body) == len(payload)
+    finally:
+        backend.shutdown()
+    for step, values in (("upload", upload_ms), ("view", view_ms)):
+        print(f"{name:<8} {step:<8} {len(values):>7} {statistics.median(values):>8.1f} {percentile(values, 99):>8.1f}")
+
+
+async def run_local(args) -> None:
+    from app.api.v1.endpoints import media
+    from fastapi import FastAPI
+
+    root = tempfile.mkdtemp(prefix="localphoto-bench-")
+    backend = storage_module.LocalStorage(root, "http://bench/media")
+    app = FastAPI()
+    app.include_router(media.router, prefix="/media")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def fetch(key: str) -> bytes:
+            response = await client.get(f"/media/{key}")
+            response.raise_for_status()
+            return response.content
+        await run_backend("local", backend, fetch, args)
+
+
+async def run_s3(args) -> None:
+    from app.core import s3
+    from app.core.s3_storage import S3Storage
+
+    backend = S3Storage()
+    async def fetch(key: str) -> bytes:
+        return await s3.download_bytes(key)
+    await run_backend("s3", backend, fetch, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=2048, help="Size of each image")
+    parser.add_argument("--s3", action="store_true", help="Also benchmark the S3 backend")
+    args = parser.parse_args()
+    settings.UPLOAD_MAX_BYTES = max(settings.UPLOAD_MAX_BYTES, args.size_kb * 1024 + 4)
+
+    print(f"{'backend':<8} {'step':<8} {'count':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    asyncio.run(run_local(args))
+    if args.s3:
+        if settings.S3_ENDPOINT_URL:
+            asyncio.run(run_s3(args))
+        else:
+            from moto import mock_aws
+            import boto3
+
+            settings.AWS_REGION = settings.AWS_REGION or "us-east-1"
+            settings.S3_BUCKET_NAME = settings.S3_BUCKET_NAME or "localphoto-bench"
+            with mock_aws():
+                boto3.client("s3", region_name=settings.AWS_REGION).create_bucket(Bucket=settings.S3_BUCKET_NAME)
+                asyncio.run(run_s3(args))
+
+
+if __name__ == "__main__":
+    main()
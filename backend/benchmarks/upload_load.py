@@ -0,0 +1,138 @@
+"""
+Load test: /submissions/nearby latency while uploads are running.
+
+Measures /nearby latency (p50/p99) against a running API server twice: once on its
+own and once while several clients upload images in parallel. With the shared S3
+client and the off-loop transfer pool, p99 of /nearby should stay flat.
+
+Run against a local S3 stand-in, e.g. moto or MinIO:
+    moto_server -p 5000                                  # or: minio server /tmp/minio
+    export S3_ENDPOINT_URL=http://localhost:5000         # in backend/.env or the environment
+    uvicorn app.main:create_app --factory --workers 1 --port 8000
+    python -m benchmarks.upload_load --create-bucket --uploaders 16 --duration 20
+
+The API server must use the same S3_ENDPOINT_URL and S3_BUCKET_NAME.
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import os
+import statistics
+import struct
+import time
+
+import httpx
+
+from app.core.config import settings
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def probe_nearby(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list, args) -> None:
+    """Calls /nearby back to back until stopped, recording latencies in ms."""
+    params = {"latitude": args.latitude, "longitude": args.longitude, "radius_km": 5}
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/v1/submissions/nearby", params=params)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        # Vary the position slightly so the nearby cache does not answer everything
+        params["latitude"] += 0.001
+
+
+def make_jpeg(size_bytes: int) -> bytes:
+    """Encodes a noise image as a JPEG of at least size_bytes, so uploads go through the real decode and resize."""
+    from PIL import Image
+
+    side = max(16, int(size_bytes ** 0.5)) # Noise at quality 90 takes about a byte per pixel
+    while True:
+        image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        if buffer.tell() >= size_bytes:
+            return buffer.getvalue()
+        side = int(side * max(1.05, (size_bytes / buffer.tell()) ** 0.5))
+
+
+_upload_numbers = itertools.count()
+
+def unique_jpeg(payload: bytes) -> bytes:
+    """The payload with a numbered comment segment after SOI, so the dedup by content hash does not skip uploads."""
+    comment = f"load test {next(_upload_numbers)}".encode()
+    return payload[:2] + b"\xff\xfe" + struct.pack(">H", len(comment) + 2) + comment + payload[2:]
+
+
+async def upload_loop(client: httpx.AsyncClient, stop: asyncio.Event, payload: bytes, counter: list, args) -> None:
+    """Uploads images back to back until stopped."""
+    data = {"latitude": str(args.latitude), "longitude": str(args.longitude), "description": "load test"}
+    while not stop.is_set():
+        files = {"image": ("load.jpg", unique_jpeg(payload), "image/jpeg")}
+        response = await client.post("/api/v1/submissions/", data=data, files=files)
+        response.raise_for_status()
+        counter[0] += 1
+
+
+async def run_phase(args, uploaders: int, payload: bytes) -> tuple:
+    """Runs one measurement phase, returning (latencies, number of uploads)."""
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    stop = asyncio.Event()
+    latencies: list = []
+    uploads = [0]
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=120) as client:
+        tasks = [asyncio.create_task(probe_nearby(client, stop, latencies, args))]
+        tasks += [asyncio.create_task(upload_loop(client, stop, payload, uploads, args)) for _ in range(uploaders)]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return latencies, uploads[0]
+
+
+def create_bucket() -> None:
+    """Creates the bucket on the S3 stand-in configured in S3_ENDPOINT_URL."""
+    import boto3
+
+    client = boto3.client(
+        's3',
+        endpoint_url=settings.S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION,
+    )
+    try:
+        client.create_bucket(Bucket=settings.S3_BUCKET_NAME)
+    except client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", default=os.getenv("LOADTEST_TOKEN"), help="Bearer token for uploads")
+    parser.add_argument("--uploaders", type=int, default=16, help="Concurrent upload clients")
+    parser.add_argument("--upload-kb", type=int, default=2048, help="Size of each uploaded image")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per phase")
+    parser.add_argument("--latitude", type=float, default=37.7749)
+    parser.add_argument("--longitude", type=float, default=-122.4194)
+    parser.add_argument("--create-bucket", action="store_true", help="Create the bucket on the S3 stand-in first")
+    args = parser.parse_args()
+
+    if args.create_bucket:
+        create_bucket()
+
+    payload = make_jpeg(args.upload_kb * 1024)
+
+    print(f"{'phase':<16} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'uploads':>8}")
+    for name, uploaders in (("nearby only", 0), (f"{args.uploaders} uploaders", args.uploaders)):
+        latencies, uploads = asyncio.run(run_phase(args, uploaders, payload))
+        print(f"{name:<16} {len(latencies):>9} {statistics.median(latencies):>8.1f} "
+              f"{percentile(latencies, 99):>8.1f} {uploads:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from app.core.storage import LocalStorage, StorageError
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path), "http://testserver/media/")
+
+
+def test_presigned_upload_verifies(storage):
+    upload = storage.presigned_upload("uploads/a.jpg", "image/jpeg", 1024, expires_in=60)
+    url = urlsplit(upload["url"])
+    assert url.path == "/media/upload"
+    assert dict(parse_qsl(url.query)) == upload["fields"] # The policy travels in the query string too
+    assert storage.verify_upload(upload["fields"])
+
+
+@pytest.mark.parametrize("field, value", [
+    ("key", "uploads/b.jpg"),
+    ("Content-Type", "text/html"),
+    ("max_bytes", "1048576"),
+    ("expires", "4102444800"),
+    ("signature", "0" * 64),
+])
+def test_tampered_policy_is_rejected(storage, field, value):
+    fields = storage.presigned_upload("uploads/a.jpg", "image/jpeg", 1024, expires_in=60)["fields"]
+    assert not storage.verify_upload({**fields, field: value})
+
+
+@pytest.mark.parametrize("field, value", [("max_bytes", "lots"), ("expires", "")])
+def test_malformed_policy_is_rejected(storage, field, value):
+    fields = storage.presigned_upload("uploads/a.jpg", "image/jpeg", 1024, expires_in=60)["fields"]
+    assert not storage.verify_upload({**fields, field: value})
+
+
+@pytest.mark.parametrize("field", ["key", "Content-Type", "max_bytes", "expires", "signature"])
+def test_incomplete_policy_is_rejected(storage, field):
+    fields = storage.presigned_upload("uploads/a.jpg", "image/jpeg", 1024, expires_in=60)["fields"]
+    del fields[field]
+    assert not storage.verify_upload(fields)
+
+
+def test_expired_policy_is_rejected(storage):
+    fields = storage.presigned_upload("uploads/a.jpg", "image/jpeg", 1024, expires_in=-1)["fields"]
+    assert not storage.verify_upload(fields)
+
+
+def test_policy_from_another_secret_is_rejected(storage, monkeypatch):
+    from app.core.config import settings
+    fields = storage.presigned_upload("uploads/a.jpg", "image/jpeg", 1024, expires_in=60)["fields"]
+    monkeypatch.setattr(settings, "JWT_SECRET", "another-secret")
+    assert not storage.verify_upload(fields)
+
+
+@pytest.mark.parametrize("key", ["../outside.jpg", "uploads/../../outside.jpg", "", "uploads/a.jpg.meta.json"])
+def test_keys_outside_the_root_cannot_be_signed(storage, key):
+    with pytest.raises(StorageError):
+        storage.presigned_upload(key, "image/jpeg", 1024, expires_in=60)
@@ -0,0 +1,91 @@
+import datetime
+import math
+import random
+
+import pytest
+
+from app.api.v1.endpoints.submissions import _page_nearby_rows
+from app.core.cache import invalidate_nearby_for_point, nearby_cache, nearby_cache_key
+from app.core.geo import EARTH_RADIUS_M, haversine_m
+
+
+def destination(lat: float, lon: float, bearing: float, distance_m: float):
+    """The point distance_m from (lat, lon) along the bearing (radians), on the haversine sphere."""
+    phi, lam, delta = math.radians(lat), math.radians(lon), distance_m / EARTH_RADIUS_M
+    phi2 = math.asin(math.sin(phi) * math.cos(delta) + math.cos(phi) * math.sin(delta) * math.cos(bearing))
+    lam2 = lam + math.atan2(
+        math.sin(bearing) * math.sin(delta) * math.cos(phi), math.cos(delta) - math.sin(phi) * math.sin(phi2)
+    )
+    return math.degrees(phi2), math.degrees(lam2)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    nearby_cache.clear()
+    yield
+    nearby_cache.clear()
+
+
+def test_cached_area_covers_the_query_circle():
+    rng = random.Random(1234)
+    for _ in range(500):
+        lat, lon = rng.uniform(-70, 70), rng.uniform(-179, 179)
+        radius_km = rng.choice([0.01, 0.5, 0.75, 1, 2.3, 5, 10, 25])
+        key = nearby_cache_key(lat, lon, radius_km)
+        for step in range(16):
+            point = destination(lat, lon, step * math.pi / 8, radius_km * 1000)
+            assert haversine_m(key.latitude, key.longitude, *point) <= key.radius_km * 1000, (lat, lon, radius_km)
+
+
+def test_nearby_queries_share_a_key():
+    key = nearby_cache_key(52.52001, 13.40495, 1.2)
+    assert nearby_cache_key(52.52002, 13.40496, 1.4) == key # Same cell, same radius bucket
+    assert nearby_cache_key(52.52001, 13.40495, 1.6) != key # Next radius bucket
+    assert nearby_cache_key(52.53, 13.40495, 1.2) != key # Another cell
+
+
+def test_write_invalidates_areas_containing_the_point():
+    near = nearby_cache_key(52.52, 13.405, 1)
+    far = nearby_cache_key(48.8566, 2.3522, 1)
+    for key in (near, far):
+        nearby_cache.set(key, ([], "token"), ttl=60, size=1)
+    invalidate_nearby_for_point(*reversed(destination(52.52, 13.405, 0.3, 900)))
+    assert nearby_cache.get(near) is None
+    assert nearby_cache.get(far) is not None
+
+
+def area_rows(now: datetime.datetime):
+    rng = random.Random(99)
+    rows = []
+    for row_id in range(1, 201):
+        lat, lon = destination(52.52, 13.405, rng.uniform(0, 2 * math.pi), rng.uniform(0, 3000))
+        rows.append({
+            "id": row_id,
+            "latitude": lat,
+            "longitude": lon,
+            "uploaded_at": now - datetime.timedelta(minutes=rng.randrange(50)),
+            # Every fifth row expired after the area was cached
+            "expires_at": now + datetime.timedelta(hours=-1 if row_id % 5 == 0 else 1),
+        })
+    return rows
+
+
+@pytest.mark.parametrize("sort", ["distance", "recent"])
+def test_paging_cached_rows_visits_each_live_row_once(sort):
+    now = datetime.datetime.utcnow()
+    rows = area_rows(now)
+    ids, after = [], None
+    while True:
+        page = _page_nearby_rows(rows, latitude=52.52, longitude=13.405, radius_km=2, sort=sort, limit=7, after=after)
+        if not page:
+            break
+        ids.extend(row["id"] for row in page)
+        last = page[-1]
+        after = (last["distance_m"] if sort == "distance" else last["uploaded_at"], last["id"])
+    expected = {
+        row["id"] for row in rows
+        if row["expires_at"] > now and haversine_m(52.52, 13.405, row["latitude"], row["longitude"]) <= 2000
+    }
+    assert len(ids) == len(set(ids))
+    assert set(ids) == expected
+    assert all("distance_m" not in row for row in rows) # Cached rows are not modified
@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from app.core.oidc import OIDCError, OIDCProvider
+
+ISSUER = "https://idp.test"
+CLIENT_ID = "client-1"
+
+
+def signing_key(kid: str):
+    """(private PEM, public JWK) of a new RSA key."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, {**jwk.construct(public_pem, "RS256").to_dict(), "kid": kid, "alg": "RS256"}
+
+
+PRIVATE_PEM, PUBLIC_JWK = signing_key("key-1")
+
+
+class FakeIdP:
+    """Serves the discovery document and the JWKS through httpx.MockTransport."""
+
+    def __init__(self):
+        self.keys = [PUBLIC_JWK]
+        self.transport = httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/.well-known/openid-configuration":
+            return httpx.Response(200, json={
+                "issuer": ISSUER,
+                "jwks_uri": f"{ISSUER}/jwks",
+                "authorization_endpoint": f"{ISSUER}/authorize",
+                "token_endpoint": f"{ISSUER}/token",
+                "id_token_signing_alg_values_supported": ["RS256", "HS256", "none"],
+            })
+        if request.url.path == "/jwks":
+            return httpx.Response(200, json={"keys": self.keys})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def idp():
+    return FakeIdP()
+
+
+@pytest.fixture
+def provider(idp):
+    return OIDCProvider(f"{ISSUER}/.well-known/openid-configuration", CLIENT_ID, "secret", transport=idp.transport)
+
+
+def id_token(key: str = PRIVATE_PEM, kid: str = "key-1", algorithm: str = "RS256", **claims) -> str:
+    now = int(time.time())
+    claims = {
+        "iss": ISSUER, "aud": CLIENT_ID, "sub": "123", "email": "user@example.com",
+        "iat": now, "exp": now + 300, "nonce": "n-1", **claims,
+    }
+    return jwt.encode(claims, key, algorithm=algorithm, headers={"kid": kid})
+
+
+def verify(provider: OIDCProvider, *tokens: str, nonce="n-1") -> list:
+    async def run():
+        try:
+            return [await provider.verify_id_token(token, nonce=nonce) for token in tokens]
+        finally:
+            await provider.close()
+    return asyncio.run(run())
+
+
+def test_valid_token_verifies_with_cached_keys(provider):
+    first, second = verify(provider, id_token(), id_token(sub="456"))
+    assert first["email"] == "user@example.com"
+    assert second["sub"] == "456"
+    assert (provider.discovery_fetches, provider.jwks_fetches, provider.verified) == (1, 1, 2)
+
+
+def test_issuer_without_scheme_is_accepted(provider):
+    # Google issues both "https://accounts.google.com" and "accounts.google.com"
+    [claims] = verify(provider, id_token(iss="idp.test"))
+    assert claims["iss"] == "idp.test"
+
+
+@pytest.mark.parametrize("claims", [
+    {"aud": "another-client"},
+    {"iss": "https://evil.test"},
+    {"exp": int(time.time()) - 120},
+    {"nonce": "n-2"},
+    {"nonce": None},
+])
+def test_invalid_claims_are_rejected(provider, claims):
+    with pytest.raises(OIDCError):
+        verify(provider, id_token(**claims))
+    assert provider.failures == 1
+
+
+def test_expiry_within_leeway_is_accepted(provider):
+    verify(provider, id_token(exp=int(time.time()) - 10))
+
+
+def test_tampered_signature_is_rejected(provider):
+    header, payload, signature = id_token().split(".")
+    forged = jwt.encode({"iss": ISSUER, "aud": CLIENT_ID, "sub": "admin", "nonce": "n-1"}, "x", algorithm="HS256")
+    with pytest.raises(OIDCError):
+        verify(provider, ".".join([header, forged.split(".")[1], signature]))
+
+
+def test_token_from_another_key_is_rejected(provider):
+    other_pem, _ = signing_key("key-1")
+    with pytest.raises(OIDCError):
+        verify(provider, id_token(key=other_pem))
+
+
+@pytest.mark.parametrize("algorithm, key", [("HS256", "secret"), ("HS256", PUBLIC_JWK["n"])])
+def test_symmetric_algorithms_are_rejected(provider, algorithm, key):
+    with pytest.raises(OIDCError):
+        verify(provider, id_token(key=key, algorithm=algorithm))
+
+
+def test_unknown_key_refetches_the_jwks_once(provider, idp):
+    rotated_pem, rotated_jwk = signing_key("key-2")
+    verify(provider, id_token())
+    idp.keys = [PUBLIC_JWK, rotated_jwk] # Key rotation: the new key is picked up right away
+    verify(provider, id_token(key=rotated_pem, kid="key-2"))
+    assert provider.jwks_fetches == 2
+    for kid in ("forged-1", "forged-2"): # Further misses are throttled
+        with pytest.raises(OIDCError):
+            verify(provider, id_token(kid=kid))
+    assert provider.jwks_fetches == 2
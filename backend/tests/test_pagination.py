@@ -0,0 +1,83 @@
+import base64
+import datetime
+import json
+
+import pytest
+
+from app.core.pagination import cursor_basis, decode_cursor, decode_sync_token, encode_cursor, encode_sync_token
+
+
+def raw_cursor(document) -> str:
+    return base64.urlsafe_b64encode(json.dumps(document).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trips_uploaded_at():
+    uploaded_at = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = encode_cursor("recent", (uploaded_at, 42))
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "recent") == (uploaded_at, 42)
+    assert cursor_basis(cursor) is None
+
+
+def test_cursor_round_trips_distance_and_basis():
+    cursor = encode_cursor("distance", (1234.5, 7), basis="haversine")
+    assert decode_cursor(cursor, "distance") == (1234.5, 7)
+    assert cursor_basis(cursor) == "haversine"
+
+
+def test_cursor_converts_aware_timestamps_to_naive_utc():
+    cursor = raw_cursor({"s": "recent", "k": ["2024-05-01T14:30:00+02:00", 3]})
+    assert decode_cursor(cursor, "recent") == (datetime.datetime(2024, 5, 1, 12, 30), 3)
+
+
+def test_cursor_for_another_sort_is_rejected():
+    cursor = encode_cursor("distance", (10.0, 1))
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "recent")
+
+
+@pytest.mark.parametrize("cursor, sort", [
+    ("", "recent"),
+    ("not a cursor", "recent"),
+    (raw_cursor([1, 2]), "recent"),
+    (raw_cursor({"s": "recent"}), "recent"),
+    (raw_cursor({"s": "recent", "k": [5, 1]}), "recent"),
+    (raw_cursor({"s": "recent", "k": ["yesterday", 1]}), "recent"),
+    (raw_cursor({"s": "recent", "k": ["2024-05-01T12:00:00", "x"]}), "recent"),
+    (raw_cursor({"s": "distance", "k": ["NaN", 1]}), "distance"),
+    (raw_cursor({"s": "distance", "k": ["inf", 1]}), "distance"),
+    (raw_cursor({"s": "distance", "k": [None, 1]}), "distance"),
+])
+def test_malformed_cursor_raises_value_error(cursor, sort):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, sort)
+
+
+def test_malformed_basis_raises_value_error():
+    with pytest.raises(ValueError):
+        cursor_basis(raw_cursor({"s": "distance", "k": [1.0, 1], "b": 5}))
+    with pytest.raises(ValueError):
+        cursor_basis("%%%")
+
+
+def test_sync_token_round_trips():
+    as_of = datetime.datetime(2024, 5, 1, 12, 30, 15, 5)
+    assert decode_sync_token(encode_sync_token(as_of)) == as_of
+
+
+def test_sync_token_converts_aware_timestamps_to_naive_utc():
+    token = raw_cursor({"t": "2024-05-01T07:30:00-05:00"})
+    assert decode_sync_token(token) == datetime.datetime(2024, 5, 1, 12, 30)
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not a token",
+    raw_cursor([1]),
+    raw_cursor({}),
+    raw_cursor({"t": 1714566600}),
+    raw_cursor({"t": "yesterday"}),
+])
+def test_malformed_sync_token_raises_value_error(token):
+    with pytest.raises(ValueError):
+        decode_sync_token(token)
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from app.core import ratelimit
+from app.core.config import settings
+from app.core.ratelimit import MemoryRateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    return clock
+
+
+def hit(limiter, *buckets) -> float:
+    return asyncio.run(limiter.hit(list(buckets)))
+
+
+def test_bucket_allows_its_capacity_then_rejects(clock):
+    limiter = MemoryRateLimiter()
+    for _ in range(3):
+        assert hit(limiter, ("ip", 3, 0.1)) == 0
+    assert hit(limiter, ("ip", 3, 0.1)) == pytest.approx(10)
+
+
+def test_bucket_refills_at_its_rate(clock):
+    limiter = MemoryRateLimiter()
+    for _ in range(2):
+        hit(limiter, ("ip", 2, 0.5))
+    clock.now += 1.5
+    assert hit(limiter, ("ip", 2, 0.5)) == pytest.approx(0.5) # 0.75 tokens refilled so far
+    clock.now += 0.5
+    assert hit(limiter, ("ip", 2, 0.5)) == 0
+    assert hit(limiter, ("ip", 2, 0.5)) == pytest.approx(2)
+    clock.now += 60
+    for _ in range(2): # Refills stop at the capacity
+        assert hit(limiter, ("ip", 2, 0.5)) == 0
+    assert hit(limiter, ("ip", 2, 0.5)) > 0
+
+
+def test_attempt_takes_from_both_buckets_or_neither(clock):
+    limiter = MemoryRateLimiter()
+    assert hit(limiter, ("email", 1, 0.01)) == 0
+    # The email bucket is empty, so the IP bucket keeps its token
+    assert hit(limiter, ("ip", 1, 0.01), ("email", 1, 0.01)) == pytest.approx(100)
+    assert hit(limiter, ("ip", 1, 0.01)) == 0
+
+
+def test_retry_after_waits_for_the_slowest_bucket(clock):
+    limiter = MemoryRateLimiter()
+    hit(limiter, ("ip", 1, 1.0), ("email", 1, 0.1))
+    assert hit(limiter, ("ip", 1, 1.0), ("email", 1, 0.1)) == pytest.approx(10)
+
+
+def test_prune_drops_idle_buckets(clock):
+    limiter = MemoryRateLimiter()
+    hit(limiter, ("old", 5, 0.1))
+    clock.now += settings.AUTH_RATE_LIMIT_WINDOW_SECONDS + 1
+    hit(limiter, ("new", 5, 0.1))
+    assert asyncio.run(limiter.prune()) == 1
+    assert list(limiter._buckets) == ["new"]
+
+
+def test_bucket_count_stays_bounded(clock, monkeypatch):
+    monkeypatch.setattr(MemoryRateLimiter, "MAX_BUCKETS", 100)
+    limiter = MemoryRateLimiter()
+    hit(limiter, ("busy", 5, 0.1))
+    for i in range(1000):
+        clock.now += 0.001
+        hit(limiter, (f"key-{i}", 5, 0.1))
+        if i % 10 == 0:
+            hit(limiter, ("busy", 5, 100.0)) # Recently hit buckets survive eviction
+        assert len(limiter._buckets) <= 100
+    assert "busy" in limiter._buckets
+    assert "key-999" in limiter._buckets
@@ -86,19 +86,21 @@ function initMapView() {
     // Initialize marker layer group
     markersLayer = L.layerGroup().addTo(map);
 
+    // Reload the viewport whenever the map stops moving (pan, zoom, setView, fitBounds)
+    map.on('moveend', fetchAndDisplayViewport);
+
     // --- Get User Location and Fetch Data ---
     if ('geolocation' in navigator) {
         navigator.geolocation.getCurrentPosition(
             (position) => {
                 const userCoords = [position.coords.latitude, position.coords.longitude];
-                map.setView(userCoords, defaultZoom); // Center map on user
-                fetchAndDisplayMarkers(position.coords.latitude, position.coords.longitude);
+                map.setView(userCoords, defaultZoom); // Center map on user (triggers 'moveend')
             },
             (error) => {
                 console.warn(`Geolocation error (${error.code}): ${error.message}`);
                 displayMapMessage("Could not get your location. Showing default area.", 'warning');
                 // Fetch data for default location if geolocation fails
-                fetchAndDisplayMarkers(defaultCoords[0], defaultCoords[1]);
+                fetchAndDisplayViewport();
             },
             { enableHighAccuracy: true, timeout: 10000, maximumAge: 0 } // Geolocation options
         );
@@ -106,7 +108,7 @@ function initMapView() {
         console.warn("Geolocation is not supported by this browser.");
         displayMapMessage("Geolocation not supported. Showing default area.", 'warning');
         // Fetch data for default location if geolocation is not supported
-        fetchAndDisplayMarkers(defaultCoords[0], defaultCoords[1]);
+        fetchAndDisplayViewport();
     }
 
     // --- Add event listener for radius slider ---
@@ -119,11 +121,12 @@ function initMapView() {
             const radiusKm = radiusSlider.value;
             radiusValueSpan.textContent = `${radiusKm} km`;
         });
-        // Use 'change' event to trigger API call only when user releases slider
+        // Use 'change' event to act only when user releases slider:
+        // fit the map to the radius around the current center, which triggers a viewport reload
         radiusSlider.addEventListener('change', () => {
             const radiusKm = radiusSlider.value;
             const center = map.getCenter(); // Get current map center
-            fetchAndDisplayMarkers(center.lat, center.lng, radiusKm);
+            map.fitBounds(center.toBounds(radiusKm * 2000)); // toBounds takes the box size in meters
         });
     } else {
         console.warn("Radius slider or value span not found.");
@@ -148,9 +151,15 @@ function initMapView() {
 
 }
 
-// Function to fetch submissions and display markers
-async function fetchAndDisplayMarkers(latitude, longitude, radiusKm = 5.0) {
-    console.log(`Fetching markers near ${latitude}, ${longitude} within ${radiusKm}km`);
+// Sequence number of the latest viewport request, used to drop stale responses
+let viewportRequestSeq = 0;
+
+// Function to fetch submissions (or clusters) for the visible map area and display markers
+async function fetchAndDisplayViewport() {
+    const bbox = map.getBounds().toBBoxString(); // "min_lon,min_lat,max_lon,max_lat"
+    const zoom = map.getZoom();
+    const requestSeq = ++viewportRequestSeq;
+    console.log(`Fetching markers in ${bbox} at zoom ${zoom}`);
     // Clear previous errors/messages when fetching new markers
     const mapErrorElement = document.getElementById('map-error');
     const mapMessageElement = document.getElementById('map-message');
@@ -159,63 +168,29 @@ async function fetchAndDisplayMarkers(latitude, longitude, radiusKm = 5.0) {
 
 
     try {
-        const response = await axios.get(`${API_BASE_URL}/submissions/nearby`, {
-            params: {
-                latitude: latitude,
-                longitude: longitude,
-                radius_km: radiusKm
-            }
+        const response = await axios.get(`${API_BASE_URL}/submissions/in_bounds`, {
+            params: { bbox: bbox, zoom: zoom }
         });
+        if (requestSeq !== viewportRequestSeq) {
+            return; // A newer request was issued while this one was in flight
+        }
 
-        const submissions = response.data;
-        console.log("Received submissions:", submissions);
+        const result = response.data;
+        console.log("Received viewport data:", result);
 
         // Clear existing markers
         markersLayer.clearLayers();
 
-        if (submissions.length === 0) {
+        if (result.clusters.length === 0 && result.submissions.length === 0) {
             // Optionally display a message if no submissions are found
-            console.log("No nearby submissions found.");
+            console.log("No submissions found in this area.");
             displayMapMessage("No nearby submissions found in this area.", 'info');
             return;
         }
 
-        // Add new markers
-        submissions.forEach(sub => {
-            // GeoAlchemy returns WKT: "SRID=4326;POINT(lon lat)"
-            // We need to parse lat/lon from this string
-            // Use the 'location_wkt' field provided by the backend response model
-            // Corrected regex: Removed extra escaped parenthesis after POINT
-            const pointMatch = sub.location_wkt.match(/POINT \(([-\d.]+) ([-\d.]+)\)/);
-            if (pointMatch && pointMatch.length === 3) {
-                const lon = parseFloat(pointMatch[1]);
-                const lat = parseFloat(pointMatch[2]);
-
-                const marker = L.marker([lat, lon]);
-
-                // Create popup content with unique IDs for counts
-                const popupContentId = `popup-content-${sub.id}`;
-                let popupContent = `<div id="${popupContentId}">`; // Wrap content for easier update
-                popupContent += `<b>${sub.description || 'No description'}</b><br>`;
-                popupContent += `<img src="${sub.image_url}" alt="Submission thumbnail" width="100"><br>`; // Basic image display
-                popupContent += `<small>Uploaded: ${new Date(sub.uploaded_at).toLocaleString()}</small><br>`;
-                // Add thumbs up/down buttons and counts
-                popupContent += `
-                    <button class="btn btn-sm btn-outline-success thumb-btn me-1" data-id="${sub.id}" data-action="up">
-                        👍 <span class="thumb-count-up">${sub.thumbs_up_count}</span>
-                    </button>
-                    <button class="btn btn-sm btn-outline-danger thumb-btn" data-id="${sub.id}" data-action="down">
-                        👎 <span class="thumb-count-down">${sub.thumbs_down_count}</span>
-                    </button>
-                `;
-                popupContent += `</div>`; // Close wrapper div
-
-                marker.bindPopup(popupContent);
-                markersLayer.addLayer(marker);
-            } else {
-                console.warn("Could not parse location WKT:", sub.location_wkt);
-            }
-        });
+        // Low zoom: one marker per grid cell, high zoom: one marker per submission
+        result.clusters.forEach(addClusterMarker);
+        result.submissions.forEach(addSubmissionMarker);
 
     } catch (error) {
         console.error("Failed to fetch or display markers:", error);
@@ -227,6 +202,63 @@ async function fetchAndDisplayMarkers(latitude, longitude, radiusKm = 5.0) {
     }
 }
 
+// Add a cluster marker showing the number of submissions in a grid cell
+function addClusterMarker(cluster) {
+    // A cell with a single submission gets a plain marker, larger cells a count badge
+    const options = {};
+    if (cluster.count > 1) {
+        options.icon = L.divIcon({
+            className: 'cluster-marker',
+            html: `<span>${cluster.count}</span>`,
+            iconSize: [40, 40]
+        });
+    }
+    const marker = L.marker([cluster.latitude, cluster.longitude], options);
+    marker.bindTooltip(
+        `<img src="${cluster.representative_image_url}" alt="Submission thumbnail" width="100"><br>${cluster.count} photo(s)`
+    );
+    // Zoom into the cluster on click
+    marker.on('click', () => map.setView([cluster.latitude, cluster.longitude], map.getZoom() + 2));
+    markersLayer.addLayer(marker);
+}
+
+// Add a marker with a popup (image, description, votes) for a single submission
+function addSubmissionMarker(sub) {
+    // GeoAlchemy returns WKT: "SRID=4326;POINT(lon lat)"
+    // We need to parse lat/lon from this string
+    // Use the 'location_wkt' field provided by the backend response model
+    // Corrected regex: Removed extra escaped parenthesis after POINT
+    const pointMatch = sub.location_wkt.match(/POINT \(([-\d.]+) ([-\d.]+)\)/);
+    if (pointMatch && pointMatch.length === 3) {
+        const lon = parseFloat(pointMatch[1]);
+        const lat = parseFloat(pointMatch[2]);
+
+        const marker = L.marker([lat, lon]);
+
+        // Create popup content with unique IDs for counts
+        const popupContentId = `popup-content-${sub.id}`;
+        let popupContent = `<div id="${popupContentId}">`; // Wrap content for easier update
+        popupContent += `<b>${sub.description || 'No description'}</b><br>`;
+        popupContent += `<img src="${sub.popup_url || sub.image_url}" alt="Submission thumbnail" width="100"><br>`; // Basic image display
+        popupContent += `<small>Uploaded: ${new Date(sub.uploaded_at).toLocaleString()}</small><br>`;
+        // Add thumbs up/down buttons and counts
+        popupContent += `
+            <button class="btn btn-sm btn-outline-success thumb-btn me-1" data-id="${sub.id}" data-action="up">
+                👍 <span class="thumb-count-up">${sub.thumbs_up_count}</span>
+            </button>
+            <button class="btn btn-sm btn-outline-danger thumb-btn" data-id="${sub.id}" data-action="down">
+                👎 <span class="thumb-count-down">${sub.thumbs_down_count}</span>
+            </button>
+        `;
+        popupContent += `</div>`; // Close wrapper div
+
+        marker.bindPopup(popupContent);
+        markersLayer.addLayer(marker);
+    } else {
+        console.warn("Could not parse location WKT:", sub.location_wkt);
+    }
+}
+
 // Ensure Leaflet is loaded before calling initMapView
 // This might require adjustments based on how/when Leaflet script is loaded in index.html
 // For now, assuming Leaflet is available when main.js calls initMapView
@@ -200,7 +200,7 @@ async function fetchAndDisplayUserSubmissions(container, errorElement) {
             // Content Div
             const contentDiv = document.createElement('div');
             contentDiv.innerHTML = `
-                <img src="${sub.image_url}" alt="Thumbnail" width="60" height="60" class="me-3 float-start">
+                <img src="${sub.thumbnail_url || sub.image_url}" alt="Thumbnail" width="60" height="60" class="me-3 float-start">
                 <p class="mb-1">${sub.description || '<em>No description</em>'}</p>
                 <small class="text-muted">Uploaded: ${uploadedDate.toLocaleString()}</small>
             `;
@@ -152,25 +152,42 @@ function initSubmitView() {
             return;
         }
 
-        // Create FormData object
-        const formData = new FormData();
         // Ensure there's a file selected either via input or camera
         if (!imageFile.files || imageFile.files.length === 0) {
              displaySubmitMessage("Please select a photo or capture one using the camera.", 'warning');
              submitBtn.disabled = false; // Re-enable button
              return;
         }
-        formData.append('image', imageFile.files[0]); // Use 'image' key to match backend endpoint parameter
-        formData.append('description', description.value);
-        formData.append('latitude', latitudeInput.value);
-        formData.append('longitude', longitudeInput.value);
+        const file = imageFile.files[0];
+        const authHeaders = { 'Authorization': `Bearer ${token}` };
 
         try {
-            const response = await axios.post(`${API_BASE_URL}/submissions/`, formData, {
-                headers: {
-                    'Authorization': `Bearer ${token}`,
-                    // 'Content-Type': 'multipart/form-data' // Axios sets this automatically for FormData
-                }
+            // 1. Ask the backend for a presigned upload to storage
+            const uploadUrlResponse = await axios.post(`${API_BASE_URL}/submissions/upload-url`,
+                { content_type: file.type || 'image/jpeg' },
+                { headers: authHeaders }
+            );
+            const upload = uploadUrlResponse.data;
+            if (file.size > upload.max_bytes) {
+                displaySubmitMessage(`Photo is too large (max ${Math.round(upload.max_bytes / (1024 * 1024))} MB).`, 'warning');
+                submitBtn.disabled = false;
+                return;
+            }
+
+            // 2. Upload the image directly to storage (policy fields first, file last)
+            const uploadForm = new FormData();
+            Object.entries(upload.fields).forEach(([name, value]) => uploadForm.append(name, value));
+            uploadForm.append('file', file);
+            await axios.post(upload.url, uploadForm); // No Authorization header: the policy authorizes the upload
+
+            // 3. Create the submission for the uploaded object
+            const response = await axios.post(`${API_BASE_URL}/submissions/finalize`, {
+                object_key: upload.object_key,
+                description: description.value,
+                latitude: parseFloat(latitudeInput.value),
+                longitude: parseFloat(longitudeInput.value)
+            }, {
+                headers: authHeaders
             });
 
             console.log("Submission successful:", response.data);